@@ -0,0 +1,73 @@
+"""
+import main 耗时报告
+
+在子进程中以 python -X importtime 导入后端 main 模块，按顶层包汇总导入耗时，
+列出最慢的包；总耗时超过预算时返回非零退出码，可放在CI中防止启动变慢。
+
+在 health-ai-backend 目录下运行：
+    python -m benchmarks.import_time --budget 2.0
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """解析 -X importtime 输出，返回 [(模块名, 自身耗时us, 累计耗时us)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def summarize_by_package(entries: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """按顶层包汇总自身耗时（各模块自身耗时之和即该包的总导入耗时）"""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in entries:
+        totals[name.split(".")[0]] += self_us
+    return dict(totals)
+
+
+def measure(module: str = "main") -> Tuple[float, Dict[str, int]]:
+    """在全新的解释器中导入模块，返回 (总耗时秒, {顶层包: 耗时us})"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, env=os.environ.copy()
+    )
+    entries = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise RuntimeError(f"导入 {module} 失败:\n" + "\n".join(errors[-10:]))
+    total_us = next((cumulative for name, _, cumulative in entries if name == module), 0)
+    return total_us / 1e6, summarize_by_package(entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import main 耗时报告")
+    parser.add_argument("--module", default="main", help="要导入的模块")
+    parser.add_argument("--budget", type=float, default=None, help="导入耗时预算（秒），超出时退出码为1")
+    parser.add_argument("--top", type=int, default=15, help="列出最慢的包数")
+    args = parser.parse_args()
+
+    total, packages = measure(args.module)
+    print(f"import {args.module}: {total:.3f}s")
+    print(f"{'包':<32}{'耗时(ms)':>12}{'占比':>8}")
+    for name, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        share = us / (total * 1e6) if total else 0
+        print(f"{name:<32}{us / 1000:>12.1f}{share:>8.1%}")
+
+    if args.budget is not None and total > args.budget:
+        print(f"\n超出预算: {total:.3f}s > {args.budget:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
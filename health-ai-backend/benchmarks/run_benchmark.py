@@ -0,0 +1,213 @@
+"""
+后端接口离线基准测试
+
+在本机启动模拟大模型服务（benchmarks.stub_llm）和后端 main.app，使用哈希编码器
+代替sentence-transformers，按给定并发回放混合负载，输出各接口吞吐量和
+p50/p95/p99延迟，可保存为基线并与历史基线对比。整个过程不访问外网。
+
+在 health-ai-backend 目录下运行：
+    python -m benchmarks.run_benchmark --requests 500 --concurrency 16 --save-baseline v1.1
+    python -m benchmarks.run_benchmark --requests 500 --concurrency 16 --compare benchmarks/baselines/v1.1.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(BACKEND_DIR, "benchmarks", "baselines")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(app, port: int):
+    """在后台线程中启动uvicorn，等待服务就绪"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"服务启动失败（端口 {port}）")
+        time.sleep(0.05)
+    return server, thread
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: Dict[str, List[tuple]], elapsed: float) -> Dict[str, dict]:
+    results = {}
+    for endpoint, items in sorted(samples.items()):
+        latencies = sorted(seconds * 1000 for seconds, ok in items if ok)
+        results[endpoint] = {
+            "count": len(items),
+            "errors": sum(1 for _, ok in items if not ok),
+            "throughput_rps": round(len(items) / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        }
+    return results
+
+
+async def replay(base_url: str, workload, total_requests: int, concurrency: int, duration: float = None):
+    """按固定并发回放负载，返回 (各接口样本, 总耗时)"""
+    import httpx
+
+    samples = defaultdict(list)
+    operations = [workload.next_operation() for _ in range(total_requests)]
+    queue = asyncio.Queue()
+    for name in operations:
+        queue.put_nowait(name)
+
+    def record(endpoint, seconds, ok):
+        samples[endpoint].append((seconds, ok))
+
+    start = time.perf_counter()
+
+    async def worker(client):
+        while not queue.empty():
+            if duration and time.perf_counter() - start > duration:
+                return
+            name = queue.get_nowait()
+            try:
+                await workload.run(name, client, record)
+            except Exception:
+                record(name, 0.0, False)
+
+    limits = httpx.Limits(max_connections=concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        await asyncio.gather(*[worker(client) for _ in range(concurrency)])
+
+    return samples, time.perf_counter() - start
+
+
+def print_report(results: Dict[str, dict], elapsed: float, baseline: dict = None):
+    print(f"\n总耗时 {elapsed:.2f}s")
+    header = f"{'endpoint':<18}{'count':>7}{'err':>5}{'rps':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, r in results.items():
+        print(f"{endpoint:<18}{r['count']:>7}{r['errors']:>5}{r['throughput_rps']:>9.2f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}")
+
+    if baseline:
+        print(f"\n与基线 {baseline.get('name')}（{baseline.get('created_at')}）对比（正数表示变慢/吞吐下降）：")
+        for endpoint, r in results.items():
+            base = baseline["results"].get(endpoint)
+            if not base:
+                continue
+            deltas = []
+            for key in ("p50_ms", "p95_ms", "p99_ms"):
+                if base[key]:
+                    deltas.append(f"{key[:-3]} {(r[key] - base[key]) / base[key] * 100:+.1f}%")
+            if base["throughput_rps"]:
+                deltas.append(f"rps {(base['throughput_rps'] - r['throughput_rps']) / base['throughput_rps'] * 100:+.1f}%")
+            print(f"  {endpoint:<18}" + "  ".join(deltas))
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后端接口离线基准测试")
+    parser.add_argument("--requests", type=int, default=300, help="总操作数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发数")
+    parser.add_argument("--duration", type=float, default=None, help="最长运行时间（秒），超时后停止发起新操作")
+    parser.add_argument("--mix", default="upload=1,ask=4,ask_stream=1,profile=2,search=3",
+                        help="负载权重，如 upload=1,ask=4,profile=2,search=3")
+    parser.add_argument("--users", type=int, default=20, help="模拟用户数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--warmup-uploads", type=int, default=20, help="正式测试前预先上传的报告数")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="模拟大模型首token延迟（秒）")
+    parser.add_argument("--llm-tps", type=float, default=40, help="模拟大模型生成速度（token/秒）")
+    parser.add_argument("--llm-tokens", type=int, default=64, help="模拟大模型回答长度（token）")
+    parser.add_argument("--save-baseline", metavar="NAME", help="把结果保存为 benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="PATH", help="与已保存的基线对比")
+    args = parser.parse_args()
+
+    from benchmarks.stub_llm import create_stub_app
+    from benchmarks.workload import Workload
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    llm_port, api_port = _free_port(), _free_port()
+    workdir = tempfile.mkdtemp(prefix="health_bench_")
+
+    # 后端在导入时读取配置，必须在 import main 之前设置
+    os.environ.update({
+        "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "DEEPSEEK_API_KEY": "bench",
+        "EMBEDDING_BACKEND": "hashing",
+        "VECTOR_DB_DIR": os.path.join(workdir, "vector_db"),
+        "PARSE_CACHE_PATH": os.path.join(workdir, "cache", "parse_cache.db"),
+        "HEALTH_CHECK_INTERVAL": "5",
+        # 预热完成后才开始计时，避免首批请求包含组件初始化时间
+        "LAZY_INIT": "0",
+    })
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+
+    _start_server(create_stub_app(args.llm_latency, args.llm_tps, args.llm_tokens), llm_port)
+    import main as backend
+    _start_server(backend.app, api_port)
+    base_url = f"http://127.0.0.1:{api_port}"
+    print(f"模拟大模型: http://127.0.0.1:{llm_port}  后端: {base_url}  工作目录: {workdir}")
+
+    workload = Workload(parse_mix(args.mix), users=args.users, seed=args.seed)
+    if args.warmup_uploads:
+        print(f"预热：上传 {args.warmup_uploads} 份报告...")
+        warmup = Workload({"upload": 1}, users=args.users, seed=args.seed + 1)
+        asyncio.run(replay(base_url, warmup, args.warmup_uploads, min(args.concurrency, args.warmup_uploads)))
+
+    samples, elapsed = asyncio.run(replay(base_url, workload, args.requests, args.concurrency, args.duration))
+    results = summarize(samples, elapsed)
+
+    print_report(results, elapsed, baseline)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "name": args.save_baseline,
+                "created_at": datetime.now().isoformat(),
+                "config": {key: value for key, value in vars(args).items() if key not in ("save_baseline", "compare")},
+                "elapsed_s": round(elapsed, 3),
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存: {path}")
+
+
+if __name__ == "__main__":
+    main()
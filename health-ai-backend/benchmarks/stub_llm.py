@@ -0,0 +1,85 @@
+"""
+本地模拟的OpenAI兼容大模型服务
+
+用于离线基准测试：可配置首token延迟、生成速度和回答长度，支持普通和流式
+（stream=True）两种调用方式，并返回usage字段。
+
+单独运行：python -m benchmarks.stub_llm --port 9100 --latency 0.5 --tokens-per-second 40
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+STUB_TOKEN = "健康"
+
+
+def create_stub_app(latency: float = 0.5, tokens_per_second: float = 40, completion_tokens: int = 64) -> FastAPI:
+    """创建模拟大模型服务
+
+    :param latency: 首token延迟（秒）
+    :param tokens_per_second: 生成速度，0表示瞬间生成
+    :param completion_tokens: 最多生成的token数（不超过请求的max_tokens）
+    """
+    app = FastAPI(title="Stub LLM")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "stub-model", "object": "model"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        n_tokens = min(completion_tokens, payload.get("max_tokens") or completion_tokens)
+        prompt_tokens = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": n_tokens,
+                 "total_tokens": prompt_tokens + n_tokens}
+        interval = 1 / tokens_per_second if tokens_per_second > 0 else 0
+        created = int(time.time())
+
+        if payload.get("stream"):
+            async def event_stream():
+                await asyncio.sleep(latency)
+                for i in range(n_tokens):
+                    chunk = {"id": "stub", "object": "chat.completion.chunk", "created": created,
+                             "choices": [{"index": 0, "delta": {"content": STUB_TOKEN}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                    if interval and i < n_tokens - 1:
+                        await asyncio.sleep(interval)
+                final = {"id": "stub", "object": "chat.completion.chunk", "created": created,
+                         "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+        await asyncio.sleep(latency + interval * max(n_tokens - 1, 0))
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "created": created,
+            "model": payload.get("model", "stub-model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": STUB_TOKEN * n_tokens},
+                         "finish_reason": "stop"}],
+            "usage": usage
+        }
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="本地模拟大模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.5, help="首token延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="生成速度（token/秒）")
+    parser.add_argument("--completion-tokens", type=int, default=64, help="回答长度（token）")
+    args = parser.parse_args()
+
+    uvicorn.run(create_stub_app(args.latency, args.tokens_per_second, args.completion_tokens),
+                host=args.host, port=args.port, log_level="warning")
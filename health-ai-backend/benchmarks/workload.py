@@ -0,0 +1,168 @@
+"""
+基准测试的样本数据和混合负载定义
+"""
+import asyncio
+import io
+import random
+import time
+from typing import Dict, List
+
+import httpx
+
+# 化验项目：名称、单位、参考范围、取值范围
+LAB_ITEMS = [
+    ("WBC", "10^9/L", "3.5-9.5", (3.0, 11.0)),
+    ("PLT", "10^9/L", "125-350", (100, 400)),
+    ("HGB", "g/L", "130-175", (110, 180)),
+    ("ALT", "U/L", "9-50", (5, 90)),
+    ("AST", "U/L", "15-40", (10, 80)),
+    ("GLU", "mmol/L", "3.9-6.1", (3.5, 9.0)),
+    ("TC", "mmol/L", "0-5.2", (3.0, 7.5)),
+    ("TG", "mmol/L", "0-1.7", (0.5, 3.5)),
+    ("CREA", "umol/L", "57-111", (40, 140)),
+    ("UA", "umol/L", "208-428", (150, 550)),
+]
+
+QUESTIONS = [
+    "如何改善睡眠质量？",
+    "怎样才能睡得更好？",
+    "我的转氨酶偏高需要注意什么？",
+    "ALT偏高怎么办",
+    "血脂高饮食上要注意什么？",
+    "我的血糖正常吗？",
+    "血小板计数是多少？",
+    "最近体检有哪些异常指标？",
+]
+
+SEARCH_QUERIES = ["ALT", "血小板计数", "血糖", "血脂", "肝功能", "尿酸偏高"]
+
+
+def make_report_lines(rng: random.Random, title: str) -> List[str]:
+    lines = [title, f"Date: 2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "Lab Results"]
+    for name, unit, ref, (low, high) in LAB_ITEMS:
+        lines.append(f"{name} {rng.uniform(low, high):.1f} {unit} ref {ref}")
+    return lines
+
+
+def make_pdf(lines: List[str]) -> bytes:
+    """生成只含ASCII文本层的最小PDF"""
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    stream = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(f"({escape(line)}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        "/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream",
+    ]
+
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1"))
+    xref = output.tell()
+    output.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for offset in offsets:
+        output.write(f"{offset:010d} 00000 n \n".encode("latin-1"))
+    output.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1"))
+    return output.getvalue()
+
+
+def make_png(lines: List[str]) -> bytes:
+    """生成白底黑字的化验单图片"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (1000, 40 + 32 * len(lines)), color=255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((30, 20 + 32 * i), line, fill=0)
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+class Workload:
+    """混合负载：上传、问答、档案查询、搜索按权重随机组合（固定随机种子，可复现）"""
+
+    def __init__(self, mix: Dict[str, float], users: int = 20, seed: int = 42,
+                 unique_uploads: bool = True, job_timeout: float = 120):
+        self.mix = {name: weight for name, weight in mix.items() if weight > 0}
+        self.users = [f"bench_user_{i}" for i in range(users)]
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.unique_uploads = unique_uploads
+        self.job_timeout = job_timeout
+        self._upload_seq = 0
+
+    def next_operation(self) -> str:
+        names = list(self.mix)
+        return self.rng.choices(names, weights=[self.mix[name] for name in names])[0]
+
+    def _next_upload(self):
+        self._upload_seq += 1
+        # 不同负载实例（如预热和正式测试）生成的报告内容互不重复
+        seed = f"{self.seed}:{self._upload_seq}" if self.unique_uploads else "0"
+        lines = make_report_lines(random.Random(seed), f"Health Checkup Report #{seed}")
+        if self._upload_seq % 2:
+            return (f"report_{seed}.pdf", make_pdf(lines), "application/pdf")
+        return (f"report_{seed}.png", make_png(lines), "image/png")
+
+    async def run(self, name: str, client: httpx.AsyncClient, record) -> None:
+        """执行一次操作，通过 record(endpoint, seconds, ok) 记录结果"""
+        user_id = self.rng.choice(self.users)
+
+        if name == "upload":
+            start = time.perf_counter()
+            response = await client.post("/api/upload/medical-report", params={"user_id": user_id},
+                                         files={"file": self._next_upload()})
+            record("upload", time.perf_counter() - start, response.status_code == 200)
+            job_id = response.json().get("job_id") if response.status_code == 200 else None
+            if job_id:
+                # 上传任务端到端耗时：从提交到后台解析、入库完成
+                ok = await self._wait_job(client, job_id)
+                record("upload_job", time.perf_counter() - start, ok)
+
+        elif name in ("ask", "ask_stream"):
+            path = "/api/ask-health-question" + ("/stream" if name == "ask_stream" else "")
+            params = {"question": self.rng.choice(QUESTIONS), "user_id": user_id}
+            start = time.perf_counter()
+            if name == "ask_stream":
+                async with client.stream("POST", path, params=params) as response:
+                    first_byte = None
+                    async for _ in response.aiter_bytes():
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - start
+                    ok = response.status_code == 200
+                record("ask_stream_ttfb", first_byte or 0.0, ok)
+            else:
+                response = await client.post(path, params=params)
+                ok = response.status_code == 200
+            record(name, time.perf_counter() - start, ok)
+
+        elif name == "profile":
+            start = time.perf_counter()
+            response = await client.get(f"/api/health-profile/{user_id}")
+            record("profile", time.perf_counter() - start, response.status_code == 200)
+
+        elif name == "search":
+            start = time.perf_counter()
+            response = await client.get("/api/search-health-data",
+                                        params={"query": self.rng.choice(SEARCH_QUERIES), "user_id": user_id})
+            record("search", time.perf_counter() - start, response.status_code == 200)
+
+        else:
+            raise ValueError(f"未知的操作类型: {name}")
+
+    async def _wait_job(self, client: httpx.AsyncClient, job_id: str) -> bool:
+        deadline = time.perf_counter() + self.job_timeout
+        while time.perf_counter() < deadline:
+            job = (await client.get(f"/api/jobs/{job_id}")).json()
+            if job.get("status") in ("success", "failed"):
+                return job["status"] == "success"
+            await asyncio.sleep(0.05)
+        return False
@@ -1,15 +1,48 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import shutil
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.routing import Match
+import asyncio
+import json
 import os
-from datetime import datetime
-from typing import Optional
+import shutil
+import time
+import uuid
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import List, Optional
 
 # 导入自定义模块
-from src.parsers.pdf_parser import PDFHealthParser
-from src.parsers.image_parser import ImageHealthParser
-from src.models.vector_store import HealthVectorStore
+from src.models.embedder import create_embedder
+from src.models.passage_store import HealthPassageStore
 from src.models.deepseek_client import DeepSeekClient
+from src.models.async_deepseek_client import AsyncDeepSeekClient
+from src.services import parse_worker, pdf_pages
+from src.services.job_manager import JobManager, JOB_RUNNING, JOB_SUCCESS, JOB_FAILED
+from src.services.upload_store import UploadStore
+from src.services.answer_cache import SemanticAnswerCache
+from src.services.context_builder import HealthContextBuilder
+from src.services.profile_store import ProfileStore
+from src.services.lab_store import LabResultStore
+from src.services.wearable_store import WearableStore, RESOLUTIONS as WEARABLE_RESOLUTIONS
+from src.utils.lab_extractor import extract_lab_results, extract_report_date, canonical_test_code
+from src.services.health_monitor import HealthMonitor
+from src.services import metrics
+from src.services.metrics import track_stage, observe_payload, observe_stage
+from src.utils.lazy import LazyComponent
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await _startup()
+    try:
+        yield
+    finally:
+        await _shutdown()
 
 # 初始化应用 - 中文配置
 app = FastAPI(
@@ -46,7 +79,8 @@ app = FastAPI(
     contact={
         "name": "开发团队",
         "url": "http://localhost:8000",
-    }
+    },
+    lifespan=lifespan
 )
 
 # CORS配置
@@ -57,15 +91,603 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化组件
-pdf_parser = PDFHealthParser()
-image_parser = ImageHealthParser()
-vector_store = HealthVectorStore()
-deepseek_client = DeepSeekClient()
+def _route_template(request: Request) -> str:
+    # 使用路由模板（如 /api/jobs/{job_id}）作为指标标签，避免标签基数过高
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    endpoint = _route_template(request)
+    token = metrics.current_endpoint.set(endpoint)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                        endpoint=endpoint, status=status)
+        metrics.current_endpoint.reset(token)
+
+
+# 初始化组件：打开数据库、连接向量库等耗时操作推迟到启动预热或首次使用时，
+# import main 只创建轻量对象（编码器模型同样在首次使用时才加载）
+embedder = create_embedder()
+vector_store = LazyComponent(HealthPassageStore, embedder=embedder)
+deepseek_client = LazyComponent(DeepSeekClient)
+llm_client = AsyncDeepSeekClient(on_usage=metrics.record_llm_usage)
+answer_cache = SemanticAnswerCache(
+    embedder,
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92)),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 10000)),
+    # 其他worker写入新数据时本进程收不到 invalidate_user，按用户段落数判断缓存是否过期
+    data_version=lambda user_id: vector_store.data_version(user_id)
+)
 
 # 确保上传目录存在
 UPLOAD_DIR = "./data/uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+upload_store = LazyComponent(UploadStore, UPLOAD_DIR)
+profile_store = LazyComponent(ProfileStore)
+lab_store = LazyComponent(LabResultStore)
+wearable_store = LazyComponent(WearableStore)
+
+# 增量更新健康档案时，新增文档内容的最大字符数
+PROFILE_DELTA_MAX_CHARS = int(os.getenv("PROFILE_DELTA_MAX_CHARS", 4000))
+
+# 问答上下文：多检索一些候选段落，去重、MMR排序后按token预算打包
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", 8))
+PROFILE_CONTEXT_MAX_TOKENS = int(os.getenv("PROFILE_CONTEXT_MAX_TOKENS", 1500))
+context_builder = HealthContextBuilder(
+    max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", 800)),
+    duplicate_threshold=float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", 0.95)),
+    mmr_lambda=float(os.getenv("CONTEXT_MMR_LAMBDA", 0.7))
+)
+
+# 固定的内部查询，启动时预先编码
+PROFILE_SUMMARY_QUERY = "健康档案摘要"
+DEFAULT_QUESTION = "如何改善睡眠质量？"
+
+ALLOWED_TYPES = ['application/pdf', 'image/jpeg', 'image/png', 'image/jpg']
+
+# 批量问答：单次请求的最大问题数、同时进行的大模型调用数
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 500))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", 4))
+
+# 依赖健康检查（后台定时探测）
+health_monitor = HealthMonitor(
+    interval=float(os.getenv("HEALTH_CHECK_INTERVAL", 30)),
+    timeout=float(os.getenv("HEALTH_CHECK_TIMEOUT", 10))
+)
+
+# 后台处理池：PDF解析/OCR在进程池中执行，向量化写入在线程池中执行
+# PARSE_WORKERS 是整台机器的解析进程数，多worker部署（run.py --workers，设置 WEB_WORKERS）时由各worker平分
+WEB_WORKERS = max(1, int(os.getenv("WEB_WORKERS", 1)))
+PARSE_WORKERS = max(1, int(os.getenv("PARSE_WORKERS", os.cpu_count() or 2)) // WEB_WORKERS)
+# 逐页解析PDF时同时提交的页数：保持每个解析进程都有下一页可做，又不把整个文件压进队列
+PDF_PAGES_IN_FLIGHT = pdf_pages.PDF_PAGES_IN_FLIGHT or 2 * PARSE_WORKERS
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+
+# 进程池的队列在创建时即建立，多进程部署时必须在fork之后由各worker各自创建
+parse_executor = LazyComponent(ProcessPoolExecutor, max_workers=PARSE_WORKERS, initializer=parse_worker.init_worker)
+ingest_executor = LazyComponent(ThreadPoolExecutor, max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+job_manager = LazyComponent(JobManager)
+parse_cache = LazyComponent(parse_worker.create_parse_cache)
+
+# 启动预热：LAZY_INIT=1（默认）时后台预热，服务立即可以响应，预热完成前 /readyz 返回503；
+# LAZY_INIT=0 时预热完成后才开始接收请求
+LAZY_INIT = os.getenv("LAZY_INIT", "1") != "0"
+LAZY_COMPONENTS = {
+    "vector_store": vector_store,
+    "deepseek_client": deepseek_client,
+    "upload_store": upload_store,
+    "profile_store": profile_store,
+    "lab_store": lab_store,
+    "wearable_store": wearable_store,
+    "parse_cache": parse_cache,
+    "job_manager": job_manager,
+    "parse_executor": parse_executor,
+    "ingest_executor": ingest_executor,
+}
+_startup_state = {"ready": False, "warmup_seconds": None, "error": None}
+# 解析进程池重建记录（工作进程段错误或被OOM杀掉后进程池整体不可用）
+_parse_pool_state = {"restarts": 0, "last_broken_at": None, "last_error": None}
+
+# 页数不少于该值的PDF按页并行解析，每解析完成该页数即分批入库
+PDF_PAGE_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PAGE_PARALLEL_MIN_PAGES", 4))
+PDF_STREAM_BATCH_PAGES = int(os.getenv("PDF_STREAM_BATCH_PAGES", 8))
+PDF_PAGES_CACHE_VERSION = f"pdf-pages:{parse_worker.PDF_PARSER_VERSION}"
+
+# 批量上传时每个进程池任务识别的图片数
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", 4))
+
+# 持有后台任务的引用，防止任务被垃圾回收
+_background_tasks = set()
+# 正在进行的健康档案更新（按用户去重）
+_profile_refreshes = {}
+
+
+async def _probe_deepseek():
+    return await llm_client.ping()
+
+
+async def _probe_vector_store():
+    if not vector_store.lazy_initialized:
+        raise RuntimeError("向量数据库尚未初始化")
+    return {"passages": await run_in_threadpool(vector_store.ping)}
+
+
+def _check_upload_directory():
+    if not os.path.isdir(UPLOAD_DIR) or not os.access(UPLOAD_DIR, os.W_OK):
+        raise RuntimeError(f"上传目录不可写: {UPLOAD_DIR}")
+    usage = shutil.disk_usage(UPLOAD_DIR)
+    return {"free_mb": usage.free // (1024 * 1024)}
+
+
+async def _probe_upload_directory():
+    return await run_in_threadpool(_check_upload_directory)
+
+
+def _recover_parse_executor(executor, error: BaseException) -> None:
+    """丢弃已损坏的解析进程池，下次使用时由 LazyComponent 重新创建"""
+    if parse_executor.lazy_reset(executor):
+        executor.shutdown(wait=False, cancel_futures=True)
+        _parse_pool_state["restarts"] += 1
+        _parse_pool_state["last_broken_at"] = datetime.now().isoformat()
+        _parse_pool_state["last_error"] = str(error) or type(error).__name__
+        print(f"解析进程池已损坏，将重新创建: {_parse_pool_state['last_error']}")
+
+
+async def _run_parse(fn, *args):
+    """在解析进程池中执行任务
+
+    进程池损坏（BrokenProcessPool）时丢弃并重建，本次任务照常抛出异常而不重试
+    （导致崩溃的可能正是这个文件），之后的任务使用新的进程池。
+    """
+    executor = parse_executor.lazy_instance()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    except BrokenProcessPool as e:
+        _recover_parse_executor(executor, e)
+        raise
+
+
+async def _probe_parse_pool():
+    # 提交一个空任务：进程池损坏时本次探测失败（/readyz 返回503）并重建，下次探测恢复
+    await _run_parse(parse_worker.warm_up)
+    return dict(_parse_pool_state)
+
+
+async def _warm_up():
+    """初始化各组件、加载编码模型并拉起解析进程，完成后标记就绪"""
+    start = time.perf_counter()
+    try:
+        for component in LAZY_COMPONENTS.values():
+            await run_in_threadpool(component.lazy_instance)
+        await run_in_threadpool(embedder.preload_queries, [PROFILE_SUMMARY_QUERY, DEFAULT_QUESTION])
+        await asyncio.gather(*[_run_parse(parse_worker.warm_up) for _ in range(PARSE_WORKERS)])
+        _startup_state["ready"] = True
+    except Exception as e:
+        _startup_state["error"] = str(e) or type(e).__name__
+        print(f"启动预热失败: {_startup_state['error']}")
+    finally:
+        _startup_state["warmup_seconds"] = round(time.perf_counter() - start, 3)
+    # 立即刷新一次探测结果，不必等到下一个探测周期
+    await health_monitor.check_all()
+
+
+async def _startup():
+    if os.getenv("METRICS_DIR"):
+        metrics.registry.enable_multiprocess(os.environ["METRICS_DIR"])
+    health_monitor.register("deepseek_api", _probe_deepseek, critical=False)
+    health_monitor.register("vector_database", _probe_vector_store)
+    health_monitor.register("upload_directory", _probe_upload_directory)
+    health_monitor.register("parse_pool", _probe_parse_pool)
+    health_monitor.start()
+    if LAZY_INIT:
+        _start_background(_warm_up())
+    else:
+        await _warm_up()
+
+
+async def _shutdown():
+    await health_monitor.stop()
+    # 只关闭已经初始化过的组件
+    for name in ("parse_executor", "ingest_executor"):
+        if LAZY_COMPONENTS[name].lazy_initialized:
+            LAZY_COMPONENTS[name].shutdown(wait=False, cancel_futures=True)
+    for name in ("upload_store", "parse_cache", "job_manager", "profile_store", "lab_store", "wearable_store", "vector_store"):
+        if LAZY_COMPONENTS[name].lazy_initialized:
+            LAZY_COMPONENTS[name].close()
+    await llm_client.aclose()
+    metrics.registry.close()
+
+
+def _startup_info() -> dict:
+    return {
+        **_startup_state,
+        "lazy_init": LAZY_INIT,
+        "parse_pool": dict(_parse_pool_state),
+        "components": {
+            name: component.lazy_init_seconds if component.lazy_initialized else None
+            for name, component in LAZY_COMPONENTS.items()
+        },
+    }
+
+
+async def _update_job(job_id: str, **fields) -> None:
+    # 任务状态存放在SQLite中，写入可能等锁，不在事件循环中执行
+    await run_in_threadpool(job_manager.update_job, job_id, **fields)
+
+
+async def _large_pdf_pages(upload: dict, content_type: str) -> int:
+    """需要按页并行解析的PDF返回页数，其他文件返回0"""
+    if content_type != 'application/pdf':
+        return 0
+    try:
+        page_count = await _run_parse(pdf_pages.count_pages, upload["file_path"])
+    except Exception:
+        # 无法读取页数时交给PDF解析器整体处理
+        return 0
+    return page_count if page_count >= PDF_PAGE_PARALLEL_MIN_PAGES else 0
+
+
+async def _parse_pdf_pages(upload: dict, page_count: int, on_page=None) -> dict:
+    """按页并行解析PDF；on_page(page) 在每页完成时调用（按完成先后）"""
+    parse_result = await run_in_threadpool(parse_cache.get, upload["sha256"], PDF_PAGES_CACHE_VERSION)
+    if parse_result is not None:
+        return parse_result
+
+    pages = []
+    executor = parse_executor.lazy_instance()
+    try:
+        async for page in pdf_pages.iter_pages(executor, upload["file_path"], page_count,
+                                               max_in_flight=PDF_PAGES_IN_FLIGHT):
+            pages.append(page)
+            if on_page is not None:
+                await on_page(page)
+    except BrokenProcessPool as e:
+        _recover_parse_executor(executor, e)
+        raise
+    parse_result = pdf_pages.merge_pages(pages, page_count)
+    if parse_result["success"]:
+        await run_in_threadpool(parse_cache.put, upload["sha256"], PDF_PAGES_CACHE_VERSION, parse_result)
+    return parse_result
+
+
+async def _parse_image_batch(items: list) -> list:
+    """批量解析图片（作为一个进程池任务），已有解析结果的图片直接复用"""
+    results = [await _stored_parse_result(item["upload"], item["content_type"]) for item in items]
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        with track_stage("parse", content_type="image_batch", images=len(missing)):
+            parsed = await _run_parse(parse_worker.parse_images, [
+                (items[i]["upload"]["file_path"], items[i]["content_type"], items[i]["upload"]["sha256"])
+                for i in missing
+            ])
+        for i, parse_result in zip(missing, parsed):
+            await _save_parse_result(items[i]["upload"], items[i]["content_type"], parse_result)
+            results[i] = parse_result
+    return results
+
+
+async def _stored_parse_result(upload: dict, content_type: str) -> Optional[dict]:
+    """相同内容、当前解析器版本的已有解析结果；解析器版本升级后返回None，重新解析"""
+    return await run_in_threadpool(upload_store.get_parse_result, upload["sha256"],
+                                   parse_worker.parser_version(content_type))
+
+
+async def _save_parse_result(upload: dict, content_type: str, parse_result: dict) -> None:
+    if parse_result.get("success", False):
+        observe_payload("parsed_text_chars", len(parse_result.get("raw_text") or parse_result.get("text", "")))
+        await run_in_threadpool(upload_store.save_parse_result, upload["sha256"], upload["file_id"],
+                                upload["size"], content_type, parse_result, parse_worker.parser_version(content_type))
+
+
+async def _parse_upload(upload: dict, content_type: str) -> dict:
+    """解析上传文件，相同内容复用已有解析结果"""
+    parse_result = await _stored_parse_result(upload, content_type)
+    if parse_result is not None:
+        return parse_result
+
+    page_count = await _large_pdf_pages(upload, content_type)
+    with track_stage("parse", content_type=content_type):
+        if page_count:
+            parse_result = await _parse_pdf_pages(upload, page_count)
+        else:
+            parse_result = await _run_parse(
+                parse_worker.parse_report, upload["file_path"], content_type, upload["sha256"]
+            )
+    await _save_parse_result(upload, content_type, parse_result)
+    return parse_result
+
+
+def _build_document(parse_result: dict, file_id: str, user_id: str) -> dict:
+    return {
+        "content": parse_result.get("raw_text") or parse_result.get("text", ""),
+        "data_type": "medical_report",
+        "timestamp": datetime.now().isoformat(),
+        "source": file_id,
+        "user_id": user_id
+    }
+
+
+def _record_lab_results(user_id: str, source: str, text: str, timestamp: str) -> int:
+    """提取报告中的检验结果写入结构化存储；报告中没有日期时以入库时间为准"""
+    results = extract_lab_results(text)
+    if not results:
+        return 0
+    observed_at = extract_report_date(text) or timestamp[:10]
+    return lab_store.add_results(user_id, source, observed_at, results)
+
+
+async def _store_documents(documents: list, uploads: list) -> dict:
+    """一次性把多个文档写入向量数据库，并记录每个上传对应的向量ID"""
+    loop = asyncio.get_running_loop()
+    with track_stage("embedding", documents=len(documents)):
+        storage = await loop.run_in_executor(ingest_executor, vector_store.add_health_documents, documents)
+    if storage["success"]:
+        for document, upload, doc_id, chunk_ids in zip(documents, uploads, storage["document_ids"],
+                                                       storage["chunk_ids"]):
+            await run_in_threadpool(upload_store.add_user_ref, upload["sha256"], document["user_id"], chunk_ids)
+            # 记录为健康档案的增量数据
+            await run_in_threadpool(profile_store.add_pending, document["user_id"], doc_id, document["content"])
+            await run_in_threadpool(_record_lab_results, document["user_id"], document["source"],
+                                    document["content"], document["timestamp"])
+        # 用户有新数据，之前缓存的回答不再可信
+        for user_id in {document["user_id"] for document in documents}:
+            answer_cache.invalidate_user(user_id)
+    return storage
+
+
+async def _process_pdf_pages_job(job_id: str, upload: dict, user_id: str, page_count: int):
+    """大型PDF：按页并行解析，按页序每凑够 PDF_STREAM_BATCH_PAGES 页即切分、编码、入库"""
+    loop = asyncio.get_running_loop()
+    doc_id = uuid.uuid4().hex
+    ready, buffer, chunk_ids = {}, [], []
+    progress = {"next_page": 0, "done": 0}
+
+    async def flush():
+        text = "\n\n".join(text for text in buffer if text)
+        buffer.clear()
+        if not text.strip():
+            return
+        document = dict(_build_document({"raw_text": text}, upload["file_id"], user_id),
+                        doc_id=doc_id, chunk_offset=len(chunk_ids))
+        with track_stage("embedding", documents=1):
+            storage = await loop.run_in_executor(ingest_executor, vector_store.add_health_documents, [document])
+        if not storage["success"]:
+            raise RuntimeError(f"向量存储失败: {storage.get('error')}")
+        chunk_ids.extend(storage["chunk_ids"][0])
+
+    async def on_page(page):
+        ready[page["page"]] = page["text"]
+        progress["done"] += 1
+        while progress["next_page"] in ready:
+            buffer.append(ready.pop(progress["next_page"]))
+            progress["next_page"] += 1
+        if len(buffer) >= PDF_STREAM_BATCH_PAGES:
+            await flush()
+        await _update_job(job_id, progress=10 + int(progress["done"] / page_count * 80),
+                          pages_done=progress["done"], pages_total=page_count)
+
+    with track_stage("parse", content_type="application/pdf", pages=page_count):
+        parse_result = await _parse_pdf_pages(upload, page_count, on_page)
+    if not parse_result.get("success", False):
+        await _update_job(job_id, status=JOB_FAILED, stage="parsing",
+                          error=f"文件解析失败: {parse_result.get('error', '未知错误')}")
+        return
+    await _save_parse_result(upload, "application/pdf", parse_result)
+
+    if progress["done"]:
+        await flush()
+        await run_in_threadpool(upload_store.add_user_ref, upload["sha256"], user_id, chunk_ids)
+        await run_in_threadpool(profile_store.add_pending, user_id, doc_id, parse_result["raw_text"])
+        await run_in_threadpool(_record_lab_results, user_id, upload["file_id"], parse_result["raw_text"],
+                                datetime.now().isoformat())
+        answer_cache.invalidate_user(user_id)
+        storage = {"success": True}
+    else:
+        # 命中解析缓存，没有逐页结果，整体入库
+        storage = await _store_documents([_build_document(parse_result, upload["file_id"], user_id)], [upload])
+    if storage["success"]:
+        _start_background(_refresh_profile_quietly(user_id))
+
+    await _update_job(job_id, status=JOB_SUCCESS, stage="done", progress=100, result={
+        "file_id": upload["file_id"],
+        "parsed_data": parse_result,
+        "vector_storage": "success" if storage["success"] else "failed"
+    })
+
+
+async def _process_upload_job(job_id: str, upload: dict, content_type: str, user_id: str):
+    """后台处理上传任务：解析文件并写入向量数据库"""
+    try:
+        # 解析文件内容
+        await _update_job(job_id, status=JOB_RUNNING, stage="parsing", progress=10)
+        # 解析器升级后重新上传已入库的内容：只更新解析结果，不重复写入向量库
+        already_stored = await run_in_threadpool(upload_store.get_user_ref, upload["sha256"], user_id) is not None
+        if not already_stored and await _stored_parse_result(upload, content_type) is None:
+            page_count = await _large_pdf_pages(upload, content_type)
+            if page_count:
+                await _process_pdf_pages_job(job_id, upload, user_id, page_count)
+                return
+        parse_result = await _parse_upload(upload, content_type)
+
+        if not parse_result.get("success", False):
+            await _update_job(job_id, status=JOB_FAILED, stage="parsing",
+                              error=f"文件解析失败: {parse_result.get('error', '未知错误')}")
+            return
+
+        # 存储到向量数据库
+        await _update_job(job_id, stage="embedding", progress=60)
+        if already_stored:
+            storage = {"success": True}
+        else:
+            document_data = _build_document(parse_result, upload["file_id"], user_id)
+            storage = await _store_documents([document_data], [upload])
+            if storage["success"]:
+                _start_background(_refresh_profile_quietly(user_id))
+
+        await _update_job(job_id, status=JOB_SUCCESS, stage="done", progress=100, result={
+            "file_id": upload["file_id"],
+            "parsed_data": parse_result,
+            "vector_storage": "success" if storage["success"] else "failed"
+        })
+
+    except Exception as e:
+        await _update_job(job_id, status=JOB_FAILED, error=f"处理失败: {str(e)}")
+
+
+async def _process_bulk_job(job_id: str, items: list):
+    """后台处理批量上传：并行解析所有文件，再一次性写入向量数据库"""
+    try:
+        await _update_job(job_id, status=JOB_RUNNING, stage="parsing", progress=0)
+        parsed_count = 0
+
+        parse_results = [None] * len(items)
+
+        async def parse_group(indexes):
+            # PDF逐个解析；图片按 OCR_BATCH_SIZE 张一组批量识别
+            nonlocal parsed_count
+            group = [items[i] for i in indexes]
+            try:
+                if group[0]["content_type"] == 'application/pdf':
+                    results = [await _parse_upload(group[0]["upload"], group[0]["content_type"])]
+                else:
+                    results = await _parse_image_batch(group)
+            except Exception as e:
+                results = [{"success": False, "error": str(e)}] * len(group)
+            for i, result in zip(indexes, results):
+                parse_results[i] = result
+            parsed_count += len(group)
+            await _update_job(job_id, progress=int(parsed_count / len(items) * 60))
+
+        pdf_indexes = [i for i, item in enumerate(items) if item["content_type"] == 'application/pdf']
+        image_indexes = [i for i, item in enumerate(items) if item["content_type"] != 'application/pdf']
+        groups = [[i] for i in pdf_indexes] + [
+            image_indexes[start:start + OCR_BATCH_SIZE] for start in range(0, len(image_indexes), OCR_BATCH_SIZE)
+        ]
+        await asyncio.gather(*[parse_group(group) for group in groups])
+
+        documents, uploads, file_results = [], [], []
+        for item, parse_result in zip(items, parse_results):
+            file_id = item["upload"]["file_id"]
+            if parse_result.get("success", False):
+                documents.append(_build_document(parse_result, file_id, item["user_id"]))
+                uploads.append(item["upload"])
+                file_results.append({"file_id": file_id, "user_id": item["user_id"], "status": "success"})
+            else:
+                file_results.append({"file_id": file_id, "user_id": item["user_id"], "status": "failed",
+                                     "error": f"文件解析失败: {parse_result.get('error', '未知错误')}"})
+
+        # 所有成功解析的文档一次写入向量数据库
+        await _update_job(job_id, stage="embedding", progress=60)
+        storage = await _store_documents(documents, uploads) if documents else {"success": True}
+
+        await _update_job(job_id, status=JOB_SUCCESS, stage="done", progress=100, result={
+            "total": len(items),
+            "ingested": len(documents) if storage["success"] else 0,
+            "files": file_results,
+            "vector_storage": "success" if storage["success"] else "failed"
+        })
+
+    except Exception as e:
+        await _update_job(job_id, status=JOB_FAILED, error=f"批量处理失败: {str(e)}")
+
+
+async def _generate_profile_summary(user_id: str) -> dict:
+    """生成健康档案摘要：首次全量生成，之后基于旧摘要和新增文档增量更新"""
+    previous = await run_in_threadpool(profile_store.get_summary, user_id)
+    pending = await run_in_threadpool(profile_store.get_pending, user_id)
+    if previous is not None and not pending:
+        return previous
+
+    system_message = {"role": "system", "content": "你是一个专业的健康管理专家，擅长总结健康档案。"}
+    document_count = await run_in_threadpool(vector_store.get_user_documents_count, user_id)
+
+    if previous is None or previous["document_count"] == 0:
+        # 搜索用户的所有健康数据
+        with track_stage("vector_search"):
+            search_results = await run_in_threadpool(
+                vector_store.search_similar, PROFILE_SUMMARY_QUERY, user_id, 10, True
+            )
+
+        # 使用DeepSeek生成健康档案摘要
+        if search_results["success"] and search_results["results"]:
+            with track_stage("prompt_build"):
+                packed = context_builder.build(search_results["results"], header="健康数据：",
+                                               max_tokens=PROFILE_CONTEXT_MAX_TOKENS)
+            observe_payload("context_tokens", packed["tokens"])
+            context_data = packed["context"]
+
+            summary_prompt = f"请基于以下健康数据，生成一份简洁的健康档案摘要：\n\n{context_data}"
+            messages = [system_message, {"role": "user", "content": summary_prompt}]
+            with track_stage("llm_call"):
+                summary = await llm_client.chat_completion(messages, max_tokens=500)
+        else:
+            summary = "暂无健康数据"
+    else:
+        # 增量更新：旧摘要 + 新增文档；新增内容超过 PROFILE_DELTA_MAX_CHARS 时分多轮更新，
+        # 每轮只纳入放得下的文档（单个超长文档截断后单独一轮），直到没有待纳入的文档
+        summary = previous["summary"]
+        remaining = pending
+        while remaining:
+            batch, size = [], 0
+            for doc in remaining:
+                if batch and size + len(doc["content"]) > PROFILE_DELTA_MAX_CHARS:
+                    break
+                batch.append(doc)
+                size += len(doc["content"]) + 2
+            remaining = remaining[len(batch):]
+
+            delta_data = "\n\n".join(doc["content"] for doc in batch)[:PROFILE_DELTA_MAX_CHARS]
+            summary_prompt = (
+                f"以下是用户现有的健康档案摘要：\n\n{summary}\n\n"
+                f"用户新增了以下健康数据：\n\n{delta_data}\n\n"
+                "请结合新增数据更新健康档案摘要，保持简洁。"
+            )
+            messages = [system_message, {"role": "user", "content": summary_prompt}]
+            with track_stage("llm_call"):
+                summary = await llm_client.chat_completion(messages, max_tokens=500)
+
+    # 只移除本次读取到的文档，生成期间新写入的留到下次
+    updated_at = await run_in_threadpool(
+        profile_store.save_summary, user_id, summary, document_count, [doc["doc_id"] for doc in pending]
+    )
+    return {"summary": summary, "document_count": document_count, "updated_at": updated_at}
+
+
+def _refresh_profile(user_id: str) -> asyncio.Task:
+    """启动（或复用进行中的）健康档案更新任务"""
+    task = _profile_refreshes.get(user_id)
+    if task is None or task.done():
+        task = asyncio.create_task(_generate_profile_summary(user_id))
+        _profile_refreshes[user_id] = task
+        task.add_done_callback(
+            lambda t: _profile_refreshes.pop(user_id, None) if _profile_refreshes.get(user_id) is t else None
+        )
+    return task
+
+
+async def _refresh_profile_quietly(user_id: str):
+    try:
+        await _refresh_profile(user_id)
+    except Exception as e:
+        print(f"更新健康档案失败: {e}")
+
+
+def _start_background(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 
 @app.get("/", summary="服务状态检查", description="检查后端API服务是否正常运行")
@@ -77,66 +699,189 @@ async def root():
     }
 
 
+@app.get("/healthz", summary="存活检查", description="进程存活即返回正常，不访问任何依赖")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz", summary="就绪检查", description="启动预热完成且后台探测的关键依赖均正常时返回200")
+async def readyz():
+    ready = _startup_state["ready"] and health_monitor.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "startup": _startup_info(),
+                 "checks": health_monitor.snapshot()}
+    )
+
+
 @app.post("/api/upload/medical-report",
           summary="上传医疗报告",
-          description="上传并解析医疗健康报告文件，支持PDF和图片格式")
+          description="上传医疗健康报告文件（支持PDF和图片格式），立即返回任务ID，解析在后台进行")
 async def upload_medical_report(
         file: UploadFile = File(..., description="医疗报告文件（PDF、JPG、PNG格式）"),
         user_id: str = "default_user"
 ):
-    """上传医疗报告（PDF或图片）"""
+    """上传医疗报告（PDF或图片），通过 /api/jobs/{job_id} 查询解析进度"""
     try:
         # 验证文件类型
-        allowed_types = ['application/pdf', 'image/jpeg', 'image/png', 'image/jpg']
-        if file.content_type not in allowed_types:
+        if file.content_type not in ALLOWED_TYPES:
             raise HTTPException(400, "不支持的文件类型，请上传PDF或图片文件")
 
-        # 保存文件
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # 保存文件（按内容哈希存储）
         file_extension = os.path.splitext(file.filename)[1]
-        filename = f"{user_id}_{timestamp}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
+        with track_stage("file_save"):
+            upload = await run_in_threadpool(upload_store.save_stream, file.file, file_extension)
+        observe_payload("upload_bytes", upload["size"])
+        filename = upload["file_id"]
 
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # 同一用户重复上传相同内容：直接返回已有解析结果
+        if await run_in_threadpool(upload_store.get_user_ref, upload["sha256"], user_id):
+            parse_result = await _stored_parse_result(upload, file.content_type)
+            if parse_result is not None:
+                return {
+                    "status": "success",
+                    "message": "文件内容已上传过，直接返回已有解析结果",
+                    "file_id": filename,
+                    "deduplicated": True,
+                    "parsed_data": parse_result,
+                    "vector_storage": "success"
+                }
 
-        # 解析文件内容
-        if file.content_type == 'application/pdf':
-            parse_result = pdf_parser.parse_medical_report(file_path)
-        else:
-            parse_result = image_parser.extract_health_text(file_path)
-
-        if not parse_result.get("success", False):
-            raise HTTPException(500, f"文件解析失败: {parse_result.get('error', '未知错误')}")
+        # 提交后台解析任务
+        job_id = await run_in_threadpool(job_manager.create_job, "medical_report", user_id=user_id, file_id=filename)
+        _start_background(_process_upload_job(job_id, upload, file.content_type, user_id))
 
-        # 存储到向量数据库
-        document_data = {
-            "content": parse_result.get("raw_text") or parse_result.get("text", ""),
-            "data_type": "medical_report",
-            "timestamp": datetime.now().isoformat(),
-            "source": filename,
-            "user_id": user_id
+        return {
+            "status": "accepted",
+            "message": "文件上传成功，正在后台解析",
+            "job_id": job_id,
+            "file_id": filename,
+            "status_url": f"/api/jobs/{job_id}"
         }
 
-        storage_success = vector_store.add_health_document(document_data, user_id)
+    except Exception as e:
+        raise HTTPException(500, f"处理失败: {str(e)}")
+
+
+@app.post("/api/upload/bulk",
+          summary="批量上传医疗报告",
+          description="批量上传历史医疗报告，并行解析后一次性写入向量数据库，返回任务ID")
+async def upload_medical_reports_bulk(
+        files: List[UploadFile] = File(..., description="医疗报告文件列表（PDF、JPG、PNG格式）"),
+        user_id: str = "default_user",
+        user_ids: List[str] = Form([], description="与文件一一对应的用户ID，不传则全部使用user_id")
+):
+    """批量上传医疗报告，适用于历史报告回填"""
+    if user_ids and len(user_ids) != len(files):
+        raise HTTPException(400, "user_ids 数量必须与文件数量一致")
+
+    try:
+        items, skipped = [], []
+        for i, file in enumerate(files):
+            if file.content_type not in ALLOWED_TYPES:
+                raise HTTPException(400, f"不支持的文件类型: {file.filename}")
+
+            owner = user_ids[i] if user_ids else user_id
+            file_extension = os.path.splitext(file.filename)[1]
+            with track_stage("file_save"):
+                upload = await run_in_threadpool(upload_store.save_stream, file.file, file_extension)
+            observe_payload("upload_bytes", upload["size"])
+
+            # 已入库的相同内容直接跳过
+            if await run_in_threadpool(upload_store.get_user_ref, upload["sha256"], owner):
+                skipped.append({"file_id": upload["file_id"], "user_id": owner})
+                continue
+            items.append({"upload": upload, "content_type": file.content_type, "user_id": owner})
+
+        job_id = await run_in_threadpool(job_manager.create_job, "bulk_upload", file_count=len(items), skipped=skipped)
+        _start_background(_process_bulk_job(job_id, items))
 
         return {
-            "status": "success",
-            "message": "文件上传并解析成功",
-            "file_id": filename,
-            "parsed_data": parse_result,
-            "vector_storage": "success" if storage_success else "failed"
+            "status": "accepted",
+            "message": f"已接收 {len(items)} 个文件，正在后台解析",
+            "job_id": job_id,
+            "skipped": skipped,
+            "status_url": f"/api/jobs/{job_id}"
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(500, f"处理失败: {str(e)}")
+        raise HTTPException(500, f"批量上传失败: {str(e)}")
+
+
+@app.get("/api/jobs/{job_id}",
+         summary="查询任务状态",
+         description="查询上传解析任务的进度和最终解析结果")
+async def get_job_status(job_id: str):
+    """查询后台任务状态"""
+    job = await run_in_threadpool(job_manager.get_job, job_id)
+    if job is None:
+        raise HTTPException(404, "任务不存在或已过期")
+    return job
+
+
+async def _retrieve_health_context(question: str, user_id: str) -> dict:
+    """检索与问题相关的健康数据，去重、多样性排序后按token预算打包成问答上下文
+
+    返回 {"context", "tokens", "passages", "dropped_duplicates", "truncated"}
+    """
+    with track_stage("vector_search"):
+        search_results = await run_in_threadpool(
+            vector_store.search_similar, question, user_id, CONTEXT_CANDIDATES, True
+        )
+    packed = None
+    if search_results["success"] and search_results["results"]:
+        with track_stage("context_pack"):
+            packed = context_builder.build(search_results["results"])
+    if not packed or not packed["passages"]:
+        packed = {"context": "暂无相关的健康数据记录。", "tokens": 0, "passages": 0,
+                  "dropped_duplicates": 0, "truncated": 0}
+    observe_payload("context_tokens", packed["tokens"])
+    return packed
+
+
+_NO_CONTEXT = {"context": "", "tokens": 0, "passages": 0, "dropped_duplicates": 0, "truncated": 0}
+
+
+def _build_messages(question: str, health_context: str) -> list:
+    """构建问答提示词，并记录提示词长度"""
+    with track_stage("prompt_build"):
+        messages = deepseek_client.create_health_context(question, health_context)
+    observe_payload("prompt_chars", sum(len(m["content"]) for m in messages))
+    return messages
+
+
+async def _answer_question(question: str, user_id: str, use_context: bool) -> dict:
+    """检索上下文 -> 语义缓存 -> 调用大模型，返回 {"answer", "cache_hit", "packed"}"""
+    # 从向量数据库检索相关健康数据
+    packed = await _retrieve_health_context(question, user_id) if use_context else _NO_CONTEXT
+    health_context = packed["context"]
+
+    # 语义缓存：相近问题 + 相同上下文直接复用已有回答
+    cached = await run_in_threadpool(answer_cache.lookup, user_id, question, health_context)
+    if cached is not None:
+        answer = cached["answer"]
+    else:
+        # 调用DeepSeek生成回答
+        messages = _build_messages(question, health_context)
+        with track_stage("llm_call"):
+            answer = await llm_client.chat_completion(messages)
+        await run_in_threadpool(answer_cache.store, user_id, question, health_context, answer)
+
+    return {"answer": answer, "cache_hit": cached is not None, "packed": packed}
+
+
+def _sse(event: str, data: dict) -> str:
+    """格式化一条SSE消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 @app.post("/api/ask-health-question",
           summary="健康问答",
           description="基于用户的健康数据和问题，提供个性化的健康建议和专业指导")
 async def ask_health_question(
-        question: str = "如何改善睡眠质量？",
+        question: str = DEFAULT_QUESTION,
         user_id: str = "default_user",
         use_context: bool = True
 ):
@@ -147,27 +892,17 @@ async def ask_health_question(
         if not question.strip():
             raise HTTPException(400, "问题不能为空")
 
-        # 从向量数据库检索相关健康数据
-        health_context = ""
-        if use_context:
-            search_results = vector_store.search_similar(question, user_id, n_results=3)
-            if search_results["success"] and search_results["results"]:
-                health_context = "相关健康数据：\n"
-                for i, result in enumerate(search_results["results"]):
-                    health_context += f"{i + 1}. {result['content']}\n"
-            else:
-                health_context = "暂无相关的健康数据记录。"
-
-        # 调用DeepSeek生成回答
-        messages = deepseek_client.create_health_context(question, health_context)
-        answer = deepseek_client.chat_completion(messages)
+        result = await _answer_question(question, user_id, use_context)
+        packed = result["packed"]
 
         return {
             "status": "success",
             "question": question,
-            "answer": answer,
+            "answer": result["answer"],
+            "cache_hit": result["cache_hit"],
             "context_used": use_context,
-            "context_data": health_context if use_context else "未使用上下文",
+            "context_data": packed["context"] if use_context else "未使用上下文",
+            "context_tokens": packed["tokens"],
             "timestamp": datetime.now().isoformat()
         }
 
@@ -175,83 +910,334 @@ async def ask_health_question(
         raise HTTPException(500, f"生成回答失败: {str(e)}")
 
 
+@app.post("/api/ask-health-question/stream",
+          summary="健康问答（流式）",
+          description="以SSE流式返回健康问答：先返回检索到的上下文，再逐段返回模型生成的回答")
+async def ask_health_question_stream(
+        question: str = DEFAULT_QUESTION,
+        user_id: str = "default_user",
+        use_context: bool = True
+):
+    """流式健康问答接口（text/event-stream）"""
+    if not question.strip():
+        raise HTTPException(400, "问题不能为空")
+
+    async def event_stream():
+        try:
+            packed = await _retrieve_health_context(question, user_id) if use_context else _NO_CONTEXT
+            health_context = packed["context"]
+            yield _sse("context", {
+                "question": question,
+                "context_used": use_context,
+                "context_data": health_context if use_context else "未使用上下文",
+                "context_tokens": packed["tokens"]
+            })
+
+            cached = await run_in_threadpool(answer_cache.lookup, user_id, question, health_context)
+            if cached is not None:
+                yield _sse("token", {"content": cached["answer"]})
+            else:
+                messages = _build_messages(question, health_context)
+                parts = []
+                start = time.perf_counter()
+                async for content in llm_client.stream_chat_completion(messages):
+                    if not parts:
+                        observe_stage("llm_first_token", time.perf_counter() - start)
+                    parts.append(content)
+                    yield _sse("token", {"content": content})
+                observe_stage("llm_call", time.perf_counter() - start)
+                await run_in_threadpool(answer_cache.store, user_id, question, health_context, "".join(parts))
+
+            yield _sse("done", {"status": "success", "cache_hit": cached is not None,
+                                "timestamp": datetime.now().isoformat()})
+
+        except Exception as e:
+            yield _sse("error", {"status": "error", "message": f"生成回答失败: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class BatchQuestion(BaseModel):
+    user_id: str = "default_user"
+    question: str
+
+
+class BatchQuestionRequest(BaseModel):
+    items: List[BatchQuestion]
+    use_context: bool = True
+
+
+@app.post("/api/ask-health-question/batch",
+          summary="批量健康问答",
+          description="批量提交 (user_id, question)，检索阶段合并编码，大模型调用按并发上限执行，"
+                      "结果以NDJSON逐行返回（按完成先后），单个问题失败不影响其他问题")
+async def ask_health_question_batch(request: BatchQuestionRequest):
+    """批量健康问答接口（application/x-ndjson）"""
+    items = request.items
+    if not items:
+        raise HTTPException(400, "问题列表不能为空")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(400, f"单次最多提交 {BATCH_MAX_ITEMS} 个问题")
+
+    # 一次批量编码所有问题，后续检索直接命中查询向量缓存
+    questions = [item.question for item in items if item.question.strip()]
+    if request.use_context and questions:
+        with track_stage("embedding", questions=len(questions)):
+            await run_in_threadpool(embedder.encode_queries, questions)
+
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
+
+    async def answer_item(index: int, item: BatchQuestion) -> dict:
+        base = {"index": index, "user_id": item.user_id, "question": item.question}
+        try:
+            if not item.question.strip():
+                raise ValueError("问题不能为空")
+            async with semaphore:
+                result = await _answer_question(item.question, item.user_id, request.use_context)
+            return dict(base, status="success", answer=result["answer"], cache_hit=result["cache_hit"],
+                        context_tokens=result["packed"]["tokens"])
+        except Exception as e:
+            return dict(base, status="error", error=f"生成回答失败: {str(e)}")
+
+    async def ndjson_stream():
+        tasks = [asyncio.create_task(answer_item(i, item)) for i, item in enumerate(items)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += result["status"] == "success"
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({"done": True, "total": len(items), "succeeded": succeeded,
+                              "failed": len(items) - succeeded, "timestamp": datetime.now().isoformat()},
+                             ensure_ascii=False) + "\n"
+        finally:
+            # 客户端断开时取消尚未完成的问题
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
 @app.get("/api/health-profile/{user_id}",
          summary="获取健康档案",
          description="获取用户的健康档案摘要和健康数据分析报告")
 async def get_health_profile(user_id: str):
-    """获取用户健康档案摘要"""
+    """获取用户健康档案摘要（摘要已持久化，没有新数据时直接返回）"""
     try:
-        # 搜索用户的所有健康数据
-        search_results = vector_store.search_similar("健康档案摘要", user_id, n_results=10)
-
-        # 使用DeepSeek生成健康档案摘要
-        if search_results["success"] and search_results["results"]:
-            context_data = "\n".join([r['content'] for r in search_results['results']])
-
-            summary_prompt = f"请基于以下健康数据，生成一份简洁的健康档案摘要：\n\n{context_data}"
-            messages = [
-                {"role": "system", "content": "你是一个专业的健康管理专家，擅长总结健康档案。"},
-                {"role": "user", "content": summary_prompt}
-            ]
-
-            summary = deepseek_client.chat_completion(messages, max_tokens=500)
-        else:
-            summary = "暂无健康数据"
+        profile = await run_in_threadpool(profile_store.get_summary, user_id)
+        is_fresh = profile is not None and not await run_in_threadpool(profile_store.has_pending, user_id)
+        if not is_fresh:
+            profile = await asyncio.shield(_refresh_profile(user_id))
 
         return {
             "user_id": user_id,
-            "document_count": vector_store.get_user_documents_count(user_id),
-            "health_summary": summary,
-            "last_updated": datetime.now().isoformat()
+            "document_count": profile["document_count"],
+            "health_summary": profile["summary"],
+            "summary_status": "cached" if is_fresh else "updated",
+            "last_updated": profile["updated_at"]
         }
 
     except Exception as e:
         raise HTTPException(500, f"获取健康档案失败: {str(e)}")
 
 
+@app.get("/api/lab-trends/{user_id}",
+         summary="检验项目列表",
+         description="列出用户有结构化记录的检验项目、记录数和最近检验日期")
+async def list_lab_tests(user_id: str):
+    tests = await run_in_threadpool(lab_store.list_tests, user_id)
+    return {"user_id": user_id, "tests": tests}
+
+
+@app.get("/api/lab-trends/{user_id}/{test}",
+         summary="检验项目趋势",
+         description="返回某个检验项目的历史数值序列（支持项目代码或中文名，如 ALT、谷丙转氨酶），"
+                     "直接读取上传时提取的结构化数据，不经过检索和大模型")
+async def get_lab_trend(
+        user_id: str,
+        test: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: int = 500
+):
+    test_code = canonical_test_code(test) or test.upper()
+    series = await run_in_threadpool(lab_store.get_series, user_id, test_code, since, until, limit)
+    if not series:
+        raise HTTPException(404, f"没有检验项目 {test} 的记录")
+    reference = await run_in_threadpool(lab_store.get_reference, user_id, test_code)
+
+    first, latest = series[0], series[-1]
+    return {
+        "user_id": user_id,
+        "test_code": test_code,
+        "test_name": reference["test_name"],
+        "reference_range": {"low": reference["ref_low"], "high": reference["ref_high"]},
+        "points": series,
+        "latest": latest,
+        "change": round(latest["value"] - first["value"], 4),
+        "abnormal_count": sum(1 for point in series if point["flag"] != "N"),
+    }
+
+
+@app.post("/api/upload/wearable",
+          summary="上传可穿戴设备数据",
+          description="上传 .fit 运动/心率文件，按分钟聚合心率、踏频、速度、功率、海拔后写入用户的时间序列，"
+                      "并返回心率区间、滑动平均、静息心率、HRV和异常标记")
+async def upload_wearable(
+        file: UploadFile = File(..., description="可穿戴设备导出的 .fit 文件（Zepp、Garmin等）"),
+        user_id: str = "default_user",
+        hr_max: Optional[float] = None
+):
+    file_extension = os.path.splitext(file.filename or "")[1].lower()
+    if file_extension != ".fit":
+        raise HTTPException(400, "不支持的文件类型，请上传 .fit 文件")
+
+    try:
+        with track_stage("file_save"):
+            upload = await run_in_threadpool(upload_store.save_stream, file.file, file_extension)
+        observe_payload("upload_bytes", upload["size"])
+
+        if await run_in_threadpool(upload_store.get_user_ref, upload["sha256"], user_id):
+            return {"status": "success", "message": "文件内容已上传过", "file_id": upload["file_id"],
+                    "deduplicated": True}
+
+        # 解码和聚合在进程池中执行，不阻塞事件循环
+        with track_stage("wearable_aggregate"):
+            try:
+                aggregated = await _run_parse(parse_worker.aggregate_wearable, upload["file_path"], hr_max)
+            except ValueError as e:
+                raise HTTPException(400, f"FIT文件解析失败: {str(e)}")
+        metrics_data = aggregated["metrics"]
+        if not metrics_data:
+            raise HTTPException(400, "文件中没有可用的运动或心率数据")
+
+        rows = await run_in_threadpool(wearable_store.append, user_id, metrics_data)
+        analytics = aggregated["analytics"]
+        for event in analytics["events"]:
+            event["time"] = _format_time(event["time"])
+        await run_in_threadpool(upload_store.add_user_ref, upload["sha256"], user_id)
+
+        return {
+            "status": "success",
+            "file_id": upload["file_id"],
+            "records": aggregated["records"],
+            "minutes_stored": rows,
+            "metrics": {
+                name: {"minutes": len(series["time"]), "first": _format_time(series["time"][0]),
+                       "last": _format_time(series["time"][-1])}
+                for name, series in metrics_data.items()
+            },
+            "analytics": analytics,
+            "parse_seconds": aggregated["seconds"],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"处理失败: {str(e)}")
+
+
+def _parse_time(value: Optional[str]) -> Optional[int]:
+    """查询参数中的时间：Unix秒或ISO格式（不带时区时按UTC）"""
+    if value is None:
+        return None
+    if value.lstrip("-").isdigit():
+        return int(value)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(400, f"无法识别的时间: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def _format_time(seconds: int) -> str:
+    return datetime.fromtimestamp(int(seconds), timezone.utc).isoformat()
+
+
+@app.get("/api/wearable/{user_id}",
+         summary="可穿戴数据指标列表",
+         description="列出用户已上传的可穿戴数据指标、分钟数和时间范围")
+async def list_wearable_metrics(user_id: str):
+    metrics_list = await run_in_threadpool(wearable_store.list_metrics, user_id)
+    for item in metrics_list:
+        item["first"], item["last"] = _format_time(item["first"]), _format_time(item["last"])
+    return {"user_id": user_id, "metrics": metrics_list}
+
+
+@app.get("/api/wearable/{user_id}/{metric}",
+         summary="可穿戴数据时间序列",
+         description="按时间范围返回某个指标（heart_rate、cadence、speed、power、altitude）的均值/最小/最大值，"
+                     "start、end 支持ISO时间或Unix秒；不指定粒度（1min、1h、1d）时自动选择点数不超过limit的最细粒度")
+async def get_wearable_series(
+        user_id: str,
+        metric: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        limit: int = 1440,
+        resolution: Optional[str] = None
+):
+    if resolution is not None and resolution not in WEARABLE_RESOLUTIONS:
+        raise HTTPException(400, f"不支持的粒度: {resolution}，可选 {', '.join(WEARABLE_RESOLUTIONS)}")
+    resolution, points = await run_in_threadpool(wearable_store.get_range, user_id, metric, _parse_time(start),
+                                                 _parse_time(end), limit, resolution)
+    if not points:
+        raise HTTPException(404, f"没有指标 {metric} 的数据")
+    for point in points:
+        point["time"] = _format_time(point["time"])
+    return {"user_id": user_id, "metric": metric, "resolution": resolution, "points": points}
+
+
 @app.get("/api/search-health-data",
          summary="搜索健康数据",
-         description="在用户的健康数据中搜索相关信息，支持关键词检索")
+         description="在指定用户的健康数据中搜索相关信息，支持关键词检索")
 async def search_health_data(
         query: str,
-        user_id: Optional[str] = None,
+        user_id: str = "default_user",
         limit: int = 5
 ):
     """搜索健康数据"""
     try:
-        results = vector_store.search_similar(query, user_id, n_results=limit)
+        with track_stage("vector_search"):
+            results = await run_in_threadpool(vector_store.search_similar, query, user_id, limit)
         return results
     except Exception as e:
         raise HTTPException(500, f"搜索失败: {str(e)}")
 
 
+@app.get("/metrics", summary="性能指标", description="Prometheus格式的请求耗时、各阶段耗时、载荷大小和token用量直方图")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/system-status",
          summary="系统状态检查",
          description="检查系统各组件运行状态和连接情况")
 async def system_status():
-    """系统状态检查"""
-    try:
-        # 测试DeepSeek连接
-        test_messages = [
-            {"role": "system", "content": "你是一个助手"},
-            {"role": "user", "content": "请回复'服务正常'"}
-        ]
-        deepseek_response = deepseek_client.chat_completion(test_messages, max_tokens=10)
-        deepseek_status = "正常" if "服务正常" in deepseek_response else "异常"
+    """系统状态检查（读取后台探测的缓存结果，不在请求中调用大模型）"""
+    checks = health_monitor.snapshot(include_history=True)
 
-        return {
-            "status": "运行中",
-            "deepseek_api": deepseek_status,
-            "vector_database": "正常",
-            "upload_directory": "正常",
-            "timestamp": datetime.now().isoformat()
-        }
-    except Exception as e:
-        return {
-            "status": "异常",
-            "error": str(e),
-            "timestamp": datetime.now().isoformat()
-        }
+    def status_text(name):
+        return {"ok": "正常", "error": "异常"}.get(checks[name]["status"], "未检查")
+
+    return {
+        "status": ("运行中" if health_monitor.is_ready() else "异常") if _startup_state["ready"] else "启动中",
+        "deepseek_api": status_text("deepseek_api"),
+        "vector_database": status_text("vector_database"),
+        "upload_directory": status_text("upload_directory"),
+        "checks": checks,
+        "startup": _startup_info(),
+        "parse_cache": parse_cache.stats() if parse_cache.lazy_initialized else None,
+        "query_embedding_cache": embedder.query_cache.stats(),
+        "keyword_index": vector_store.keyword_index.stats() if vector_store.lazy_initialized else None,
+        "vector_partitions": vector_store.stats() if vector_store.lazy_initialized else None,
+        "answer_cache": answer_cache.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
 
 
 if __name__ == "__main__":
@@ -1,24 +1,101 @@
+import argparse
 import os
+import signal
+import socket
 import uvicorn
-from main import app
 
 # 禁用HuggingFace符号链接警告
 os.environ['HF_HUB_DISABLE_SYMLINKS_WARNING'] = '1'
 
+
+def serve_prefork(host: str, port: int, workers: int):
+    """生产部署：主进程先加载编码模型再fork出多个worker
+
+    模型权重在fork前加载，各worker以写时复制方式共享，不必每个worker各加载一份。
+    fork前只加载权重、不做推理，避免推理库的线程池在fork后处于不一致状态；
+    数据库连接、进程池等组件由各worker在启动预热时各自创建。
+
+    请求不做会话保持，可能落到任意worker：任务状态存放在SQLite中各worker共享，
+    关键词索引和问答缓存按共享的用户数据版本判断是否过期。
+    """
+    import gc
+    import main
+
+    main.embedder.load()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+
+    # 把已加载的对象移出垃圾回收跟踪，避免子进程GC遍历时触发大量内存页复制
+    gc.freeze()
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            server = uvicorn.Server(uvicorn.Config(main.app, log_level="info"))
+            server.run(sockets=[sock])
+            os._exit(0)
+        children.append(pid)
+
+    def forward(signum, frame):
+        for child in children:
+            try:
+                os.kill(child, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    # Ctrl + C 会发给整个进程组，worker已各自收到，主进程只等待其退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    print(f"已启动 {workers} 个worker: {children}")
+    for child in children:
+        os.waitpid(child, 0)
+    sock.close()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="智能健康管理后端服务")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker进程数；不指定时以开发模式运行（修改代码后自动重启）")
+    args = parser.parse_args()
+
     print("=" * 50)
     print("🏥 智能健康管理后端服务启动中...")
     print("=" * 50)
-    print("📊 服务地址: http://localhost:8000")
-    print("📖 API文档: http://localhost:8000/docs")
-    print("🔧 重新启动: 修改代码后服务会自动重启")
+    print(f"📊 服务地址: http://localhost:{args.port}")
+    print(f"📖 API文档: http://localhost:{args.port}/docs")
+    if args.workers:
+        print(f"⚙️  生产模式: {args.workers} 个worker")
+    else:
+        print("🔧 重新启动: 修改代码后服务会自动重启")
     print("⏹️  停止服务: Ctrl + C")
     print("=" * 50)
 
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    if args.workers:
+        # 解析进程池按worker数平分CPU，见 main.PARSE_WORKERS
+        os.environ["WEB_WORKERS"] = str(args.workers)
+        # 各worker的性能指标写入同一目录，/metrics 汇总输出；清理上次运行留下的文件
+        metrics_dir = os.environ.setdefault("METRICS_DIR", "./data/metrics")
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".json"):
+                os.remove(os.path.join(metrics_dir, name))
+
+    if args.workers and hasattr(os, "fork"):
+        serve_prefork(args.host, args.port, args.workers)
+    elif args.workers:
+        # 不支持fork的平台（Windows）：每个worker各自加载模型
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, log_level="info")
+    else:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import random
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 可重试的HTTP状态码：限流和服务端错误
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class DeepSeekAPIError(Exception):
+    """DeepSeek接口调用失败"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AsyncDeepSeekClient:
+    """异步DeepSeek客户端
+
+    - 共享的keep-alive连接池（httpx.AsyncClient）
+    - 每次调用的超时控制
+    - 429/5xx和网络错误时带随机抖动的指数退避重试
+    - 信号量限制同时在途的请求数（退避等待期间不占用名额）
+    - on_usage 回调接收接口返回的token用量，用于指标统计
+    """
+
+    def __init__(self, api_key: str = None, base_url: str = None, model: str = None,
+                 timeout: float = None, max_retries: int = None, max_concurrency: int = None,
+                 max_retry_delay: float = None, on_usage: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY", "")
+        self.base_url = (base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.siliconflow.cn/v1")).rstrip("/")
+        self.model = model or os.getenv("DEEPSEEK_MODEL", "deepseek-ai/DeepSeek-V3.1-Terminus")
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", 60))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", 3))
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+        # 单次重试等待的上限（包括服务端Retry-After给出的时间）
+        self.max_retry_delay = max_retry_delay if max_retry_delay is not None \
+            else float(os.getenv("LLM_RETRY_MAX_DELAY", 30))
+        self.on_usage = on_usage
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # 在事件循环中延迟创建连接池和信号量
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json"
+                },
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _build_payload(self, messages: List[Dict[str, str]], max_tokens: int, temperature: float,
+                       stream: bool = False) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": stream
+        }
+
+    def _report_usage(self, result: Dict[str, Any]) -> None:
+        if self.on_usage is not None and result.get("usage"):
+            self.on_usage(result["usage"])
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        # 优先遵循服务端的Retry-After，否则使用带完全抖动的指数退避；均不超过 max_retry_delay
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.max_retry_delay)
+        return random.uniform(0, min(8.0, 0.5 * 2 ** attempt, self.max_retry_delay))
+
+    async def chat_completion(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                              temperature: float = 0.7, timeout: float = None) -> str:
+        """调用对话接口，返回回答文本"""
+        client = self._get_client()
+        payload = self._build_payload(messages, max_tokens, temperature)
+
+        for attempt in range(self.max_retries + 1):
+            response = None
+            async with self._semaphore:
+                try:
+                    response = await client.post("/chat/completions", json=payload,
+                                                 timeout=timeout or self.timeout)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if attempt >= self.max_retries:
+                        raise DeepSeekAPIError(f"请求DeepSeek失败: {e}")
+                else:
+                    if response.status_code == 200:
+                        result = response.json()
+                        self._report_usage(result)
+                        return result["choices"][0]["message"]["content"]
+                    if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                        raise DeepSeekAPIError(f"DeepSeek返回错误: {response.status_code} {response.text}",
+                                               response.status_code)
+
+            # 退避等待时释放并发名额
+            await asyncio.sleep(self._retry_delay(attempt, response))
+
+    async def stream_chat_completion(self, messages: List[Dict[str, str]], max_tokens: int = 1000,
+                                     temperature: float = 0.7) -> AsyncIterator[str]:
+        """流式调用对话接口，逐段产出回答内容
+
+        只在收到第一段内容之前重试，已经开始输出后出错直接抛出。
+        """
+        client = self._get_client()
+        payload = self._build_payload(messages, max_tokens, temperature, stream=True)
+
+        started = False
+        for attempt in range(self.max_retries + 1):
+            retry_response = None
+            async with self._semaphore:
+                try:
+                    async with client.stream("POST", "/chat/completions", json=payload) as response:
+                        if response.status_code != 200:
+                            await response.aread()
+                            if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                                raise DeepSeekAPIError(
+                                    f"DeepSeek返回错误: {response.status_code} {response.text}", response.status_code
+                                )
+                            retry_response = response
+                        else:
+                            async for line in response.aiter_lines():
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[len("data:"):].strip()
+                                if data == "[DONE]":
+                                    return
+                                chunk = json.loads(data)
+                                self._report_usage(chunk)
+                                if not chunk.get("choices"):
+                                    continue
+                                content = chunk["choices"][0].get("delta", {}).get("content")
+                                if content:
+                                    started = True
+                                    yield content
+                            return
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if started or attempt >= self.max_retries:
+                        raise DeepSeekAPIError(f"请求DeepSeek失败: {e}")
+
+            await asyncio.sleep(self._retry_delay(attempt, retry_response))
+
+    async def ping(self) -> dict:
+        """轻量连通性检查：请求模型列表，不消耗对话额度"""
+        response = await self._get_client().get("/models", timeout=10.0)
+        if response.status_code != 200:
+            raise DeepSeekAPIError(f"DeepSeek返回错误: {response.status_code}", response.status_code)
+        return {"model": self.model}
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本：全半角统一、去除首尾空白、合并连续空白"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """查询向量LRU缓存，固定的内部查询可常驻（不参与淘汰）"""
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._pinned: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            if key in self._pinned:
+                self.hits += 1
+                return self._pinned[key]
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key: str, embedding: List[float], pinned: bool = False) -> None:
+        with self._lock:
+            if pinned:
+                self._pinned[key] = embedding
+                self._entries.pop(key, None)
+                return
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries),
+                "pinned": len(self._pinned),
+                "max_size": self.max_size,
+            }
+
+
+class HealthEmbedder:
+    """句向量编码器：延迟加载sentence-transformers模型，按批次编码"""
+
+    def __init__(self, model_name: str = None, batch_size: int = None, query_cache_size: int = None):
+        self.model_name = model_name or os.getenv("EMBEDDING_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+        self.batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", 32))
+        self.query_cache = QueryEmbeddingCache(query_cache_size or int(os.getenv("QUERY_CACHE_SIZE", 2048)))
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def load(self) -> None:
+        """立即加载模型（多进程部署时在主进程fork之前调用，子进程共享模型内存）"""
+        _ = self.model
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        """批量编码文本，整批只做一次前向计算（按batch_size切分）"""
+        if not texts:
+            return []
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return embeddings.tolist()
+
+    def encode_one(self, text: str) -> List[float]:
+        return self.encode([text])[0]
+
+    def encode_query(self, query: str) -> List[float]:
+        """编码查询文本，相同（规范化后）查询直接读取缓存"""
+        key = normalize_query(query)
+        embedding = self.query_cache.get(key)
+        if embedding is None:
+            embedding = self.encode_one(key)
+            self.query_cache.put(key, embedding)
+        return embedding
+
+    def encode_queries(self, queries: Iterable[str]) -> List[List[float]]:
+        """批量编码多个查询：未命中缓存的查询合并成一次批量编码，结果写入缓存"""
+        keys = [normalize_query(q) for q in queries]
+        embeddings = {key: self.query_cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+        for key, embedding in zip(missing, self.encode(missing)):
+            self.query_cache.put(key, embedding)
+            embeddings[key] = embedding
+        return [embeddings[key] for key in keys]
+
+    def preload_queries(self, queries: Iterable[str]) -> None:
+        """启动时预先编码固定的内部查询，常驻缓存"""
+        keys = list(dict.fromkeys(normalize_query(q) for q in queries))
+        for key, embedding in zip(keys, self.encode(keys)):
+            self.query_cache.put(key, embedding, pinned=True)
+
+
+class HashingEmbedder(HealthEmbedder):
+    """确定性的哈希编码器（字符一元/二元组哈希到固定维度）
+
+    不依赖模型文件和GPU，用于离线基准测试和本地开发，检索质量不代表真实模型。
+    """
+
+    def __init__(self, dim: int = 384, **kwargs):
+        super().__init__(model_name="hashing", **kwargs)
+        self.dim = dim
+
+    def _encode_text(self, text: str) -> List[float]:
+        import numpy as np
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        grams = list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+        for gram in grams:
+            digest = hashlib.md5(gram.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def load(self) -> None:
+        pass
+
+    def encode(self, texts: List[str]) -> List[List[float]]:
+        return [self._encode_text(text) for text in texts]
+
+
+def create_embedder() -> HealthEmbedder:
+    """按 EMBEDDING_BACKEND 环境变量创建编码器：sentence-transformers（默认）或 hashing"""
+    if os.getenv("EMBEDDING_BACKEND", "sentence-transformers") == "hashing":
+        return HashingEmbedder()
+    return HealthEmbedder()
@@ -0,0 +1,170 @@
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from typing import Callable, Dict, List, Optional
+
+# ASCII词（检验项目缩写、药名、单位）和数值；连续汉字按二元组切分
+_TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9\-]*|\d+(?:\.\d+)?|[㐀-䶿一-鿿]+")
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿]+")
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """中文友好的分词：ASCII词和数值整体保留，汉字串切成二元组（单字保留为一元组）
+
+    不依赖分词词典，"血小板计数" -> 血小/小板/板计/计数，检索时与文档中的
+    同一词语逐个二元组匹配。
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(normalize_text(text)):
+        token = match.group()
+        if _CJK_RUN.fullmatch(token):
+            if len(token) == 1:
+                tokens.append(token)
+            else:
+                tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            tokens.append(token)
+    return tokens
+
+
+class UserKeywordIndex:
+    """单个用户的BM25倒排索引（段落级）"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.lengths: Dict[str, int] = {}
+        self.passages: Dict[str, dict] = {}
+        self.total_length = 0
+        # 建立索引时的用户数据版本，None 表示已知过期
+        self.version: Optional[int] = None
+
+    def add(self, passage_id: str, content: str, metadata: dict) -> None:
+        if passage_id in self.lengths:
+            return
+        counts = Counter(tokenize(content))
+        for term, tf in counts.items():
+            self.postings[term][passage_id] = tf
+        length = sum(counts.values())
+        self.lengths[passage_id] = length
+        self.total_length += length
+        self.passages[passage_id] = {"content": content, "metadata": metadata}
+
+    def search(self, query: str, limit: int) -> List[tuple]:
+        """返回 [(passage_id, bm25分数)]，按分数降序"""
+        terms = set(tokenize(query))
+        if not terms or not self.lengths:
+            return []
+
+        n_docs = len(self.lengths)
+        avg_length = self.total_length / n_docs or 1
+        scores = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for passage_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[passage_id] / avg_length)
+                scores[passage_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+class KeywordIndex:
+    """按用户划分的BM25倒排索引
+
+    索引只保存在内存中：某个用户第一次检索时通过 loader(user_id) 从向量库
+    读回其全部段落建立索引，之后随 add_passages 增量更新。最多保留
+    max_users 个用户的索引，超出时淘汰最久未使用的（下次检索时重建）。
+
+    多worker部署时段落可能由别的进程写入：提供 version(user_id)（各进程共享的
+    用户数据版本，如段落数）时，检索前比对索引建立时的版本，不一致则重建。
+    """
+
+    def __init__(self, loader: Callable[[str], List[dict]], max_users: int = 256,
+                 version: Optional[Callable[[str], int]] = None):
+        self.loader = loader
+        self.max_users = max_users
+        self.version = version
+        self._users: "OrderedDict[str, UserKeywordIndex]" = OrderedDict()
+        # _lock 只保护内存中的索引，不在持有时读取向量库；
+        # 同一用户的首次加载由该用户的加载锁串行，不同用户的加载互不阻塞
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    def _cached(self, user_id: str, version: Optional[int]) -> Optional[UserKeywordIndex]:
+        # 调用方需持有 _lock
+        index = self._users.get(user_id)
+        if index is not None and index.version == version:
+            self._users.move_to_end(user_id)
+            return index
+        return None
+
+    def _get_user(self, user_id: str) -> UserKeywordIndex:
+        version = self.version(user_id) if self.version else None
+        with self._lock:
+            index = self._cached(user_id, version)
+            if index is not None:
+                return index
+            load_lock = self._loading.setdefault(user_id, threading.Lock())
+
+        with load_lock:
+            # 等待期间其他线程可能已加载完成
+            with self._lock:
+                index = self._cached(user_id, version)
+                if index is not None:
+                    return index
+
+            index = UserKeywordIndex()
+            # 先取版本再读段落：读取期间有新写入时版本落后，下次检索再重建
+            index.version = version
+            for passage in self.loader(user_id):
+                index.add(passage["id"], passage["content"], passage["metadata"])
+
+            with self._lock:
+                self._users[user_id] = index
+                self._users.move_to_end(user_id)
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+                self._loading.pop(user_id, None)
+            return index
+
+    def add_passages(self, passages: List[dict], versions: Optional[Dict[str, int]] = None) -> None:
+        """新段落写入向量库后调用；只更新已加载的用户索引，未加载的用户下次检索时全量读取
+
+        versions 为写入后各用户的数据版本：索引原版本加上本次段落数恰好等于它时
+        说明期间没有其他写入，索引直接跟进到新版本，否则标记过期。
+        """
+        added = Counter(passage["metadata"]["user_id"] for passage in passages)
+        with self._lock:
+            for passage in passages:
+                index = self._users.get(passage["metadata"]["user_id"])
+                if index is not None:
+                    index.add(passage["id"], passage["content"], passage["metadata"])
+            for user_id, version in (versions or {}).items():
+                index = self._users.get(user_id)
+                if index is not None:
+                    expected = index.version + added[user_id] if index.version is not None else None
+                    index.version = version if expected == version else None
+
+    def search(self, user_id: str, query: str, limit: int) -> List[dict]:
+        """BM25检索，返回 [{"id", "content", "metadata", "score"}]"""
+        index = self._get_user(user_id)
+        with self._lock:
+            return [dict(index.passages[passage_id], id=passage_id, score=score)
+                    for passage_id, score in index.search(query, limit)]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "passages": sum(len(index.lengths) for index in self._users.values()),
+            }
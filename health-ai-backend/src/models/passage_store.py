@@ -0,0 +1,322 @@
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.models.embedder import HealthEmbedder, create_embedder
+from src.models.keyword_index import KeywordIndex, normalize_text
+from src.models.user_partitions import UserPartitionRegistry, partition_name
+from src.utils.report_chunker import chunk_report_text
+
+# ChromaDB单次写入的条数上限
+MAX_WRITE_BATCH = 5000
+
+# 倒数排名融合（RRF）的平滑常数
+RRF_K = 60
+
+logger = logging.getLogger(__name__)
+
+
+class HealthPassageStore:
+    """段落级健康文档向量库
+
+    与 HealthVectorStore 接口一致（add_health_document / search_similar /
+    get_user_documents_count），报告在写入前按章节/检验项目组切分成段落，
+    一批文档的所有段落只做一次批量编码、一次向量库写入。
+
+    每个用户的段落存放在独立的集合（分区）中，检索和计数的开销只与该用户的
+    数据量有关。分区按需打开，最多保留 max_open_partitions 个打开的集合（LRU）；
+    每个用户的文档数/段落数记录在登记表中，写入时增量更新。检索必须指定用户：
+    跨所有分区的全局检索开销随用户数线性增长，还会把常用用户的分区挤出LRU，不再支持。
+
+    检索为混合检索：BM25关键词检索与向量检索按RRF融合；查询是
+    较短的精确词（如"ALT"、"血小板计数"）且能在段落中原样找到时，只走关键词
+    检索，不做查询编码。
+    """
+
+    def __init__(self, persist_directory: str = None, collection_name: str = "health_passages",
+                 embedder: Optional[HealthEmbedder] = None, max_chunk_chars: int = None,
+                 hybrid: bool = None, max_open_partitions: int = None):
+        self.persist_directory = persist_directory or os.getenv("VECTOR_DB_DIR", "./data/vector_db")
+        self.max_chunk_chars = max_chunk_chars or int(os.getenv("CHUNK_MAX_CHARS", 500))
+        self.embedder = embedder or create_embedder()
+        self.hybrid = hybrid if hybrid is not None else os.getenv("HYBRID_SEARCH", "1") != "0"
+        self.keyword_max_chars = int(os.getenv("KEYWORD_FAST_PATH_MAX_CHARS", 12))
+
+        self.collection_name = collection_name
+        self.max_open_partitions = max_open_partitions or int(os.getenv("VECTOR_PARTITION_CACHE_SIZE", 128))
+
+        # chromadb导入较慢，推迟到创建向量库时
+        import chromadb
+
+        self.client = chromadb.PersistentClient(path=self.persist_directory)
+        self.registry = UserPartitionRegistry(os.path.join(self.persist_directory, "partitions.db"))
+        self._partitions: "OrderedDict[str, Any]" = OrderedDict()
+        self._partition_lock = threading.RLock()
+
+        self.keyword_index = KeywordIndex(self._load_user_passages,
+                                          max_users=int(os.getenv("KEYWORD_INDEX_MAX_USERS", 256)),
+                                          version=self.data_version)
+
+    def _open_collection(self, name: str):
+        return self.client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+
+    def _partition(self, user_id: str, create: bool = False):
+        """打开用户分区；用户没有分区且 create=False 时返回None"""
+        with self._partition_lock:
+            collection = self._partitions.get(user_id)
+            if collection is not None:
+                self._partitions.move_to_end(user_id)
+                return collection
+
+            info = self.registry.get(user_id)
+            if info is None:
+                if not create:
+                    return None
+                self.registry.register(user_id, partition_name(self.collection_name, user_id))
+                info = self.registry.get(user_id)
+
+            collection = self._open_collection(info["collection_name"])
+            self._partitions[user_id] = collection
+            while len(self._partitions) > self.max_open_partitions:
+                self._partitions.popitem(last=False)
+            return collection
+
+    def _write_passages(self, ids: List[str], embeddings: List, texts: List[str],
+                        metadatas: List[dict]) -> Dict[str, int]:
+        """按用户分组写入各自分区，并更新文档/段落计数，返回 {用户: 写入后的段落数}"""
+        versions = {}
+        by_user = defaultdict(list)
+        for i, metadata in enumerate(metadatas):
+            by_user[metadata["user_id"]].append(i)
+
+        for user_id, indexes in by_user.items():
+            collection = self._partition(user_id, create=True)
+            for start in range(0, len(indexes), MAX_WRITE_BATCH):
+                batch = indexes[start:start + MAX_WRITE_BATCH]
+                collection.add(
+                    ids=[ids[i] for i in batch],
+                    embeddings=[embeddings[i] for i in batch],
+                    documents=[texts[i] for i in batch],
+                    metadatas=[metadatas[i] for i in batch]
+                )
+            # 分批写入的文档（chunk_offset>0 的后续部分）只在写入第一个段落时计数
+            doc_ids = {metadatas[i]["doc_id"] for i in indexes if metadatas[i]["chunk_index"] == 0}
+            versions[user_id] = self.registry.increment(user_id, len(doc_ids), len(indexes))
+        return versions
+
+    def add_health_document(self, document_data: Dict[str, Any], user_id: str) -> bool:
+        """添加单个健康文档"""
+        result = self.add_health_documents([dict(document_data, user_id=user_id)])
+        return result["success"]
+
+    def add_health_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """批量添加健康文档：切分段落 -> 一次批量编码 -> 一次写入
+
+        每个文档需包含 content 和 user_id 字段。返回的 chunk_ids 与输入文档一一对应。
+        同一文档分多次写入时（如按页流式入库），后续部分传入相同的 doc_id 和
+        chunk_offset（已写入的段落数），段落编号接续。
+        """
+        try:
+            ids, texts, metadatas = [], [], []
+            document_ids, chunk_ids = [], []
+
+            for document in documents:
+                doc_id = document.get("doc_id") or uuid.uuid4().hex
+                offset = document.get("chunk_offset", 0)
+                chunks = chunk_report_text(document.get("content", ""), max_chars=self.max_chunk_chars)
+                document_ids.append(doc_id)
+                chunk_ids.append([f"{doc_id}_{offset + chunk['index']}" for chunk in chunks])
+
+                for chunk in chunks:
+                    ids.append(f"{doc_id}_{offset + chunk['index']}")
+                    texts.append(chunk["text"])
+                    metadatas.append({
+                        "user_id": document["user_id"],
+                        "doc_id": doc_id,
+                        "chunk_index": offset + chunk["index"],
+                        "section": chunk["section"],
+                        "data_type": document.get("data_type", "unknown"),
+                        "source": document.get("source", ""),
+                        "timestamp": document.get("timestamp") or datetime.now().isoformat(),
+                    })
+
+            embeddings = self.embedder.encode(texts)
+            versions = self._write_passages(ids, embeddings, texts, metadatas)
+            self.keyword_index.add_passages([
+                {"id": passage_id, "content": text, "metadata": metadata}
+                for passage_id, text, metadata in zip(ids, texts, metadatas)
+            ], versions)
+
+            return {"success": True, "document_ids": document_ids, "chunk_ids": chunk_ids}
+
+        except Exception as e:
+            logger.exception("添加文档失败: %s", e)
+            return {"success": False, "error": str(e), "document_ids": [], "chunk_ids": []}
+
+    def search_similar(self, query: str, user_id: Optional[str] = None, n_results: int = 5,
+                       include_embeddings: bool = False) -> Dict[str, Any]:
+        """搜索用户的相似健康段落
+
+        使用混合检索（见类说明），返回的 retrieval 字段为 keyword / hybrid / vector。
+        include_embeddings=True 时每条结果附带段落向量（embedding），供上下文去重/MMR使用。
+        """
+        if not user_id:
+            return {"success": False, "error": "检索必须指定 user_id", "results": []}
+        try:
+            if not self.hybrid:
+                results = self._vector_search(query, user_id, n_results, include_embeddings)
+                return {"success": True, "query": query, "retrieval": "vector", "results": results}
+
+            candidates = max(n_results * 3, 20)
+            keyword_hits = self.keyword_index.search(user_id, query, candidates)
+
+            exact_hits = self._exact_term_hits(query, keyword_hits)
+            if exact_hits:
+                results = self._keyword_results(user_id, exact_hits[:n_results], include_embeddings)
+                return {"success": True, "query": query, "retrieval": "keyword", "results": results}
+
+            vector_hits = self._vector_search(query, user_id, candidates, include_embeddings=True)
+            results = self._fuse(query, user_id, vector_hits, keyword_hits, n_results, include_embeddings)
+            return {"success": True, "query": query, "retrieval": "hybrid", "results": results}
+
+        except Exception as e:
+            return {"success": False, "error": str(e), "results": []}
+
+    def _vector_search(self, query: str, user_id: str, n_results: int,
+                       include_embeddings: bool) -> List[Dict[str, Any]]:
+        """向量检索：只查询该用户的分区"""
+        query_embedding = self.embedder.encode_query(query)
+        return self._query_partition(user_id, query_embedding, n_results, include_embeddings)
+
+    def _query_partition(self, user_id: str, query_embedding: List[float], n_results: int,
+                         include_embeddings: bool) -> List[Dict[str, Any]]:
+        info = self.registry.get(user_id)
+        collection = self._partition(user_id)
+        if collection is None or not info or not info["passage_count"]:
+            return []
+
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        results = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(n_results, info["passage_count"]),
+            include=include
+        )
+
+        formatted = []
+        for i, (passage_id, doc, metadata, distance) in enumerate(zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0])):
+            item = {
+                "id": passage_id,
+                "content": doc,
+                "metadata": metadata,
+                "similarity": round(1 - distance, 4)
+            }
+            if include_embeddings:
+                item["embedding"] = results["embeddings"][0][i]
+            formatted.append(item)
+        return formatted
+
+    def _exact_term_hits(self, query: str, keyword_hits: List[dict]) -> List[dict]:
+        """查询为短的精确词时，返回原样包含该词的关键词命中；否则返回空列表"""
+        term = "".join(normalize_text(query).split())
+        if not term or len(term) > self.keyword_max_chars:
+            return []
+        return [hit for hit in keyword_hits if term in "".join(normalize_text(hit["content"]).split())]
+
+    def _fetch_embeddings(self, user_id: str, ids: List[str]) -> Dict[str, List[float]]:
+        collection = self._partition(user_id)
+        if not ids or collection is None:
+            return {}
+        fetched = collection.get(ids=ids, include=["embeddings"])
+        return dict(zip(fetched["ids"], fetched["embeddings"]))
+
+    def _keyword_results(self, user_id: str, hits: List[dict], include_embeddings: bool) -> List[Dict[str, Any]]:
+        # 关键词快速路径没有查询向量，similarity 为相对最高分归一化的BM25分数
+        top_score = hits[0]["score"] or 1
+        embeddings = self._fetch_embeddings(user_id, [hit["id"] for hit in hits]) if include_embeddings else {}
+        results = []
+        for hit in hits:
+            item = {
+                "id": hit["id"],
+                "content": hit["content"],
+                "metadata": hit["metadata"],
+                "similarity": round(hit["score"] / top_score, 4)
+            }
+            if include_embeddings:
+                item["embedding"] = embeddings.get(hit["id"])
+            results.append(item)
+        return results
+
+    def _fuse(self, query: str, user_id: str, vector_hits: List[dict], keyword_hits: List[dict], n_results: int,
+              include_embeddings: bool) -> List[Dict[str, Any]]:
+        """按RRF融合两路排名；只被关键词命中的段落补算与查询的余弦相似度"""
+        scores, items = {}, {}
+        for hits in (vector_hits, keyword_hits):
+            for rank, hit in enumerate(hits):
+                scores[hit["id"]] = scores.get(hit["id"], 0.0) + 1 / (RRF_K + rank + 1)
+                items.setdefault(hit["id"], hit)
+
+        top_ids = sorted(scores, key=scores.get, reverse=True)[:n_results]
+        missing = [passage_id for passage_id in top_ids if "similarity" not in items[passage_id]]
+        embeddings = self._fetch_embeddings(user_id, missing)
+        query_embedding = np.asarray(self.embedder.encode_query(query)) if missing else None
+
+        results = []
+        for passage_id in top_ids:
+            hit = items[passage_id]
+            embedding = hit.get("embedding", embeddings.get(passage_id))
+            similarity = hit.get("similarity")
+            if similarity is None:
+                similarity = round(float(np.dot(query_embedding, embedding)), 4) if embedding is not None else 0.0
+            item = {
+                "id": passage_id,
+                "content": hit["content"],
+                "metadata": hit["metadata"],
+                "similarity": similarity,
+                "rrf_score": round(scores[passage_id], 6)
+            }
+            if include_embeddings:
+                item["embedding"] = embedding
+            results.append(item)
+        return results
+
+    def _load_user_passages(self, user_id: str) -> List[dict]:
+        """读取用户的全部段落，用于建立关键词索引"""
+        collection = self._partition(user_id)
+        if collection is None:
+            return []
+        results = collection.get(include=["documents", "metadatas"])
+        return [{"id": passage_id, "content": doc, "metadata": metadata}
+                for passage_id, doc, metadata in zip(results["ids"], results["documents"], results["metadatas"])]
+
+    def data_version(self, user_id: str) -> int:
+        """用户数据版本（分区登记表中的段落数，各worker进程共享），用于判断进程内的索引/缓存是否过期"""
+        info = self.registry.get(user_id)
+        return info["passage_count"] if info else 0
+
+    def get_user_documents_count(self, user_id: str) -> int:
+        """统计用户的文档数量（按原始文档计，而非段落），读取分区登记表中维护的计数"""
+        try:
+            info = self.registry.get(user_id)
+            return info["document_count"] if info else 0
+        except Exception:
+            return 0
+
+    def ping(self) -> int:
+        """向量库连通性检查，返回段落总数"""
+        return self._open_collection(self.collection_name).count() + self.registry.totals()["passages"]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._partition_lock:
+            open_partitions = len(self._partitions)
+        return dict(self.registry.totals(), open_partitions=open_partitions,
+                    max_open_partitions=self.max_open_partitions)
+
+    def close(self) -> None:
+        self.registry.close()
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+def partition_name(prefix: str, user_id: str) -> str:
+    """用户分区对应的集合名（ChromaDB集合名只允许有限字符，用户ID取哈希）"""
+    return f"{prefix}_u_{hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:16]}"
+
+
+class UserPartitionRegistry:
+    """用户分区登记表
+
+    记录每个用户的分区集合名、文档数和段落数（写入时增量维护），统计用户
+    文档数只需按主键读一行，不扫描向量库。
+    """
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_partitions (
+                    user_id TEXT PRIMARY KEY,
+                    collection_name TEXT NOT NULL,
+                    document_count INTEGER NOT NULL DEFAULT 0,
+                    passage_count INTEGER NOT NULL DEFAULT 0,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT collection_name, document_count, passage_count FROM user_partitions WHERE user_id = ?",
+                (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"collection_name": row[0], "document_count": row[1], "passage_count": row[2]}
+
+    def register(self, user_id: str, collection_name: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO user_partitions (user_id, collection_name, updated_at) VALUES (?, ?, ?)",
+                (user_id, collection_name, datetime.now().isoformat())
+            )
+
+    def increment(self, user_id: str, documents: int, passages: int) -> int:
+        """增加计数，返回更新后的段落数"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE user_partitions SET document_count = document_count + ?, "
+                "passage_count = passage_count + ?, updated_at = ? WHERE user_id = ?",
+                (documents, passages, datetime.now().isoformat(), user_id)
+            )
+            row = self._conn.execute(
+                "SELECT passage_count FROM user_partitions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(document_count), 0), COALESCE(SUM(passage_count), 0) "
+                "FROM user_partitions"
+            ).fetchone()
+        return {"users": row[0], "documents": row[1], "passages": row[2]}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,120 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+def context_fingerprint(health_context: str) -> str:
+    """检索上下文的指纹，上下文不同的问题不共享回答"""
+    return hashlib.sha256((health_context or "").encode("utf-8")).hexdigest()
+
+
+class SemanticAnswerCache:
+    """健康问答语义缓存
+
+    同一用户、相同检索上下文下，新问题与已回答问题的向量相似度超过阈值时
+    直接返回已有回答，不再调用大模型。缓存条目有过期时间，用户新增健康
+    数据时整体失效。
+
+    缓存在各worker进程内存中，数据可能由别的worker写入：提供 data_version(user_id)
+    时（如用户的段落数），每条缓存记录写入时的版本，版本变化后不再命中。
+
+    总条目数超过 max_entries 时，从最久未访问的用户的最早条目开始淘汰。
+    """
+
+    def __init__(self, embedder, threshold: float = 0.92, ttl: float = 3600, max_entries_per_user: int = 200,
+                 data_version: Optional[Callable[[str], int]] = None, max_entries: int = 10000):
+        self.embedder = embedder
+        self.data_version = data_version
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries_per_user = max_entries_per_user
+        self.max_entries = max_entries
+
+        # user_id -> [{"fingerprint", "embedding", "question", "answer", "created_at"}]，按最近访问排序
+        self._entries: "OrderedDict[str, List[dict]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: str, question: str, health_context: str) -> Optional[dict]:
+        """查找语义相近的已回答问题，返回缓存条目（含原问题和回答）"""
+        fingerprint = context_fingerprint(health_context)
+        embedding = np.asarray(self.embedder.encode_query(question))
+        version = self.data_version(user_id) if self.data_version else None
+        now = time.time()
+
+        with self._lock:
+            entries = [e for e in self._entries.get(user_id, [])
+                       if now - e["created_at"] < self.ttl and e["version"] == version]
+            self._size -= len(self._entries.get(user_id, ())) - len(entries)
+            if entries:
+                self._entries[user_id] = entries
+                self._entries.move_to_end(user_id)
+            else:
+                # 没有缓存的用户不保留空列表
+                self._entries.pop(user_id, None)
+
+            best, best_score = None, self.threshold
+            for entry in entries:
+                if entry["fingerprint"] != fingerprint:
+                    continue
+                score = float(np.dot(embedding, entry["embedding"]))
+                if score >= best_score:
+                    best, best_score = entry, score
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return {"question": best["question"], "answer": best["answer"], "similarity": round(best_score, 4)}
+
+    def store(self, user_id: str, question: str, health_context: str, answer: str) -> None:
+        """缓存一条问答"""
+        entry = {
+            "fingerprint": context_fingerprint(health_context),
+            "embedding": np.asarray(self.embedder.encode_query(question)),
+            "question": question,
+            "answer": answer,
+            "version": self.data_version(user_id) if self.data_version else None,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            entries = self._entries.setdefault(user_id, [])
+            self._entries.move_to_end(user_id)
+            entries.append(entry)
+            self._size += 1
+            if len(entries) > self.max_entries_per_user:
+                self._size -= len(entries) - self.max_entries_per_user
+                del entries[:len(entries) - self.max_entries_per_user]
+            self._evict()
+
+    def _evict(self) -> None:
+        # 调用方需持有锁
+        while self._size > self.max_entries:
+            user_id, entries = next(iter(self._entries.items()))
+            excess = min(len(entries), self._size - self.max_entries)
+            del entries[:excess]
+            self._size -= excess
+            if not entries:
+                del self._entries[user_id]
+
+    def invalidate_user(self, user_id: str) -> None:
+        """用户健康数据变化时清空其缓存"""
+        with self._lock:
+            self._size -= len(self._entries.pop(user_id, ()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "users": len(self._entries),
+                "entries": self._size,
+            }
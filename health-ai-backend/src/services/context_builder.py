@@ -0,0 +1,149 @@
+"""
+问答上下文构建
+
+把检索到的健康段落按token预算打包成提示词上下文：去除近似重复段落（同一份
+化验单重复上传时很常见），按MMR（最大边际相关性）兼顾相关性与多样性排序，
+超出预算时按行截断或跳过，并返回实际使用的token数。
+"""
+import math
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# DeepSeek官方的粗略换算：1个中文字符约0.6个token，1个英文字符约0.3个token
+CJK_TOKEN_RATIO = 0.6
+ASCII_TOKEN_RATIO = 0.3
+
+# 截断段落时剩余预算低于该值则不再截断，直接跳过
+MIN_PARTIAL_TOKENS = 40
+
+_CJK_PATTERN = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数（不加载分词器）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return math.ceil(cjk * CJK_TOKEN_RATIO + (len(text) - cjk) * ASCII_TOKEN_RATIO)
+
+
+def _normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return re.sub(r"\s+", "", text)
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """按行截断到预算内，单行超长时按字符截断"""
+    kept, used = [], 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line) + 1
+        if used + cost > max_tokens:
+            if not kept:
+                # 第一行就放不下：按字符截断
+                chars = []
+                for char in line:
+                    used += estimate_tokens(char)
+                    if used > max_tokens - 1:
+                        break
+                    chars.append(char)
+                kept.append("".join(chars))
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept).rstrip()
+
+
+class HealthContextBuilder:
+    """按token预算打包检索结果
+
+    :param max_tokens: 上下文（不含问题和系统提示）的token预算
+    :param duplicate_threshold: 段落向量余弦相似度不低于该值视为近似重复
+    :param mmr_lambda: MMR中相关性的权重，越小越偏向多样性
+    """
+
+    def __init__(self, max_tokens: int = 800, duplicate_threshold: float = 0.95, mmr_lambda: float = 0.7):
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.mmr_lambda = mmr_lambda
+
+    def _deduplicate(self, passages: List[dict], vectors: Optional[np.ndarray]):
+        """去除近似重复段落（保留相关性更高的一个），返回 (保留下标, 去除数量)"""
+        order = sorted(range(len(passages)), key=lambda i: passages[i].get("similarity", 0), reverse=True)
+        kept, seen_texts = [], set()
+        for i in order:
+            text = _normalize_text(passages[i]["content"])
+            if text in seen_texts:
+                continue
+            if vectors is not None and kept and float(np.max(vectors[kept] @ vectors[i])) >= self.duplicate_threshold:
+                continue
+            seen_texts.add(text)
+            kept.append(i)
+        return kept, len(passages) - len(kept)
+
+    def _mmr_order(self, passages: List[dict], candidates: List[int], vectors: Optional[np.ndarray]) -> List[int]:
+        """按MMR贪心排序：λ·相关性 - (1-λ)·与已选段落的最大相似度"""
+        if vectors is None:
+            return candidates
+
+        remaining, selected = list(candidates), []
+        while remaining:
+            best, best_score = None, -math.inf
+            for i in remaining:
+                relevance = passages[i].get("similarity", 0)
+                redundancy = float(np.max(vectors[selected] @ vectors[i])) if selected else 0.0
+                score = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * redundancy
+                if score > best_score:
+                    best, best_score = i, score
+            selected.append(best)
+            remaining.remove(best)
+        return selected
+
+    def build(self, passages: List[dict], header: str = "相关健康数据：", max_tokens: Optional[int] = None) -> Dict:
+        """打包段落
+
+        :param passages: search_similar 返回的结果，含 content、similarity，可选 embedding
+        :return: {"context", "tokens", "passages", "dropped_duplicates", "truncated"}
+        """
+        budget = max_tokens or self.max_tokens
+        passages = [p for p in passages if (p.get("content") or "").strip()]
+        if not passages:
+            return {"context": "", "tokens": 0, "passages": 0, "dropped_duplicates": 0, "truncated": 0}
+
+        vectors = None
+        if all(p.get("embedding") is not None for p in passages):
+            vectors = np.asarray([p["embedding"] for p in passages], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+
+        candidates, dropped = self._deduplicate(passages, vectors)
+        ordered = self._mmr_order(passages, candidates, vectors)
+
+        lines = [header]
+        used = estimate_tokens(header) + 1
+        truncated = 0
+        for i in ordered:
+            prefix = f"{len(lines)}. "
+            content = passages[i]["content"].strip()
+            cost = estimate_tokens(prefix + content) + 1
+            remaining = budget - used
+            if cost > remaining:
+                if remaining < MIN_PARTIAL_TOKENS:
+                    continue
+                content = _truncate_to_tokens(content, remaining - estimate_tokens(prefix) - 1)
+                if not content:
+                    continue
+                cost = estimate_tokens(prefix + content) + 1
+                truncated += 1
+            lines.append(prefix + content)
+            used += cost
+
+        return {
+            "context": "\n".join(lines) + "\n" if len(lines) > 1 else "",
+            "tokens": used if len(lines) > 1 else 0,
+            "passages": len(lines) - 1,
+            "dropped_duplicates": dropped,
+            "truncated": truncated,
+        }
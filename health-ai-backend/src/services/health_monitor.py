@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# 探测函数：正常时返回附加信息（可为None），异常时抛出异常
+Probe = Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class HealthMonitor:
+    """后台依赖健康检查
+
+    按固定间隔探测各依赖组件（大模型接口、向量数据库、上传目录），
+    记录最近一次结果和延迟历史。存活/就绪检查和系统状态接口只读取
+    缓存的探测结果，不会在请求中访问依赖。
+    """
+
+    def __init__(self, interval: float = 30, timeout: float = 10, history_size: int = 60):
+        self.interval = interval
+        self.timeout = timeout
+        self.history_size = history_size
+        self._probes: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, name: str, probe: Probe, critical: bool = True) -> None:
+        """注册探测项，critical=True 的探测项失败时服务视为未就绪"""
+        self._probes[name] = {
+            "probe": probe,
+            "critical": critical,
+            "status": "unknown",
+            "latency_ms": None,
+            "checked_at": None,
+            "error": None,
+            "details": None,
+            "history": deque(maxlen=self.history_size),
+        }
+
+    async def check_all(self) -> None:
+        """执行一轮探测"""
+        await asyncio.gather(*[self._check(name) for name in self._probes])
+
+    async def _check(self, name: str) -> None:
+        state = self._probes[name]
+        start = time.perf_counter()
+        try:
+            details = await asyncio.wait_for(state["probe"](), timeout=self.timeout)
+            status, error = "ok", None
+        except Exception as e:
+            details, status, error = None, "error", str(e) or type(e).__name__
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        state.update(status=status, latency_ms=latency_ms, error=error, details=details,
+                     checked_at=datetime.now().isoformat())
+        state["history"].append({"checked_at": state["checked_at"], "status": status, "latency_ms": latency_ms})
+
+    async def _run(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def is_ready(self) -> bool:
+        """所有关键依赖最近一次探测均正常"""
+        return all(state["status"] == "ok" for state in self._probes.values() if state["critical"])
+
+    def snapshot(self, include_history: bool = False) -> Dict[str, Dict[str, Any]]:
+        """返回各探测项的缓存结果"""
+        result = {}
+        for name, state in self._probes.items():
+            item = {key: state[key] for key in ("status", "critical", "latency_ms", "checked_at", "error", "details")}
+            latencies = [h["latency_ms"] for h in state["history"] if h["status"] == "ok"]
+            item["avg_latency_ms"] = round(sum(latencies) / len(latencies), 2) if latencies else None
+            if include_history:
+                item["history"] = list(state["history"])
+            result[name] = item
+        return result
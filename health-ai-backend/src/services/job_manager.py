@@ -0,0 +1,107 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCESS = "success"
+JOB_FAILED = "failed"
+
+FINISHED_STATES = (JOB_SUCCESS, JOB_FAILED)
+
+# 单独存列的字段，其余创建时传入的信息（user_id、file_count等）存入 info
+_COLUMNS = ("job_type", "status", "stage", "progress", "result", "error", "created_at", "updated_at")
+
+
+class JobManager:
+    """后台任务状态管理（SQLite存储，只保留最近的任务记录）
+
+    多worker部署时任务在哪个进程中执行、状态查询落到哪个进程都不确定，
+    任务状态存放在各进程共享的数据库文件中，任何worker都能查到。
+    """
+
+    def __init__(self, db_path: str = "./data/jobs.db", max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    job_type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    info TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+
+    def create_job(self, job_type: str, **info) -> str:
+        """创建任务，返回任务ID"""
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, job_type, status, stage, progress, info, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                (job_id, job_type, JOB_PENDING, "queued", json.dumps(info, ensure_ascii=False), now, now)
+            )
+            self._evict_finished()
+        return job_id
+
+    def update_job(self, job_id: str, **fields) -> None:
+        """更新任务状态、进度或结果"""
+        fields["updated_at"] = datetime.now().isoformat()
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        columns = [name for name in fields if name in _COLUMNS]
+        extra = {name: value for name, value in fields.items() if name not in _COLUMNS}
+        with self._lock, self._conn:
+            if extra:
+                # 其他字段（如逐页解析进度 pages_done）合并到 info
+                row = self._conn.execute("SELECT info FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return
+                fields["info"] = json.dumps(dict(json.loads(row[0]), **extra), ensure_ascii=False)
+                columns.append("info")
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in columns)} WHERE job_id = ?",
+                [fields[name] for name in columns] + [job_id]
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)}, info FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = {"job_id": job_id, **dict(zip(_COLUMNS, row[:-1]))}
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job.update(json.loads(row[-1]))
+        return job
+
+    def _evict_finished(self) -> None:
+        # 调用方需持有锁；已完成的任务超出上限时从最旧的开始清理，运行中的任务不会被清理
+        self._conn.execute(
+            "DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE status IN (?, ?) "
+            "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (*FINISHED_STATES, self.max_jobs)
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class LabResultStore:
+    """结构化检验结果存储
+
+    每条检验结果一行（用户、项目代码、日期、数值、单位、参考范围、标记），
+    (user_id, test_code, observed_at) 上的覆盖索引包含数值列，查询某个项目的
+    时间序列只读索引，不读原始报告，也不经过向量检索和大模型。
+    """
+
+    def __init__(self, db_path: str = "./data/lab_results.db"):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS lab_results (
+                    user_id TEXT NOT NULL,
+                    test_code TEXT NOT NULL,
+                    observed_at TEXT NOT NULL,
+                    value REAL NOT NULL,
+                    unit TEXT NOT NULL,
+                    ref_low REAL,
+                    ref_high REAL,
+                    flag TEXT NOT NULL,
+                    test_name TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    UNIQUE (user_id, test_code, observed_at, source)
+                )
+            """)
+            self._conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_lab_series
+                ON lab_results (user_id, test_code, observed_at, value, unit, flag)
+            """)
+
+    def add_results(self, user_id: str, source: str, observed_at: str, results: List[Dict[str, Any]]) -> int:
+        """保存一份报告中提取出的检验结果（同一来源重复入库时忽略），返回写入条数"""
+        created_at = datetime.now().isoformat()
+        rows = [
+            (user_id, r["test_code"], observed_at, r["value"], r["unit"], r["ref_low"], r["ref_high"],
+             r["flag"], r["test_name"], source, created_at)
+            for r in results
+        ]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO lab_results (user_id, test_code, observed_at, value, unit, ref_low, "
+                "ref_high, flag, test_name, source, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            return self._conn.total_changes - before
+
+    def get_series(self, user_id: str, test_code: str, since: Optional[str] = None,
+                   until: Optional[str] = None, limit: int = 500) -> List[Dict[str, Any]]:
+        """某个检验项目的时间序列（按日期升序，取最近 limit 条）"""
+        query = "SELECT observed_at, value, unit, flag FROM lab_results WHERE user_id = ? AND test_code = ?"
+        params: list = [user_id, test_code]
+        if since:
+            query += " AND observed_at >= ?"
+            params.append(since)
+        if until:
+            query += " AND observed_at <= ?"
+            params.append(until)
+        query += " ORDER BY observed_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{"date": row[0], "value": row[1], "unit": row[2], "flag": row[3]} for row in reversed(rows)]
+
+    def get_reference(self, user_id: str, test_code: str) -> Optional[Dict[str, Any]]:
+        """最近一次报告中的参考范围"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT test_name, ref_low, ref_high FROM lab_results WHERE user_id = ? AND test_code = ? "
+                "ORDER BY observed_at DESC LIMIT 1", (user_id, test_code)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"test_name": row[0], "ref_low": row[1], "ref_high": row[2]}
+
+    def list_tests(self, user_id: str) -> List[Dict[str, Any]]:
+        """用户有记录的检验项目及其记录数、最近日期"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT test_code, COUNT(*), MAX(observed_at) FROM lab_results WHERE user_id = ? "
+                "GROUP BY test_code ORDER BY test_code", (user_id,)
+            ).fetchall()
+        return [{"test_code": row[0], "count": row[1], "latest": row[2]} for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
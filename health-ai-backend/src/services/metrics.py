@@ -0,0 +1,245 @@
+"""
+性能指标采集
+
+提供Prometheus文本格式的直方图/计数器（/metrics 接口输出），以及按处理阶段
+计时的 track_stage 上下文管理器。安装了OpenTelemetry时，每个阶段同时记录为
+一个span（未配置SDK导出器时为空操作）。
+
+多worker部署时各worker的指标在各自进程中，抓取请求可能落到任意worker：
+设置 METRICS_DIR 后各worker定期把自己的指标写入该目录下以pid命名的文件，
+/metrics 输出所有文件汇总后的值（已退出worker的计数保留，总数不会回退）。
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    from opentelemetry import trace
+    _tracer = trace.get_tracer("health-ai-backend")
+except ImportError:
+    _tracer = None
+
+# 当前请求对应的接口（路由模板），供不直接知道接口名的组件打标签
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="background")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """累积分桶直方图"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各桶计数..., +Inf计数, 总和]
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    @staticmethod
+    def merge(total: Dict[Tuple[str, ...], list], series: Dict[Tuple[str, ...], list]) -> None:
+        for key, values in series.items():
+            if key in total:
+                total[key] = [a + b for a, b in zip(total[key], values)]
+            else:
+                total[key] = list(values)
+
+    def render(self, data: Optional[Dict[Tuple[str, ...], list]] = None) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        items = (self.snapshot() if data is None else data).items()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(total: Dict[Tuple[str, ...], float], values: Dict[Tuple[str, ...], float]) -> None:
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, data: Optional[Dict[Tuple[str, ...], float]] = None) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        items = (self.snapshot() if data is None else data).items()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._directory: Optional[str] = None
+        self._flush_thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def enable_multiprocess(self, directory: str, interval: float = 5) -> None:
+        """各worker每隔 interval 秒把本进程的指标写入 directory/<pid>.json，输出时汇总所有文件"""
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._stopped.clear()
+        if self._flush_thread is None:
+            def run():
+                while not self._stopped.wait(interval):
+                    self.flush()
+            self._flush_thread = threading.Thread(target=run, name="metrics-flush", daemon=True)
+            self._flush_thread.start()
+
+    def flush(self) -> None:
+        """把本进程的指标写入文件（先写临时文件再替换，读取方不会读到写了一半的文件）"""
+        if self._directory is None:
+            return
+        data = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                for metric in self._metrics}
+        path = os.path.join(self._directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join()
+            self._flush_thread = None
+        self.flush()
+
+    def _collect(self) -> Dict[str, dict]:
+        self.flush()
+        totals = {metric.name: {} for metric in self._metrics}
+        merge = {metric.name: metric.merge for metric in self._metrics}
+        for filename in os.listdir(self._directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._directory, filename), encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, items in data.items():
+                if name in totals:
+                    merge[name](totals[name], {tuple(key): value for key, value in items})
+        return totals
+
+    def render(self) -> str:
+        if self._directory is None:
+            return "\n".join(metric.render() for metric in self._metrics) + "\n"
+        totals = self._collect()
+        return "\n".join(metric.render(totals[metric.name]) for metric in self._metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    "health_request_duration_seconds", "HTTP请求耗时（秒）", ["method", "endpoint", "status"]
+)
+STAGE_SECONDS = registry.histogram(
+    "health_stage_duration_seconds", "各处理阶段耗时（秒）", ["endpoint", "stage"]
+)
+STAGE_ERRORS = registry.counter(
+    "health_stage_errors_total", "各处理阶段异常次数", ["endpoint", "stage"]
+)
+PAYLOAD_BYTES = registry.histogram(
+    "health_payload_size", "载荷大小（上传文件为字节数，文本为字符数）", ["endpoint", "kind"], buckets=SIZE_BUCKETS
+)
+LLM_TOKENS = registry.histogram(
+    "health_llm_tokens", "大模型调用的token数", ["endpoint", "kind"], buckets=TOKEN_BUCKETS
+)
+
+
+@contextmanager
+def track_stage(stage: str, endpoint: Optional[str] = None, **attributes):
+    """记录一个处理阶段的耗时（直方图 + 可选的OpenTelemetry span）"""
+    endpoint = endpoint or current_endpoint.get()
+    span = _tracer.start_as_current_span(stage, attributes={"endpoint": endpoint, **attributes}) \
+        if _tracer is not None else nullcontext()
+    start = time.perf_counter()
+    try:
+        with span:
+            yield
+    except Exception:
+        STAGE_ERRORS.inc(endpoint=endpoint, stage=stage)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint, stage=stage)
+
+
+def observe_stage(stage: str, seconds: float, endpoint: Optional[str] = None) -> None:
+    """直接记录阶段耗时（用于无法包裹在with语句中的阶段，如流式输出）"""
+    STAGE_SECONDS.observe(seconds, endpoint=endpoint or current_endpoint.get(), stage=stage)
+
+
+def observe_payload(kind: str, size: int, endpoint: Optional[str] = None) -> None:
+    PAYLOAD_BYTES.observe(size, endpoint=endpoint or current_endpoint.get(), kind=kind)
+
+
+def record_llm_usage(usage: dict) -> None:
+    """记录大模型返回的token用量（OpenAI兼容的usage字段）"""
+    endpoint = current_endpoint.get()
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind) is not None:
+            LLM_TOKENS.observe(usage[kind], endpoint=endpoint, kind=kind.replace("_tokens", ""))
@@ -0,0 +1,171 @@
+"""
+化验单图片OCR
+
+手机拍摄的化验单分辨率远高于OCR需要的精度。识别前先做预处理：灰度化、
+按目标DPI缩小、纠正倾斜、自适应二值化，再按行间空白切分成文字区域，
+只识别有文字的区域。
+
+每个解析进程常驻一个 Tesseract 实例（tesserocr，语言模型只加载一次），逐区域识别。
+没有安装 tesserocr 时回退到 pytesseract，把文字区域拼成一张紧凑图片只调用一次
+tesseract 命令行，但每张图片仍要启动一次进程、加载一次语言模型，创建引擎时会记录警告。
+
+tesserocr 需要针对本机的 Tesseract/Leptonica 开发库编译，不在 requirements.txt 中，
+部署时按需单独安装：
+
+    apt-get install libtesseract-dev libleptonica-dev pkg-config   # Debian/Ubuntu
+    pip install tesserocr==2.8.0
+"""
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+OCR_LANG = os.getenv("OCR_LANG", "chi_sim+eng")
+# 按A4纸宽（8.27英寸）和目标DPI折算的最大图片宽度
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+OCR_TARGET_WIDTH = int(8.27 * OCR_TARGET_DPI)
+# 行间空白超过该高度（像素）时切分为不同区域
+OCR_REGION_GAP = int(os.getenv("OCR_REGION_GAP", 24))
+OCR_REGION_PADDING = 8
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+logger = logging.getLogger(__name__)
+
+
+def load_image(file_path: str) -> np.ndarray:
+    # cv2.imread 不支持中文路径，先读字节再解码
+    data = np.fromfile(file_path, dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("无法读取图片")
+    return image
+
+
+def _deskew(gray: np.ndarray) -> np.ndarray:
+    """根据前景像素的最小外接矩形估计倾斜角并旋转校正"""
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    coords = np.column_stack(np.where(mask > 0))
+    if len(coords) < 100:
+        return gray
+    angle = cv2.minAreaRect(coords[:, ::-1].astype(np.float32))[-1]
+    # 不同OpenCV版本的角度范围不同（[-90, 0) 或 [0, 90)），统一到 [-45, 45]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 0.5 or abs(angle) > 15:
+        # 角度过小不必旋转；过大多半是版面而非拍摄倾斜，不做处理
+        return gray
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+def preprocess(gray: np.ndarray) -> np.ndarray:
+    """缩放到目标DPI、纠偏、二值化，返回白底黑字的二值图"""
+    height, width = gray.shape
+    if width > OCR_TARGET_WIDTH:
+        scale = OCR_TARGET_WIDTH / width
+        gray = cv2.resize(gray, (OCR_TARGET_WIDTH, int(height * scale)), interpolation=cv2.INTER_AREA)
+    gray = _deskew(gray)
+    # 自适应阈值应对拍照时的光照不均
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15)
+
+
+def split_regions(binary: np.ndarray) -> List[Tuple[int, int]]:
+    """按水平投影找出有文字的行，行间空白较大处切分，返回各区域的 (起始行, 结束行)"""
+    ink = (binary < 128).sum(axis=1)
+    rows = np.where(ink > max(2, binary.shape[1] // 500))[0]
+    if len(rows) == 0:
+        return []
+
+    regions = []
+    start = prev = rows[0]
+    for row in rows[1:]:
+        if row - prev > OCR_REGION_GAP:
+            regions.append((int(start), int(prev) + 1))
+            start = row
+        prev = row
+    regions.append((int(start), int(prev) + 1))
+
+    height = binary.shape[0]
+    return [(max(0, top - OCR_REGION_PADDING), min(height, bottom + OCR_REGION_PADDING)) for top, bottom in regions]
+
+
+class OCREngine:
+    """OCR引擎，每个解析进程创建一次"""
+
+    def __init__(self, lang: str = OCR_LANG):
+        self.lang = lang
+        self._api = None
+        if tesserocr is not None:
+            # PSM 6：把每个区域当作一个统一的文本块
+            self._api = tesserocr.PyTessBaseAPI(lang=lang.replace(",", "+"), psm=tesserocr.PSM.SINGLE_BLOCK)
+        else:
+            logger.warning("未安装 tesserocr，OCR回退到 pytesseract，每张图片都会启动一次 tesseract 进程"
+                           "（安装方法见 ocr_engine 模块说明）")
+
+    @property
+    def backend(self) -> str:
+        return "tesserocr" if self._api is not None else "pytesseract"
+
+    def _recognize_regions(self, binary: np.ndarray, regions: List[Tuple[int, int]]) -> str:
+        if self._api is not None:
+            from PIL import Image
+
+            texts = []
+            for top, bottom in regions:
+                self._api.SetImage(Image.fromarray(binary[top:bottom]))
+                texts.append(self._api.GetUTF8Text().strip())
+            return "\n".join(text for text in texts if text)
+
+        import pytesseract
+
+        # 去掉区域之间的大片空白，拼成一张图只调用一次tesseract
+        separator = np.full((OCR_REGION_PADDING * 2, binary.shape[1]), 255, dtype=binary.dtype)
+        parts = []
+        for top, bottom in regions:
+            parts.extend([binary[top:bottom], separator])
+        compact = np.vstack(parts[:-1])
+        return pytesseract.image_to_string(compact, lang=self.lang, config="--psm 6").strip()
+
+    def extract_text(self, file_path: str) -> Dict[str, Any]:
+        """识别一张图片，返回与图片解析器一致的 parse_result（text字段）"""
+        start = time.perf_counter()
+        try:
+            binary = preprocess(load_image(file_path))
+            regions = split_regions(binary)
+            text = self._recognize_regions(binary, regions) if regions else ""
+            return {
+                "success": True,
+                "text": text,
+                "regions": len(regions),
+                "image_size": list(binary.shape[::-1]),
+                "ocr_backend": self.backend,
+                "seconds": round(time.perf_counter() - start, 3),
+            }
+        except Exception as e:
+            return {"success": False, "error": f"图片识别失败: {str(e)}"}
+
+    def close(self) -> None:
+        if self._api is not None:
+            self._api.End()
+            self._api = None
+
+
+_engine: Optional[OCREngine] = None
+
+
+def get_engine() -> OCREngine:
+    global _engine
+    if _engine is None:
+        _engine = OCREngine()
+    return _engine
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的SHA-256"""
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ParseResultCache:
+    """解析结果磁盘缓存
+
+    以 (内容哈希, 解析器版本) 为键保存PDF/OCR解析结果，解析器或OCR配置
+    升级后版本号变化，旧结果自然失效。缓存总大小超过上限时按最近访问
+    时间（LRU）淘汰。多个解析进程可以共享同一个缓存文件。
+    """
+
+    def __init__(self, db_path: str = "./data/cache/parse_cache.db", max_bytes: int = 512 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS parse_cache (
+                    content_hash TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    result BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (content_hash, version)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_access ON parse_cache (last_access)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            for name in ("hits", "misses", "evictions"):
+                self._conn.execute("INSERT OR IGNORE INTO cache_stats (name, value) VALUES (?, 0)", (name,))
+
+    def get(self, content_hash: str, version: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，命中时刷新访问时间"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT result FROM parse_cache WHERE content_hash = ? AND version = ?",
+                (content_hash, version)
+            ).fetchone()
+            if row is None:
+                self._incr("misses")
+                return None
+
+            self._conn.execute(
+                "UPDATE parse_cache SET last_access = ? WHERE content_hash = ? AND version = ?",
+                (time.time(), content_hash, version)
+            )
+            self._incr("hits")
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def put(self, content_hash: str, version: str, result: Dict[str, Any]) -> None:
+        """写入缓存，并在超出容量时淘汰最久未访问的结果"""
+        blob = zlib.compress(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parse_cache (content_hash, version, result, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, version, blob, len(blob), time.time())
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM parse_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = self._conn.execute(
+            "SELECT content_hash, version, size FROM parse_cache ORDER BY last_access"
+        ).fetchall()
+        for content_hash, version, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute(
+                "DELETE FROM parse_cache WHERE content_hash = ? AND version = ?", (content_hash, version)
+            )
+            total -= size
+            evicted += 1
+        self._incr("evictions", evicted)
+
+    def _incr(self, name: str, amount: int = 1):
+        self._conn.execute("UPDATE cache_stats SET value = value + ? WHERE name = ?", (amount, name))
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：命中/未命中/淘汰次数和当前占用"""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM cache_stats").fetchall())
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM parse_cache"
+            ).fetchone()
+
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "evictions": counters.get("evictions", 0),
+            "hit_rate": round(counters.get("hits", 0) / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
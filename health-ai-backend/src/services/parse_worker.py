@@ -0,0 +1,107 @@
+"""
+报告解析工作进程
+
+解析器在每个工作进程中只初始化一次，上传接口把PDF解析和OCR提交到进程池，
+避免阻塞API的事件循环。解析结果按内容哈希和解析器版本写入磁盘缓存，
+重新入库时跳过pdfplumber/tesseract解析。
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.services.parse_cache import ParseResultCache, file_sha256
+
+# 解析器/OCR配置版本，修改解析逻辑或OCR参数后递增，使旧缓存失效
+PDF_PARSER_VERSION = os.getenv("PDF_PARSER_VERSION", "1")
+IMAGE_PARSER_VERSION = os.getenv("IMAGE_PARSER_VERSION", "1")
+
+# 图片解析方式：engine（预处理 + 区域OCR，见 ocr_engine）或 parser（ImageHealthParser）
+IMAGE_OCR_PIPELINE = os.getenv("IMAGE_OCR_PIPELINE", "engine")
+
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "./data/cache/parse_cache.db")
+PARSE_CACHE_MAX_MB = int(os.getenv("PARSE_CACHE_MAX_MB", 512))
+
+_pdf_parser = None
+_image_parser = None
+_ocr_engine = None
+_parse_cache = None
+
+
+def create_parse_cache() -> ParseResultCache:
+    return ParseResultCache(PARSE_CACHE_PATH, max_bytes=PARSE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def init_worker():
+    """进程池初始化：在工作进程中创建解析器和缓存连接"""
+    global _pdf_parser, _image_parser, _ocr_engine, _parse_cache
+    from src.parsers.pdf_parser import PDFHealthParser
+    from src.parsers.image_parser import ImageHealthParser
+
+    _pdf_parser = PDFHealthParser()
+    _image_parser = ImageHealthParser()
+    if IMAGE_OCR_PIPELINE == "engine":
+        # OCR引擎常驻工作进程，语言模型只加载一次
+        from src.services.ocr_engine import get_engine
+        _ocr_engine = get_engine()
+    _parse_cache = create_parse_cache()
+
+
+def warm_up() -> int:
+    """空任务，用于启动时提前拉起进程池中的工作进程（触发 init_worker）"""
+    return os.getpid()
+
+
+def parser_version(content_type: str) -> str:
+    """该类型文件当前的解析器版本，作为解析结果缓存/存储的版本键"""
+    if content_type == 'application/pdf':
+        return f"pdf:{PDF_PARSER_VERSION}"
+    if IMAGE_OCR_PIPELINE == "engine":
+        return f"image-ocr:{IMAGE_PARSER_VERSION}"
+    return f"image:{IMAGE_PARSER_VERSION}"
+
+
+def parse_report(file_path: str, content_type: str, content_hash: Optional[str] = None) -> Dict[str, Any]:
+    """根据文件类型解析医疗报告，优先读取解析缓存"""
+    if _pdf_parser is None:
+        init_worker()
+
+    version = parser_version(content_type)
+    if content_type == 'application/pdf':
+        parse = _pdf_parser.parse_medical_report
+    elif _ocr_engine is not None:
+        parse = _ocr_engine.extract_text
+    else:
+        parse = _image_parser.extract_health_text
+
+    content_hash = content_hash or file_sha256(file_path)
+    cached = _parse_cache.get(content_hash, version)
+    if cached is not None:
+        return cached
+
+    result = parse(file_path)
+    if result.get("success", False):
+        _parse_cache.put(content_hash, version, result)
+    return result
+
+
+def parse_images(items: List[Tuple[str, str, Optional[str]]]) -> List[Dict[str, Any]]:
+    """批量解析多张图片 [(file_path, content_type, content_hash)]
+
+    一次进程池任务完成，分摊任务调度和结果回传的开销，结果顺序与输入一致。
+    """
+    return [parse_report(file_path, content_type, content_hash) for file_path, content_type, content_hash in items]
+
+
+def aggregate_wearable(file_path: str, hr_max: Optional[float] = None) -> Dict[str, Any]:
+    """解码 .fit 文件，按分钟聚合各指标并做心率分析（在工作进程中执行）"""
+    from src.utils.fit_decoder import AGGREGATE_FIELDS, minute_aggregates, read_fit
+    from src.utils.hr_analytics import analyze_records
+
+    start = time.perf_counter()
+    columns, rr_intervals = read_fit(file_path, fields=("timestamp",) + AGGREGATE_FIELDS, hrv=True)
+    return {
+        "records": len(columns["timestamp"]),
+        "metrics": minute_aggregates(columns),
+        "analytics": analyze_records(columns, rr_intervals, hr_max=hr_max),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
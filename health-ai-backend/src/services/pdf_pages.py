@@ -0,0 +1,108 @@
+"""
+按页并行解析PDF
+
+大型报告（几十页，文字页与扫描页混排）拆成单页任务提交到解析进程池：有文字层
+的页面直接用pdfplumber提取文本，文字过少的页面才渲染成图片做OCR。页面结果
+按完成先后返回，调用方可以按页序拼接、分批入库，不必等待最后一页。
+同时提交的页数有上限，页数很多的文件不会一次把所有页面任务压进进程池队列。
+"""
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+# 页面提取到的字符数低于该值时视为扫描页，改用OCR
+PDF_TEXT_MIN_CHARS = int(os.getenv("PDF_TEXT_MIN_CHARS", 20))
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", 300))
+OCR_LANG = os.getenv("OCR_LANG", "chi_sim+eng")
+# 同时在进程池中排队/执行的页数，0表示由调用方按解析进程数决定（未指定时为CPU数的2倍）
+PDF_PAGES_IN_FLIGHT = int(os.getenv("PDF_PAGES_IN_FLIGHT", 0))
+
+# 工作进程内缓存最近打开的PDF，同一文件的连续页面任务不重复解析文件结构
+_open_pdf = None
+_open_path = None
+
+
+def _get_pdf(file_path: str):
+    global _open_pdf, _open_path
+    if _open_path != file_path:
+        import pdfplumber
+
+        if _open_pdf is not None:
+            _open_pdf.close()
+            _open_pdf, _open_path = None, None
+        # 上传文件按内容哈希存放，路径相同即内容相同
+        _open_pdf = pdfplumber.open(file_path)
+        _open_path = file_path
+    return _open_pdf
+
+
+def count_pages(file_path: str) -> int:
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+
+def parse_page(file_path: str, page_number: int) -> Dict[str, Any]:
+    """解析单页（在工作进程中执行），page_number从0开始"""
+    start = time.perf_counter()
+    try:
+        page = _get_pdf(file_path).pages[page_number]
+        try:
+            text = (page.extract_text() or "").strip()
+            method = "text"
+            if len(text) < PDF_TEXT_MIN_CHARS:
+                import pytesseract
+
+                image = page.to_image(resolution=PDF_OCR_DPI).original
+                ocr_text = pytesseract.image_to_string(image, lang=OCR_LANG).strip()
+                if len(ocr_text) > len(text):
+                    text, method = ocr_text, "ocr"
+        finally:
+            # 释放该页解析出的字符/图形对象缓存，PDF保持打开时内存不随已处理页数增长
+            page.close()
+        return {"page": page_number, "text": text, "method": method,
+                "seconds": round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        return {"page": page_number, "text": "", "method": "error", "error": str(e),
+                "seconds": round(time.perf_counter() - start, 3)}
+
+
+async def iter_pages(executor, file_path: str, page_count: int,
+                     max_in_flight: int = None) -> AsyncIterator[Dict[str, Any]]:
+    """把页面提交到进程池，按完成先后逐页返回结果
+
+    :param max_in_flight: 同时提交的页数，每完成一页再提交下一页
+    """
+    loop = asyncio.get_running_loop()
+    max_in_flight = max(1, max_in_flight or 2 * (os.cpu_count() or 1))
+    next_page = 0
+    pending = set()
+    try:
+        while next_page < page_count or pending:
+            while next_page < page_count and len(pending) < max_in_flight:
+                pending.add(loop.run_in_executor(executor, parse_page, file_path, next_page))
+                next_page += 1
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def merge_pages(pages: List[Dict[str, Any]], page_count: int) -> Dict[str, Any]:
+    """按页序合并页面结果，格式与PDF解析器的 parse_result 一致（raw_text）"""
+    pages = sorted(pages, key=lambda p: p["page"])
+    failed = [p for p in pages if p["method"] == "error"]
+    if len(failed) == page_count:
+        return {"success": False, "error": failed[0]["error"] if failed else "PDF没有页面"}
+    return {
+        "success": True,
+        "raw_text": "\n\n".join(p["text"] for p in pages if p["text"]),
+        "page_count": page_count,
+        "ocr_pages": [p["page"] + 1 for p in pages if p["method"] == "ocr"],
+        "failed_pages": [p["page"] + 1 for p in failed],
+        "parse_mode": "page_parallel",
+    }
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class ProfileStore:
+    """健康档案摘要持久化
+
+    保存每个用户最近一次生成的摘要，以及摘要生成之后新增、尚未纳入摘要的
+    文档（增量）。没有增量时摘要即为最新，直接返回；有增量时只需把
+    “旧摘要 + 新文档”交给大模型更新。
+    """
+
+    def __init__(self, db_path: str = "./data/profiles.db"):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS profile_summaries (
+                    user_id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    document_count INTEGER NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pending_documents (
+                    user_id TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (user_id, doc_id)
+                )
+            """)
+
+    def get_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """读取已保存的摘要"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, document_count, updated_at FROM profile_summaries WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"summary": row[0], "document_count": row[1], "updated_at": row[2]}
+
+    def save_summary(self, user_id: str, summary: str, document_count: int, covered_doc_ids: List[str]) -> str:
+        """保存摘要，并移除已纳入摘要的增量文档，返回更新时间"""
+        updated_at = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO profile_summaries (user_id, summary, document_count, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (user_id, summary, document_count, updated_at)
+            )
+            self._conn.executemany(
+                "DELETE FROM pending_documents WHERE user_id = ? AND doc_id = ?",
+                [(user_id, doc_id) for doc_id in covered_doc_ids]
+            )
+        return updated_at
+
+    def add_pending(self, user_id: str, doc_id: str, content: str) -> None:
+        """记录摘要生成后新增的文档"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pending_documents (user_id, doc_id, content, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, doc_id, content, datetime.now().isoformat())
+            )
+
+    def has_pending(self, user_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM pending_documents WHERE user_id = ? LIMIT 1", (user_id,)
+            ).fetchone()
+        return row is not None
+
+    def get_pending(self, user_id: str) -> List[Dict[str, str]]:
+        """读取尚未纳入摘要的文档（按写入顺序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT doc_id, content FROM pending_documents WHERE user_id = ? ORDER BY created_at", (user_id,)
+            ).fetchall()
+        return [{"doc_id": doc_id, "content": content} for doc_id, content in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime
+from typing import Any, BinaryIO, Dict, List, Optional
+
+
+class UploadStore:
+    """内容寻址的上传文件存储
+
+    文件按SHA-256保存（边写盘边计算哈希），并在SQLite索引中记录
+    哈希 -> 解析结果、哈希 + 用户 -> 向量库写入记录，
+    相同内容的重复上传无需再次解析和向量化。解析结果带解析器版本，
+    版本变化后视为没有解析结果，重新解析。
+    """
+
+    def __init__(self, root_dir: str = "./data/uploads", index_path: Optional[str] = None,
+                 chunk_size: int = 1024 * 1024):
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, "objects")
+        self.chunk_size = chunk_size
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self.index_path = index_path or os.path.join(root_dir, "upload_index.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    sha256 TEXT PRIMARY KEY,
+                    file_id TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_type TEXT,
+                    parse_result TEXT,
+                    parser_version TEXT,
+                    created_at TEXT NOT NULL
+                )
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(uploads)")}
+            if "parser_version" not in columns:
+                # 旧库没有版本列，已有的解析结果版本未知，下次使用时重新解析
+                self._conn.execute("ALTER TABLE uploads ADD COLUMN parser_version TEXT")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_refs (
+                    sha256 TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    vector_ids TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    PRIMARY KEY (sha256, user_id)
+                )
+            """)
+
+    # --- 文件存储 ---
+
+    def save_stream(self, stream: BinaryIO, extension: str = "") -> Dict[str, Any]:
+        """流式写入文件并计算哈希，返回内容地址信息"""
+        extension = (extension or "").lower()
+        hasher = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    buffer.write(chunk)
+                    size += len(chunk)
+
+            sha256 = hasher.hexdigest()
+            file_id = f"{sha256}{extension}"
+            file_path = self.object_path(file_id)
+            if os.path.exists(file_path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                os.replace(tmp_path, file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return {"sha256": sha256, "file_id": file_id, "file_path": file_path, "size": size}
+
+    def object_path(self, file_id: str) -> str:
+        # 按哈希前两位分目录，避免单目录文件过多
+        return os.path.join(self.objects_dir, file_id[:2], file_id)
+
+    # --- 解析结果索引 ---
+
+    def get_parse_result(self, sha256: str, parser_version: str) -> Optional[Dict[str, Any]]:
+        """获取该解析器版本的解析结果，没有或版本不同时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT parse_result FROM uploads WHERE sha256 = ? AND parser_version = ?", (sha256, parser_version)
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return json.loads(row[0])
+
+    def save_parse_result(self, sha256: str, file_id: str, size: int, content_type: str,
+                          parse_result: Dict[str, Any], parser_version: str) -> None:
+        """保存解析成功的结果"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (sha256, file_id, size, content_type, parse_result, parser_version, "
+                "created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, file_id, size, content_type, json.dumps(parse_result, ensure_ascii=False), parser_version,
+                 datetime.now().isoformat())
+            )
+
+    # --- 用户向量写入记录 ---
+
+    def get_user_ref(self, sha256: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """查询该用户是否已写入过相同内容"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector_ids, created_at FROM upload_refs WHERE sha256 = ? AND user_id = ?",
+                (sha256, user_id)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"vector_ids": json.loads(row[0]), "created_at": row[1]}
+
+    def add_user_ref(self, sha256: str, user_id: str, vector_ids: Optional[List[str]] = None) -> None:
+        """记录用户的向量库写入"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO upload_refs (sha256, user_id, vector_ids, created_at) VALUES (?, ?, ?, ?)",
+                (sha256, user_id, json.dumps(vector_ids or []), datetime.now().isoformat())
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
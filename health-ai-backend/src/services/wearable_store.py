@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 汇总粒度（秒）：1分钟、1小时、1天（按UTC切分）
+RESOLUTIONS = {"1min": 60, "1h": 3600, "1d": 86400}
+BUCKET_DTYPE = np.dtype([("time", "<i8"), ("count", "<i8"), ("sum", "<f8"), ("min", "<f8"), ("max", "<f8")])
+
+_METRIC_NAME = re.compile(r"^[a-z][a-z0-9_]{0,31}$")
+
+
+def combine_buckets(buckets: np.ndarray, seconds: Optional[int] = None) -> np.ndarray:
+    """合并时间相同的桶（计数、求和相加，最小/最大取极值），按时间升序返回
+
+    指定 seconds 时先把时间向下取整到该粒度，即由细粒度汇总出粗粒度。
+    """
+    if len(buckets) == 0:
+        return np.empty(0, dtype=BUCKET_DTYPE)
+    keys = buckets["time"] // seconds * seconds if seconds else buckets["time"]
+    order = np.argsort(keys, kind="stable")
+    keys, ordered = keys[order], buckets[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+    result = np.empty(len(starts), dtype=BUCKET_DTYPE)
+    result["time"] = keys[starts]
+    result["count"] = np.add.reduceat(ordered["count"], starts)
+    result["sum"] = np.add.reduceat(ordered["sum"], starts)
+    result["min"] = np.minimum.reduceat(ordered["min"], starts)
+    result["max"] = np.maximum.reduceat(ordered["max"], starts)
+    return result
+
+
+class WearableStore:
+    """可穿戴设备时间序列存储（多粒度汇总，内存映射文件）
+
+    每个用户、每个指标、每种粒度（1分钟/1小时/1天）一个只追加的二进制文件，
+    每个桶一条定长记录（时间、采样数、和、最小、最大），按时间升序排列。
+    写入时由分钟数据增量更新三种粒度：新数据晚于已有数据时直接追加
+    （与最后一个桶时间相同则合并后重写该桶）；补传更早的数据时只重写重叠点之后的部分。
+
+    写入在文件上持有排他锁原地截断重写，读取时持有共享锁，映射的页面在读取期间
+    不会被截断（否则访问会触发SIGBUS或读到写了一半的记录）。
+    查询用 np.memmap 打开文件、二分查找时间范围，只读取用到的页面；
+    查询接口在不超过点数上限的前提下选择最细的粒度，一年的数据也只需读取
+    几百个日汇总桶。
+    """
+
+    def __init__(self, root_dir: str = "./data/wearable"):
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+        self._lock = threading.Lock()
+
+    # --- 文件布局 ---
+
+    def _user_dir(self, user_id: str) -> str:
+        # 用户ID可能含任意字符，目录名取哈希；原始ID写入 user_id 文件便于排查
+        return os.path.join(self.root_dir, hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:16])
+
+    def _series_path(self, user_id: str, metric: str, resolution: str) -> str:
+        return os.path.join(self._user_dir(user_id), metric, f"{resolution}.bin")
+
+    @staticmethod
+    @contextmanager
+    def _open(path: str):
+        """持有共享锁，以只读内存映射打开一个汇总文件；文件不存在时得到空数组
+
+        映射只能在 with 块内使用，需要的数据应在块内复制出来。
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            yield np.empty(0, dtype=BUCKET_DTYPE)
+            return
+        with f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_SH)
+            count = os.fstat(f.fileno()).st_size // BUCKET_DTYPE.itemsize
+            buckets = np.memmap(f, dtype=BUCKET_DTYPE, mode="r", shape=(count,)) if count else \
+                np.empty(0, dtype=BUCKET_DTYPE)
+            try:
+                yield buckets
+            finally:
+                del buckets
+
+    # --- 写入 ---
+
+    @staticmethod
+    def _merge_file(path: str, buckets: np.ndarray) -> None:
+        """把按时间排序的新桶并入文件：从第一个重叠位置起截断，追加合并后的部分"""
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            if fcntl is not None:
+                # 多个worker进程可能同时写入同一用户的数据
+                fcntl.flock(f, fcntl.LOCK_EX)
+            count = os.fstat(f.fileno()).st_size // BUCKET_DTYPE.itemsize
+            position = count
+            tail = np.empty(0, dtype=BUCKET_DTYPE)
+            if count:
+                existing = np.memmap(f, dtype=BUCKET_DTYPE, mode="r", shape=(count,))
+                position = int(np.searchsorted(existing["time"], buckets["time"][0], side="left"))
+                tail = np.array(existing[position:])
+                del existing
+            merged = combine_buckets(np.concatenate([tail, buckets])) if len(tail) else buckets
+            f.seek(position * BUCKET_DTYPE.itemsize)
+            f.truncate()
+            f.write(merged.tobytes())
+
+    def append(self, user_id: str, metrics: Dict[str, Dict[str, Any]]) -> int:
+        """写入一个文件的分钟聚合结果，同时更新小时和天汇总，返回写入的分钟桶数
+
+        :param metrics: {指标: {"time", "mean", "min", "max", "count"}}，见 fit_decoder.minute_aggregates
+        """
+        written = 0
+        with self._lock:
+            user_dir = self._user_dir(user_id)
+            os.makedirs(user_dir, exist_ok=True)
+            with open(os.path.join(user_dir, "user_id"), "w", encoding="utf-8") as f:
+                f.write(user_id)
+
+            for metric, series in metrics.items():
+                if not _METRIC_NAME.match(metric) or len(series["time"]) == 0:
+                    continue
+                minutes = np.empty(len(series["time"]), dtype=BUCKET_DTYPE)
+                minutes["time"] = series["time"]
+                minutes["count"] = series["count"]
+                minutes["sum"] = np.asarray(series["mean"], dtype=np.float64) * minutes["count"]
+                minutes["min"] = series["min"]
+                minutes["max"] = series["max"]
+                minutes = combine_buckets(minutes, RESOLUTIONS["1min"])
+
+                os.makedirs(os.path.join(user_dir, metric), exist_ok=True)
+                for resolution, seconds in RESOLUTIONS.items():
+                    buckets = minutes if resolution == "1min" else combine_buckets(minutes, seconds)
+                    self._merge_file(self._series_path(user_id, metric, resolution), buckets)
+                written += len(minutes)
+        return written
+
+    # --- 查询 ---
+
+    def get_range(self, user_id: str, metric: str, start: Optional[int] = None, end: Optional[int] = None,
+                  limit: int = 1440, resolution: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """某个指标在 [start, end)（Unix秒）内的汇总序列，返回 (粒度, 点列表)
+
+        未指定粒度时，选择范围内桶数不超过 limit 的最细粒度；都超过时用最粗粒度，
+        只返回范围内最近的 limit 个点。结果按时间升序。
+        """
+        if not _METRIC_NAME.match(metric):
+            return resolution or "1min", []
+        candidates = [resolution] if resolution else list(RESOLUTIONS)
+
+        for name in candidates:
+            with self._open(self._series_path(user_id, metric, name)) as buckets:
+                times = buckets["time"]
+                lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+                hi = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+                if hi - lo <= limit or name == candidates[-1]:
+                    window = np.array(buckets[max(lo, hi - limit):hi])
+                    break
+
+        points = [
+            {"time": int(t), "mean": float(s / c), "min": float(low), "max": float(high), "count": int(c)}
+            for t, c, s, low, high in zip(window["time"], window["count"], window["sum"],
+                                          window["min"], window["max"])
+        ]
+        return name, points
+
+    def list_metrics(self, user_id: str) -> List[Dict[str, Any]]:
+        """用户有数据的指标及其分钟桶数、时间范围"""
+        user_dir = self._user_dir(user_id)
+        if not os.path.isdir(user_dir):
+            return []
+        result = []
+        for metric in sorted(os.listdir(user_dir)):
+            if not os.path.isdir(os.path.join(user_dir, metric)):
+                continue
+            with self._open(self._series_path(user_id, metric, "1min")) as buckets:
+                if len(buckets):
+                    result.append({"metric": metric, "minutes": len(buckets),
+                                   "first": int(buckets["time"][0]), "last": int(buckets["time"][-1])})
+        return result
+
+    def close(self):
+        # 文件在每次读写时打开，没有常驻句柄
+        pass
@@ -0,0 +1,354 @@
+"""
+FIT文件列式解码
+
+按FIT协议直接读取文件字节，一次扫描记下每条 record 消息在文件中的位置，
+再按字段用NumPy从原始字节中批量取出数值，得到按列存放的数组（心率、踏频、
+速度、功率、GPS、海拔等）。不为每个采样点创建Python对象，也不逐字段解析，
+只解码调用方选择的字段。minute_aggregates 把解码结果按分钟聚合（均值/最小/最大/计数），
+供可穿戴数据上传接口和 parser/parser.py 共用。
+
+    columns = read_fit_records("activity.fit", fields=["timestamp", "heart_rate"])
+    columns["heart_rate"]  # float32数组，无效值为NaN
+"""
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+# FIT时间戳从 1989-12-31 00:00:00 UTC 起算
+FIT_EPOCH_OFFSET = 631065600
+RECORD_MESSAGE = 20
+# hrv消息：字段0为RR间期数组（uint16，1/1000秒）
+HRV_MESSAGE = 78
+TIMESTAMP_FIELD = 253
+
+# 基础类型编号 -> (NumPy类型, 无效值)
+_BASE_TYPES = {
+    0x00: ("u1", 0xFF),                 # enum
+    0x01: ("i1", 0x7F),                 # sint8
+    0x02: ("u1", 0xFF),                 # uint8
+    0x03: ("i2", 0x7FFF),               # sint16
+    0x04: ("u2", 0xFFFF),               # uint16
+    0x05: ("i4", 0x7FFFFFFF),           # sint32
+    0x06: ("u4", 0xFFFFFFFF),           # uint32
+    0x08: ("f4", None),                 # float32（无效值为全1字节，按NaN处理）
+    0x09: ("f8", None),                 # float64
+    0x0A: ("u1", 0x00),                 # uint8z
+    0x0B: ("u2", 0x0000),               # uint16z
+    0x0C: ("u4", 0x00000000),           # uint32z
+    0x0D: ("u1", 0xFF),                 # byte
+    0x0E: ("i8", 0x7FFFFFFFFFFFFFFF),   # sint64
+    0x0F: ("u8", 0xFFFFFFFFFFFFFFFF),   # uint64
+    0x10: ("u8", 0x0000000000000000),   # uint64z
+}
+
+# record消息字段：列名 -> (字段编号, 比例, 偏移, 输出类型)，物理值 = 原始值 / 比例 - 偏移
+_SEMICIRCLE_TO_DEGREE = 180.0 / 2 ** 31
+RECORD_FIELDS = {
+    "position_lat": (0, 1 / _SEMICIRCLE_TO_DEGREE, 0, np.float64),   # 度
+    "position_long": (1, 1 / _SEMICIRCLE_TO_DEGREE, 0, np.float64),  # 度
+    "altitude": (2, 5, 500, np.float64),                             # 米
+    "heart_rate": (3, 1, 0, np.float32),                             # 次/分
+    "cadence": (4, 1, 0, np.float32),                                # 转/分
+    "distance": (5, 100, 0, np.float64),                             # 米
+    "speed": (6, 1000, 0, np.float64),                               # 米/秒
+    "power": (7, 1, 0, np.float32),                                  # 瓦
+    "temperature": (13, 1, 0, np.float32),                           # 摄氏度
+}
+# 增强字段（更大的取值范围），存在时优先使用
+_ENHANCED_FIELDS = {
+    "speed": (73, 1000, 0),
+    "altitude": (78, 5, 500),
+}
+ALL_FIELDS = ("timestamp",) + tuple(RECORD_FIELDS)
+
+
+class _Definition:
+    """一条定义消息：数据消息的字段布局，以及使用该布局的数据消息位置"""
+
+    __slots__ = ("global_number", "endian", "fields", "size", "offsets", "rows", "sequence", "time_offsets")
+
+    def __init__(self, global_number: int, endian: str, fields: Dict[int, tuple], size: int):
+        self.global_number = global_number
+        self.endian = endian
+        # 字段编号 -> (消息内字节偏移, 字节数, 基础类型编号)
+        self.fields = fields
+        self.size = size
+        self.offsets: List[int] = []
+        self.rows: List[int] = []
+        # 压缩时间戳需要按文件顺序回放，只有出现压缩时间戳时才用到
+        self.sequence: List[int] = []
+        self.time_offsets: List[int] = []
+
+
+def _scan(data: bytes) -> Tuple[List[_Definition], int, bool]:
+    """扫描一遍文件，记录每条数据消息的位置；返回 (定义列表, record消息数, 是否有压缩时间戳)"""
+    definitions: List[_Definition] = []
+    records = 0
+    sequence = 0
+    compressed = False
+    start = 0
+    # 支持多个FIT文件首尾相连（chained FIT）
+    while start + 12 <= len(data):
+        header_size = data[start]
+        if data[start + 8:start + 12] != b".FIT":
+            if start == 0:
+                raise ValueError("不是有效的FIT文件")
+            break
+        data_size = struct.unpack_from("<I", data, start + 4)[0]
+        pos = start + header_size
+        end = min(pos + data_size, len(data))
+        local: Dict[int, _Definition] = {}
+
+        while pos < end:
+            header = data[pos]
+            if header & 0x80:
+                # 压缩时间戳消息头：第5-6位为本地消息类型，低5位为时间偏移
+                definition = local[(header >> 5) & 0x03]
+                time_offset = header & 0x1F
+                compressed = True
+            elif header & 0x40:
+                # 定义消息
+                endian = ">" if data[pos + 2] else "<"
+                global_number = struct.unpack_from(endian + "H", data, pos + 3)[0]
+                field_count = data[pos + 5]
+                fields, size = {}, 0
+                cursor = pos + 6
+                for _ in range(field_count):
+                    number, field_size, base_type = data[cursor], data[cursor + 1], data[cursor + 2] & 0x1F
+                    fields.setdefault(number, (size, field_size, base_type))
+                    size += field_size
+                    cursor += 3
+                if header & 0x20:
+                    # 开发者字段只计入消息长度，不解码
+                    dev_count = data[cursor]
+                    size += sum(data[cursor + 2 + 3 * i] for i in range(dev_count))
+                    cursor += 1 + 3 * dev_count
+                definition = _Definition(global_number, endian, fields, size)
+                definitions.append(definition)
+                local[header & 0x0F] = definition
+                pos = cursor
+                continue
+            else:
+                definition = local[header & 0x0F]
+                time_offset = -1
+            if pos + 1 + definition.size > end:
+                # 文件被截断，丢弃不完整的最后一条消息
+                break
+
+            definition.offsets.append(pos + 1)
+            definition.sequence.append(sequence)
+            definition.time_offsets.append(time_offset)
+            if definition.global_number == RECORD_MESSAGE:
+                definition.rows.append(records)
+                records += 1
+            sequence += 1
+            pos += 1 + definition.size
+
+        # 数据区之后是2字节CRC
+        start = end + 2
+    return definitions, records, compressed
+
+
+def _read_field(buffer: np.ndarray, definition: _Definition, offsets: np.ndarray, number: int) -> Optional[np.ndarray]:
+    """从所有使用该定义的消息中批量取出一个字段的原始值，无效值返回为NaN（float64）"""
+    field = definition.fields.get(number)
+    if field is None or field[2] not in _BASE_TYPES:
+        return None
+    byte_offset, field_size, base_type = field
+    code, invalid = _BASE_TYPES[base_type]
+    dtype = np.dtype(definition.endian + code)
+    if field_size < dtype.itemsize:
+        return None
+    # 数组字段只取第一个元素
+    index = offsets[:, None] + (byte_offset + np.arange(dtype.itemsize))
+    raw = np.ascontiguousarray(buffer[index]).view(dtype).reshape(-1)
+    values = raw.astype(np.float64)
+    if invalid is not None:
+        values[raw == invalid] = np.nan
+    return values
+
+
+def _timestamps(buffer: np.ndarray, definitions: List[_Definition], compressed: bool) -> Dict[int, np.ndarray]:
+    """各record定义的时间戳（FIT秒数，float64，缺失为NaN）"""
+    result = {}
+    if not compressed:
+        for definition in definitions:
+            if definition.global_number == RECORD_MESSAGE and definition.offsets:
+                offsets = np.asarray(definition.offsets, dtype=np.int64)
+                values = _read_field(buffer, definition, offsets, TIMESTAMP_FIELD)
+                result[id(definition)] = values if values is not None else np.full(len(offsets), np.nan)
+        return result
+
+    # 压缩时间戳依赖文件中前一条带时间戳的消息，需要按消息顺序回放
+    sequence, timestamps, time_offsets, owners = [], [], [], []
+    for definition in definitions:
+        if not definition.offsets:
+            continue
+        offsets = np.asarray(definition.offsets, dtype=np.int64)
+        values = _read_field(buffer, definition, offsets, TIMESTAMP_FIELD)
+        if values is None:
+            values = np.full(len(offsets), np.nan)
+        sequence.append(np.asarray(definition.sequence, dtype=np.int64))
+        timestamps.append(values)
+        time_offsets.append(np.asarray(definition.time_offsets, dtype=np.int64))
+        owners.append(definition)
+
+    order = np.argsort(np.concatenate(sequence), kind="stable")
+    all_timestamps = np.concatenate(timestamps)[order]
+    all_offsets = np.concatenate(time_offsets)[order]
+    last = None
+    for i in range(len(order)):
+        if all_offsets[i] >= 0:
+            if last is None:
+                continue
+            timestamp = (last & ~0x1F) + all_offsets[i]
+            if all_offsets[i] < (last & 0x1F):
+                timestamp += 0x20
+            all_timestamps[i] = last = timestamp
+        elif not np.isnan(all_timestamps[i]):
+            last = int(all_timestamps[i])
+
+    restored = np.empty_like(all_timestamps)
+    restored[order] = all_timestamps
+    start = 0
+    for definition, values in zip(owners, timestamps):
+        if definition.global_number == RECORD_MESSAGE:
+            result[id(definition)] = restored[start:start + len(values)]
+        start += len(values)
+    return result
+
+
+def _read_rr_intervals(buffer: np.ndarray, definitions: List[_Definition]) -> np.ndarray:
+    """按文件顺序取出所有hrv消息中的RR间期（秒），去掉无效值"""
+    values, keys = [], []
+    for definition in definitions:
+        field = definition.fields.get(0)
+        if definition.global_number != HRV_MESSAGE or not definition.offsets or field is None or field[2] != 0x04:
+            continue
+        byte_offset, field_size, _ = field
+        per_message = field_size // 2
+        offsets = np.asarray(definition.offsets, dtype=np.int64)
+        index = offsets[:, None] + (byte_offset + np.arange(per_message * 2))
+        values.append(np.ascontiguousarray(buffer[index]).view(definition.endian + "u2").reshape(-1))
+        keys.append(np.repeat(np.asarray(definition.sequence, dtype=np.int64), per_message))
+    if not values:
+        return np.empty(0, dtype=np.float64)
+    # 不同定义的消息交错出现，按消息顺序排列（同一消息内保持数组顺序）
+    order = np.argsort(np.concatenate(keys), kind="stable")
+    rr = np.concatenate(values)[order]
+    return rr[rr != 0xFFFF] / 1000.0
+
+
+def read_fit_records(source: Union[str, bytes], fields: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """解码FIT文件中的全部 record 消息，按列返回
+
+    :param source: 文件路径或文件内容
+    :param fields: 需要的列（见 ALL_FIELDS），默认全部；未选择的字段不解码
+    :return: {列名: 数组}，各列长度相同、按文件顺序排列。timestamp 为 datetime64[s]（UTC），
+             GPS 为度，海拔/距离为米，速度为米/秒；缺失值为NaN（时间戳为NaT）
+    """
+    return read_fit(source, fields)[0]
+
+
+def read_fit(source: Union[str, bytes], fields: Optional[Iterable[str]] = None,
+             hrv: bool = False) -> Tuple[Dict[str, np.ndarray], Optional[np.ndarray]]:
+    """与 read_fit_records 相同，hrv=True 时同一次扫描中一并取出RR间期
+
+    :return: (列, RR间期数组（秒，按文件顺序）)；hrv=False 时第二项为None
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        data = bytes(source)
+    else:
+        with open(source, "rb") as f:
+            data = f.read()
+
+    selected = list(ALL_FIELDS if fields is None else fields)
+    unknown = [name for name in selected if name not in ALL_FIELDS]
+    if unknown:
+        raise ValueError(f"不支持的字段: {', '.join(unknown)}")
+
+    try:
+        definitions, count, compressed = _scan(data)
+    except (IndexError, KeyError, struct.error):
+        raise ValueError("FIT文件已损坏或不完整")
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    record_definitions = [d for d in definitions if d.global_number == RECORD_MESSAGE and d.offsets]
+
+    # 预分配各列，再按行号把每个定义的数据写入对应位置
+    columns = {name: np.full(count, np.nan, dtype=RECORD_FIELDS[name][3])
+               for name in selected if name != "timestamp"}
+    if "timestamp" in selected:
+        times = _timestamps(buffer, definitions, compressed)
+        seconds = np.full(count, np.nan)
+        for definition in record_definitions:
+            seconds[definition.rows] = times[id(definition)]
+        timestamp = np.full(count, np.datetime64("NaT"), dtype="datetime64[s]")
+        valid = ~np.isnan(seconds)
+        timestamp[valid] = (seconds[valid].astype(np.int64) + FIT_EPOCH_OFFSET).astype("datetime64[s]")
+        columns = {"timestamp": timestamp, **columns}
+
+    for definition in record_definitions:
+        offsets = np.asarray(definition.offsets, dtype=np.int64)
+        rows = np.asarray(definition.rows, dtype=np.int64)
+        for name in columns:
+            if name == "timestamp":
+                continue
+            number, scale, offset, _ = RECORD_FIELDS[name]
+            if name in _ENHANCED_FIELDS and _ENHANCED_FIELDS[name][0] in definition.fields:
+                number, scale, offset = _ENHANCED_FIELDS[name]
+            values = _read_field(buffer, definition, offsets, number)
+            if values is not None:
+                columns[name][rows] = values / scale - offset
+    return columns, (_read_rr_intervals(buffer, definitions) if hrv else None)
+
+
+def records_to_frame(columns: Dict[str, np.ndarray]):
+    """把 read_fit_records 的结果转为以时间为索引的 DataFrame（丢弃没有时间戳的行）"""
+    import pandas as pd
+
+    frame = pd.DataFrame(columns)
+    if "timestamp" in frame:
+        frame = frame.dropna(subset=["timestamp"]).set_index("timestamp")
+        frame.index.name = "time"
+    return frame
+
+
+# 可穿戴数据按分钟聚合的指标
+AGGREGATE_FIELDS = ("heart_rate", "cadence", "speed", "power", "altitude")
+
+
+def minute_aggregates(columns: Dict[str, np.ndarray], fields: Optional[Iterable[str]] = None,
+                      bucket_seconds: int = 60) -> Dict[str, Dict[str, np.ndarray]]:
+    """按分钟（bucket_seconds）聚合各指标，丢弃缺失值
+
+    :param columns: read_fit_records 的结果，须包含 timestamp 列
+    :return: {指标: {"time": 分钟起点（Unix秒，int64）, "mean", "min", "max", "count"}}，
+             按时间升序；没有有效数据的指标不出现在结果中
+    """
+    timestamp = columns["timestamp"]
+    has_time = ~np.isnat(timestamp)
+    buckets = timestamp.astype("datetime64[s]").astype(np.int64) // bucket_seconds * bucket_seconds
+
+    result = {}
+    for name in (AGGREGATE_FIELDS if fields is None else fields):
+        if name not in columns:
+            continue
+        values = columns[name]
+        valid = has_time & ~np.isnan(values)
+        if not valid.any():
+            continue
+        # 记录一般已按时间排序，稳定排序对有序输入几乎没有开销
+        order = np.argsort(buckets[valid], kind="stable")
+        keys = buckets[valid][order]
+        data = values[valid][order].astype(np.float64)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, len(keys)])
+        result[name] = {
+            "time": keys[starts],
+            "mean": np.add.reduceat(data, starts) / counts,
+            "min": np.minimum.reduceat(data, starts),
+            "max": np.maximum.reduceat(data, starts),
+            "count": counts,
+        }
+    return result
@@ -0,0 +1,329 @@
+"""
+心率流式分析
+
+HeartRateAnalyzer 按块接收解码后的心率采样（以及可选的RR间期），每块用NumPy
+向量化计算，只保留常量大小的状态（心率直方图、各区间累计时长、最近30分钟的
+分钟汇总、HRV累加量等），一次遍历同时得到：
+
+- 心率区间时长（按最大心率百分比划分）
+- 5分钟/30分钟滑动平均（最新值、最高、最低）
+- 静息心率估计（最低的5分钟滑动平均；数据不足5分钟时取第5百分位）
+- RR间期HRV（RMSSD、SDNN）
+- 异常标记：心率突变、超出生理范围、采样中断
+
+既可以在上传时逐块处理实时数据，也可以对批处理的整文件分块调用。
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_HR_MAX = int(os.getenv("HR_MAX_DEFAULT", 190))
+# 区间下限（最大心率百分比）：<50% 为区间0，50-60% 为区间1 …… ≥90% 为区间5
+ZONE_FRACTIONS = (0.5, 0.6, 0.7, 0.8, 0.9)
+ROLLING_WINDOWS = (5, 30)
+# 滑动窗口内至少这么多比例的分钟有数据才计入统计
+ROLLING_MIN_COVERAGE = 0.8
+# 生理范围之外的心率视为伪迹
+HR_VALID_RANGE = (30, 230)
+# 相邻采样心率变化超过该值（间隔不超过 SPIKE_MAX_GAP 秒）视为突变
+SPIKE_BPM = 35
+SPIKE_MAX_GAP = 5
+# 相邻有效采样间隔超过该值视为中断，中断时间不计入区间时长
+DROPOUT_GAP = 10
+# 有效RR间期范围（毫秒）
+RR_VALID_RANGE = (300, 2000)
+# 只保留时间最早的这么多条异常事件（与分块方式无关）
+MAX_EVENTS = 50
+
+
+def _to_seconds(timestamps) -> Tuple[np.ndarray, np.ndarray]:
+    """时间戳转为Unix秒（int64），返回 (秒, 是否有效)"""
+    timestamps = np.asarray(timestamps)
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        valid = ~np.isnat(timestamps)
+        seconds = timestamps.astype("datetime64[s]").astype(np.int64)
+    else:
+        seconds = np.asarray(timestamps, dtype=np.float64)
+        valid = np.isfinite(seconds)
+        seconds = np.where(valid, seconds, 0).astype(np.int64)
+    return seconds, valid
+
+
+def _rolling_means(keys: np.ndarray, sums: np.ndarray, counts: np.ndarray, targets: np.ndarray,
+                   window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """以 keys[targets] 各分钟为窗口终点的滑动平均，返回 (均值, 窗口是否有足够数据)"""
+    sum_prefix = np.r_[0.0, np.cumsum(sums)]
+    count_prefix = np.r_[0, np.cumsum(counts)]
+    ends = targets + 1
+    starts = np.searchsorted(keys, keys[targets] - (window - 1) * 60, side="left")
+    window_counts = count_prefix[ends] - count_prefix[starts]
+    means = (sum_prefix[ends] - sum_prefix[starts]) / np.maximum(window_counts, 1)
+    enough = (ends - starts) >= int(np.ceil(window * ROLLING_MIN_COVERAGE))
+    return means, enough
+
+
+class HeartRateAnalyzer:
+    """单次遍历的心率分析器，按时间顺序多次调用 update / update_rr，最后调用 result"""
+
+    def __init__(self, hr_max: Optional[float] = None):
+        self.hr_max = float(hr_max or DEFAULT_HR_MAX)
+        self.zone_edges = np.array(ZONE_FRACTIONS) * self.hr_max
+
+        self.samples = 0
+        self.valid_samples = 0
+        self.first_time: Optional[int] = None
+        self._end_time: Optional[int] = None
+        self._histogram = np.zeros(256, dtype=np.int64)
+        self._hr_sum = 0.0
+        self._zone_seconds = np.zeros(len(ZONE_FRACTIONS) + 1)
+        self._last_time: Optional[int] = None
+        self._last_hr: Optional[float] = None
+
+        # 分钟汇总：当前未结束的分钟 + 最近 max(ROLLING_WINDOWS) 个已结束的分钟
+        self._open_minute: Optional[int] = None
+        self._open_sum = 0.0
+        self._open_count = 0
+        self._minute_keys = np.empty(0, dtype=np.int64)
+        self._minute_sums = np.empty(0)
+        self._minute_counts = np.empty(0, dtype=np.int64)
+        self._rolling = {w: {"latest": None, "max": None, "min": None} for w in ROLLING_WINDOWS}
+
+        self._anomalies = {"spikes": 0, "out_of_range": 0, "dropouts": 0, "dropout_seconds": 0}
+        self._events: List[Dict[str, Any]] = []
+
+        self._rr_count = 0
+        self._rr_shift: Optional[float] = None
+        self._rr_sum = 0.0
+        self._rr_sumsq = 0.0
+        self._rr_diff_sumsq = 0.0
+        self._rr_diff_count = 0
+        self._rr_rejected = 0
+        self._last_rr: Optional[float] = None
+
+    # --- 心率 ---
+
+    @staticmethod
+    def _event_key(event: Dict[str, Any]) -> Tuple[int, str, float]:
+        return event["time"], event["type"], event["value"]
+
+    def _add_events(self, kind: str, times: np.ndarray, values: np.ndarray) -> None:
+        # 本块最早的 MAX_EVENTS 条与已保留的合并后再取最早的 MAX_EVENTS 条，
+        # 结果等于对全部事件排序后取前 MAX_EVENTS 条，不受分块边界影响
+        order = np.lexsort((values, times))[:MAX_EVENTS]
+        events = self._events + [{"type": kind, "time": int(times[i]), "value": round(float(values[i]), 1)}
+                                 for i in order]
+        self._events = sorted(events, key=self._event_key)[:MAX_EVENTS]
+
+    def update(self, timestamps, heart_rate) -> None:
+        """处理一块心率采样（按时间顺序），timestamps 为 datetime64 或 Unix秒"""
+        seconds, has_time = _to_seconds(timestamps)
+        hr = np.asarray(heart_rate, dtype=np.float64)
+        self.samples += len(hr)
+
+        present = has_time & np.isfinite(hr)
+        in_range = present & (hr >= HR_VALID_RANGE[0]) & (hr <= HR_VALID_RANGE[1])
+        out_of_range = present & ~in_range
+        if out_of_range.any():
+            self._anomalies["out_of_range"] += int(out_of_range.sum())
+            self._add_events("out_of_range", seconds[out_of_range], hr[out_of_range])
+
+        t, hr = seconds[in_range], hr[in_range]
+        if len(t) == 0:
+            return
+        self.valid_samples += len(t)
+        self.first_time = int(t.min()) if self.first_time is None else min(self.first_time, int(t.min()))
+        self._end_time = int(t.max()) if self._end_time is None else max(self._end_time, int(t.max()))
+
+        # 接上一块的最后一个采样，保证跨块的间隔和突变也能算到
+        if self._last_time is not None:
+            all_t = np.r_[self._last_time, t]
+            all_hr = np.r_[self._last_hr, hr]
+        else:
+            all_t, all_hr = t, hr
+        dt = np.diff(all_t)
+        dhr = np.diff(all_hr)
+
+        # 每个采样代表到下一个采样的时长，中断部分不计入；乱序采样（dt<=0）不贡献时长
+        durations = np.where((dt > 0) & (dt <= DROPOUT_GAP), dt, 0)
+        zones = np.digitize(all_hr[:-1], self.zone_edges)
+        self._zone_seconds += np.bincount(zones, weights=durations, minlength=len(self._zone_seconds))
+
+        gaps = dt > DROPOUT_GAP
+        if gaps.any():
+            self._anomalies["dropouts"] += int(gaps.sum())
+            self._anomalies["dropout_seconds"] += int(dt[gaps].sum())
+            self._add_events("dropout", all_t[:-1][gaps], dt[gaps])
+        spikes = (np.abs(dhr) > SPIKE_BPM) & (dt >= 0) & (dt <= SPIKE_MAX_GAP)
+        if spikes.any():
+            self._anomalies["spikes"] += int(spikes.sum())
+            self._add_events("spike", all_t[1:][spikes], all_hr[1:][spikes])
+
+        self._histogram += np.bincount(np.rint(hr).astype(np.int64), minlength=256)[:256]
+        self._hr_sum += float(hr.sum())
+        self._add_minutes(t, hr)
+        self._last_time, self._last_hr = int(all_t[-1]), float(all_hr[-1])
+
+    def _add_minutes(self, t: np.ndarray, hr: np.ndarray) -> None:
+        keys = t // 60 * 60
+        if self._open_minute is not None:
+            keys = np.maximum(keys, self._open_minute)
+        # 乱序的晚到采样归入当前分钟
+        keys = np.maximum.accumulate(keys)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        bin_keys = keys[starts]
+        bin_sums = np.add.reduceat(hr, starts)
+        bin_counts = np.diff(np.r_[starts, len(keys)])
+
+        if self._open_minute is not None:
+            if bin_keys[0] == self._open_minute:
+                bin_sums[0] += self._open_sum
+                bin_counts[0] += self._open_count
+            else:
+                bin_keys = np.r_[self._open_minute, bin_keys]
+                bin_sums = np.r_[self._open_sum, bin_sums]
+                bin_counts = np.r_[self._open_count, bin_counts]
+
+        # 最后一个分钟可能还有后续采样，保持打开
+        self._open_minute, self._open_sum, self._open_count = int(bin_keys[-1]), float(bin_sums[-1]), int(bin_counts[-1])
+        if len(bin_keys) > 1:
+            self._close_minutes(bin_keys[:-1], bin_sums[:-1], bin_counts[:-1])
+
+    def _close_minutes(self, keys: np.ndarray, sums: np.ndarray, counts: np.ndarray) -> None:
+        history = len(self._minute_keys)
+        all_keys = np.r_[self._minute_keys, keys]
+        all_sums = np.r_[self._minute_sums, sums]
+        all_counts = np.r_[self._minute_counts, counts]
+        targets = np.arange(history, len(all_keys))
+
+        for window, stats in self._rolling.items():
+            means, enough = _rolling_means(all_keys, all_sums, all_counts, targets, window)
+            self._update_rolling(stats, means, enough)
+
+        # 只保留最长窗口需要的分钟
+        keep = all_keys > all_keys[-1] - max(ROLLING_WINDOWS) * 60
+        self._minute_keys, self._minute_sums, self._minute_counts = all_keys[keep], all_sums[keep], all_counts[keep]
+
+    @staticmethod
+    def _update_rolling(stats: Dict[str, Optional[float]], means: np.ndarray, enough: np.ndarray) -> None:
+        if not enough.any():
+            return
+        valid = means[enough]
+        stats["latest"] = float(valid[-1])
+        stats["max"] = float(valid.max()) if stats["max"] is None else max(stats["max"], float(valid.max()))
+        stats["min"] = float(valid.min()) if stats["min"] is None else min(stats["min"], float(valid.min()))
+
+    # --- HRV ---
+
+    def update_rr(self, rr_intervals) -> None:
+        """处理一块RR间期（秒，按时间顺序）"""
+        rr = np.asarray(rr_intervals, dtype=np.float64) * 1000
+        if len(rr) == 0:
+            return
+        valid = (rr >= RR_VALID_RANGE[0]) & (rr <= RR_VALID_RANGE[1])
+        self._rr_rejected += int((~valid).sum())
+
+        # 相邻两个都是有效间期才计算差值（跨块时接上一块最后一个）
+        chain = np.r_[np.nan if self._last_rr is None else self._last_rr, np.where(valid, rr, np.nan)]
+        diffs = np.diff(chain)
+        diffs = diffs[np.isfinite(diffs)]
+        self._rr_diff_sumsq += float(np.square(diffs).sum())
+        self._rr_diff_count += len(diffs)
+        self._last_rr = float(chain[-1]) if np.isfinite(chain[-1]) else None
+
+        good = rr[valid]
+        if len(good):
+            # 平移后再累加平方和，避免大数相减的精度损失
+            if self._rr_shift is None:
+                self._rr_shift = float(good[0])
+            shifted = good - self._rr_shift
+            self._rr_count += len(good)
+            self._rr_sum += float(shifted.sum())
+            self._rr_sumsq += float(np.square(shifted).sum())
+
+    # --- 结果 ---
+
+    def _percentile(self, fraction: float) -> Optional[float]:
+        cumulative = np.cumsum(self._histogram)
+        if cumulative[-1] == 0:
+            return None
+        return float(np.searchsorted(cumulative, fraction * cumulative[-1], side="left"))
+
+    def result(self) -> Dict[str, Any]:
+        """当前为止的全部指标（不改变状态，之后仍可继续 update）"""
+        rolling = {w: dict(stats) for w, stats in self._rolling.items()}
+        if self._open_minute is not None:
+            # 未结束的分钟也计入，但只作用于本次输出
+            keys = np.r_[self._minute_keys, self._open_minute]
+            sums = np.r_[self._minute_sums, self._open_sum]
+            counts = np.r_[self._minute_counts, self._open_count]
+            for window, stats in rolling.items():
+                means, enough = _rolling_means(keys, sums, counts, np.array([len(keys) - 1]), window)
+                self._update_rolling(stats, means, enough)
+
+        heart_rate = None
+        if self.valid_samples:
+            heart_rate = {
+                "mean": round(self._hr_sum / self.valid_samples, 1),
+                "min": int(np.flatnonzero(self._histogram)[0]),
+                "max": int(np.flatnonzero(self._histogram)[-1]),
+                "p05": self._percentile(0.05),
+                "p50": self._percentile(0.5),
+                "p95": self._percentile(0.95),
+            }
+
+        resting = rolling[ROLLING_WINDOWS[0]]["min"]
+        resting_method = f"rolling_{ROLLING_WINDOWS[0]}min_min"
+        if resting is None and heart_rate is not None:
+            resting, resting_method = heart_rate["p05"], "p05"
+
+        bounds = [0.0] + list(self.zone_edges) + [None]
+        zones = [
+            {"zone": i, "low_bpm": round(bounds[i]), "high_bpm": round(bounds[i + 1]) if bounds[i + 1] else None,
+             "seconds": int(self._zone_seconds[i])}
+            for i in range(len(self._zone_seconds))
+        ]
+
+        hrv = None
+        if self._rr_count >= 2:
+            mean = self._rr_sum / self._rr_count
+            variance = max(self._rr_sumsq / self._rr_count - mean ** 2, 0.0) * self._rr_count / (self._rr_count - 1)
+            hrv = {
+                "rr_count": self._rr_count,
+                "rr_rejected": self._rr_rejected,
+                "mean_rr_ms": round(mean + self._rr_shift, 1),
+                "sdnn_ms": round(float(np.sqrt(variance)), 1),
+                "rmssd_ms": round(float(np.sqrt(self._rr_diff_sumsq / self._rr_diff_count)), 1)
+                if self._rr_diff_count else None,
+            }
+
+        def rounded(stats):
+            return {key: None if value is None else round(value, 1) for key, value in stats.items()}
+
+        return {
+            "samples": self.samples,
+            "valid_samples": self.valid_samples,
+            "duration_s": (self._end_time - self.first_time) if self.first_time is not None else 0,
+            "heart_rate": heart_rate,
+            "hr_max": self.hr_max,
+            "zones": zones,
+            "rolling": {f"{w}min": rounded(stats) for w, stats in rolling.items()},
+            "resting_hr": None if resting is None else round(resting, 1),
+            "resting_hr_method": resting_method if resting is not None else None,
+            "hrv": hrv,
+            "anomalies": dict(self._anomalies),
+            "events": list(self._events),
+        }
+
+
+def analyze_records(columns: Dict[str, np.ndarray], rr_intervals: Optional[np.ndarray] = None,
+                    hr_max: Optional[float] = None, chunk_size: int = 3600) -> Dict[str, Any]:
+    """对 fit_decoder 解码出的整份数据分块运行分析器"""
+    analyzer = HeartRateAnalyzer(hr_max)
+    for start in range(0, len(columns["timestamp"]), chunk_size):
+        analyzer.update(columns["timestamp"][start:start + chunk_size],
+                        columns["heart_rate"][start:start + chunk_size])
+    if rr_intervals is not None:
+        for start in range(0, len(rr_intervals), chunk_size):
+            analyzer.update_rr(rr_intervals[start:start + chunk_size])
+    return analyzer.result()
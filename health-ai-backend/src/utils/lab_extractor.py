@@ -0,0 +1,169 @@
+import re
+from typing import Dict, List, Optional
+
+# 检验项目标准代码 -> 常见中文名/别名（统一存储和查询时使用标准代码）
+LAB_ALIASES = {
+    "WBC": ("白细胞计数", "白细胞"),
+    "RBC": ("红细胞计数", "红细胞"),
+    "HGB": ("血红蛋白", "HB", "Hb"),
+    "PLT": ("血小板计数", "血小板"),
+    "ALT": ("谷丙转氨酶", "丙氨酸氨基转移酶", "GPT"),
+    "AST": ("谷草转氨酶", "天门冬氨酸氨基转移酶", "GOT"),
+    "GGT": ("谷氨酰转移酶", "γ-谷氨酰转移酶"),
+    "TBIL": ("总胆红素",),
+    "ALB": ("白蛋白",),
+    "GLU": ("空腹血糖", "血糖", "葡萄糖"),
+    "HBA1C": ("糖化血红蛋白",),
+    "TC": ("总胆固醇", "CHOL"),
+    "TG": ("甘油三酯",),
+    "HDL-C": ("高密度脂蛋白胆固醇", "HDL"),
+    "LDL-C": ("低密度脂蛋白胆固醇", "LDL"),
+    "CREA": ("肌酐", "CR", "Cr", "SCR"),
+    "BUN": ("尿素氮", "UREA"),
+    "UA": ("尿酸",),
+    "TSH": ("促甲状腺激素",),
+}
+
+_ASCII_TOKEN = re.compile(r"[A-Za-z][A-Za-z0-9\-]*")
+# 中文名称前后常见的标本/修饰词，去掉后再与别名整体比对
+_NAME_PREFIXES = ("血清", "血浆", "全血", "静脉")
+_NAME_SUFFIXES = ("测定", "浓度", "含量")
+
+
+def _chinese_key(name: str) -> str:
+    """去掉名称中的英文缩写、数字、空白和括号，只留中文部分（大写化，与别名表一致）"""
+    key = _ASCII_TOKEN.sub("", name or "")
+    key = re.sub(r"[\s\d()（）\[\]【】:：]", "", key).strip("-").upper()
+    for prefix in _NAME_PREFIXES:
+        if key.startswith(prefix) and len(key) > len(prefix):
+            key = key[len(prefix):]
+            break
+    for suffix in _NAME_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            key = key[:-len(suffix)]
+            break
+    return key
+
+
+_ALIAS_TO_CODE = {}
+_CHINESE_TO_CODE = {}
+for _code, _aliases in LAB_ALIASES.items():
+    _ALIAS_TO_CODE[_code.upper()] = _code
+    for _alias in _aliases:
+        _ALIAS_TO_CODE[_alias.upper()] = _code
+        if not _alias.isascii():
+            _CHINESE_TO_CODE[_chinese_key(_alias)] = _code
+
+_NUMBER = r"\d+(?:\.\d+)?"
+_LAB_LINE = re.compile(
+    r"^(?P<name>[A-Za-z\u4e00-\u9fffγ][\w\u4e00-\u9fffγ()（）\-\s]{0,30}?)\s*[:：]?\s+"
+    r"(?P<qualifier>[<>≤≥])?\s*(?P<value>" + _NUMBER + r")\s*(?P<flag>[↑↓]|[HL](?![A-Za-z]))?\s*"
+    r"(?P<unit>10\^?\d+/[A-Za-z]+|(?!ref\b)[A-Za-zμµ%][A-Za-z0-9μµ%/\.]*)?\s*"
+    r"(?:(?:ref|参考范围|参考值|参考)\s*[:：]?\s*)?"
+    r"(?P<ref>[<>≤≥]\s*" + _NUMBER + r"|" + _NUMBER + r"\s*[-~～—–]\s*" + _NUMBER + r")?\s*"
+    r"(?P<flag2>[↑↓]|[HL]|偏高|偏低)?$"
+)
+_DATE = re.compile(r"(20\d{2})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})")
+_DATE_LABEL = re.compile(r"(日期|时间|Date|DATE|date)")
+_REPORT_DATE_LABEL = re.compile(r"(报告|检验|检测|采样|采集|送检|接收|审核|Report|REPORT|report|Collect|COLLECT|collect)")
+_BIRTH_LABEL = re.compile(r"(出生|生日|Birth|BIRTH|birth|DOB)")
+
+_FLAGS = {"↑": "H", "H": "H", "偏高": "H", "↓": "L", "L": "L", "偏低": "L"}
+
+
+def canonical_test_code(name: str) -> Optional[str]:
+    """把检验项目名称/缩写归一为标准代码，无法识别时返回None
+
+    中文名称只做整体匹配（允许“血清”等标本前缀），不做子串匹配：
+    “平均红细胞体积”“尿白细胞”“尿葡萄糖”等衍生项目不能归到 RBC/WBC/GLU。
+    名称中带有不认识的英文缩写（如 MCV、RDW、LEU）时说明是别的项目，同样返回None。
+    """
+    key = re.sub(r"\s+", "", name or "").upper()
+    if key in _ALIAS_TO_CODE:
+        return _ALIAS_TO_CODE[key]
+    # 名称中带缩写，如 "血小板计数 PLT"、"谷丙转氨酶(ALT)"
+    tokens = [token.upper() for token in _ASCII_TOKEN.findall(name or "") if len(token) > 1]
+    for token in tokens:
+        if token in _ALIAS_TO_CODE:
+            return _ALIAS_TO_CODE[token]
+    if tokens:
+        return None
+    return _CHINESE_TO_CODE.get(_chinese_key(name))
+
+
+def extract_report_date(text: str) -> Optional[str]:
+    """报告日期（YYYY-MM-DD）
+
+    按日期前的标签取值：优先报告/检验/采样等日期，其次其他带“日期/时间”标签的日期，
+    最后取全文第一个日期；出生日期不作为报告日期。
+    """
+    candidates = {}
+    for line in (text or "").splitlines():
+        label_start = 0
+        for match in _DATE.finditer(line):
+            label = line[label_start:match.start()]
+            label_start = match.end()
+            year, month, day = (int(part) for part in match.groups())
+            if not (1 <= month <= 12 and 1 <= day <= 31) or _BIRTH_LABEL.search(label):
+                continue
+            if _REPORT_DATE_LABEL.search(label):
+                rank = 0
+            elif _DATE_LABEL.search(label):
+                rank = 1
+            else:
+                rank = 2
+            candidates.setdefault(rank, f"{year:04d}-{month:02d}-{day:02d}")
+        if 0 in candidates:
+            break
+    return candidates[min(candidates)] if candidates else None
+
+
+def _parse_reference(ref: Optional[str]):
+    if not ref:
+        return None, None
+    numbers = [float(n) for n in re.findall(_NUMBER, ref)]
+    if ref.lstrip()[0] in "<≤":
+        return None, numbers[0]
+    if ref.lstrip()[0] in ">≥":
+        return numbers[0], None
+    return numbers[0], numbers[1]
+
+
+def extract_lab_results(text: str) -> List[Dict]:
+    """从报告文本中逐行提取检验结果
+
+    返回 [{"test_code", "test_name", "value", "unit", "ref_low", "ref_high", "flag"}]，
+    只保留能归一到标准代码的项目；同一报告中重复出现的项目取第一次。
+    flag 为 H/L/N，报告未标注时按参考范围判断。
+    """
+    results, seen = [], set()
+    for raw_line in (text or "").splitlines():
+        match = _LAB_LINE.match(raw_line.strip())
+        if not match:
+            continue
+        code = canonical_test_code(match.group("name"))
+        if code is None or code in seen:
+            continue
+
+        value = float(match.group("value"))
+        ref_low, ref_high = _parse_reference(match.group("ref"))
+        flag = _FLAGS.get(match.group("flag") or match.group("flag2") or "")
+        if flag is None:
+            if ref_high is not None and value > ref_high:
+                flag = "H"
+            elif ref_low is not None and value < ref_low:
+                flag = "L"
+            else:
+                flag = "N"
+
+        seen.add(code)
+        results.append({
+            "test_code": code,
+            "test_name": match.group("name").strip(),
+            "value": value,
+            "unit": match.group("unit") or "",
+            "ref_low": ref_low,
+            "ref_high": ref_high,
+            "flag": flag,
+        })
+    return results
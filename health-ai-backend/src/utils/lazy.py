@@ -0,0 +1,55 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class LazyComponent:
+    """延迟初始化的组件代理
+
+    第一次访问属性时才创建真实对象（线程安全），之后所有属性访问转发给它。
+    用于把打开数据库、加载模型等耗时操作从 import 阶段挪到启动预热或首次使用时。
+    代理自身的属性都以 lazy_ 开头，避免与被代理对象的方法重名。
+    """
+
+    def __init__(self, factory: Callable[..., Any], *args, **kwargs):
+        self._lazy_factory = factory
+        self._lazy_args = args
+        self._lazy_kwargs = kwargs
+        self._lazy_obj = None
+        self._lazy_lock = threading.Lock()
+        self.lazy_init_seconds: Optional[float] = None
+
+    def lazy_instance(self) -> Any:
+        if self._lazy_obj is None:
+            with self._lazy_lock:
+                if self._lazy_obj is None:
+                    start = time.perf_counter()
+                    self._lazy_obj = self._lazy_factory(*self._lazy_args, **self._lazy_kwargs)
+                    self.lazy_init_seconds = round(time.perf_counter() - start, 3)
+        return self._lazy_obj
+
+    def lazy_reset(self, instance: Any) -> bool:
+        """丢弃已创建的对象（仅当当前对象仍是 instance 时），下次访问时重新创建；返回是否丢弃
+
+        用于对象已不可用（如进程池中有工作进程崩溃）的情况，多个调用方同时发现时只丢弃一次。
+        """
+        with self._lazy_lock:
+            if instance is None or self._lazy_obj is not instance:
+                return False
+            self._lazy_obj = None
+            self.lazy_init_seconds = None
+            return True
+
+    @property
+    def lazy_initialized(self) -> bool:
+        return self._lazy_obj is not None
+
+    @property
+    def lazy_name(self) -> str:
+        return getattr(self._lazy_factory, "__name__", repr(self._lazy_factory))
+
+    def __getattr__(self, name: str) -> Any:
+        # 只有代理自身没有的属性才会走到这里
+        if name.startswith("_lazy_"):
+            raise AttributeError(name)
+        return getattr(self.lazy_instance(), name)
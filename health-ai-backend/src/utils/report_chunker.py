@@ -0,0 +1,103 @@
+import re
+from typing import Dict, List
+
+# 常见的报告章节/检验项目组名称
+SECTION_KEYWORDS = (
+    "血常规", "尿常规", "便常规", "肝功能", "肾功能", "血脂", "血糖", "糖化血红蛋白", "电解质",
+    "甲状腺", "肿瘤标志物", "凝血", "心肌酶", "免疫", "乙肝", "心电图", "超声", "彩超", "B超",
+    "CT", "X线", "胸片", "核磁", "MRI", "体格检查", "一般检查", "内科", "外科", "眼科", "耳鼻喉",
+    "口腔", "妇科", "检验结果", "检查结果", "诊断", "结论", "建议", "总检", "小结",
+)
+
+_HEADER_PATTERNS = (
+    re.compile(r"^[【\[].{1,30}[】\]]$"),
+    re.compile(r"^[一二三四五六七八九十]+[、.．]\s*\S.{0,30}$"),
+    re.compile(r"^(第[一二三四五六七八九十\d]+[部分章节项])\s*\S*.{0,30}$"),
+    re.compile(r"^.{1,20}[:：]$"),
+)
+
+
+def _is_section_header(line: str) -> bool:
+    """判断一行是否为章节或检验项目组标题"""
+    if len(line) > 30:
+        return False
+    if any(pattern.match(line) for pattern in _HEADER_PATTERNS):
+        return True
+    # 含有项目组关键词、且不包含数值的短行视为标题（避免把“血糖 5.6 mmol/L”当成标题）
+    return any(keyword in line for keyword in SECTION_KEYWORDS) and not re.search(r"\d", line)
+
+
+def split_sections(text: str) -> List[Dict[str, str]]:
+    """按章节/项目组标题把报告文本切分成段落"""
+    sections = []
+    title, lines = "", []
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if _is_section_header(line):
+            if lines:
+                sections.append({"section": title, "text": "\n".join(lines)})
+            title, lines = line.strip("【】[]:： "), [line]
+        else:
+            lines.append(line)
+
+    if lines:
+        sections.append({"section": title, "text": "\n".join(lines)})
+    return sections
+
+
+def _split_long_section(section: Dict[str, str], max_chars: int) -> List[Dict[str, str]]:
+    # 超长章节按行切分，后续片段带上章节标题，保证每个片段语义完整
+    lines = []
+    for line in section["text"].split("\n"):
+        # 单行超长时硬切
+        lines.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+
+    header = f"【{section['section']}】" if section["section"] else ""
+    pieces, current = [], []
+    current_len = 0
+
+    for line in lines:
+        if current and current_len + len(line) + 1 > max_chars:
+            pieces.append("\n".join(current))
+            current, current_len = ([header] if header else []), len(header)
+        current.append(line)
+        current_len += len(line) + 1
+
+    if current:
+        pieces.append("\n".join(current))
+    return [{"section": section["section"], "text": piece} for piece in pieces]
+
+
+def chunk_report_text(text: str, max_chars: int = 500, min_chars: int = 80) -> List[Dict[str, object]]:
+    """把报告文本切分为按章节/检验项目组组织的段落
+
+    - 同一个检验项目组尽量放在同一段，超过max_chars时按行切分
+    - 相邻的短章节合并，避免产生过短、缺少上下文的段落
+    """
+    if not text or not text.strip():
+        return []
+
+    pieces = []
+    for section in split_sections(text):
+        if len(section["text"]) > max_chars:
+            pieces.extend(_split_long_section(section, max_chars))
+        else:
+            pieces.append(section)
+
+    chunks = []
+    for piece in pieces:
+        if chunks and (len(chunks[-1]["text"]) < min_chars or len(piece["text"]) < min_chars) \
+                and len(chunks[-1]["text"]) + len(piece["text"]) + 1 <= max_chars:
+            last = chunks[-1]
+            last["text"] = f"{last['text']}\n{piece['text']}"
+            if piece["section"] and piece["section"] not in last["section"]:
+                last["section"] = "/".join(filter(None, [last["section"], piece["section"]]))
+        else:
+            chunks.append({"section": piece["section"], "text": piece["text"]})
+
+    for i, chunk in enumerate(chunks):
+        chunk["index"] = i
+    return chunks
@@ -0,0 +1,141 @@
+import struct
+
+import numpy as np
+import pytest
+
+from src.utils.fit_decoder import FIT_EPOCH_OFFSET, read_fit_records
+
+# record消息字段：时间戳、心率、功率
+RECORD_FIELDS = [(253, 4, 0x86), (3, 1, 0x02), (7, 2, 0x84)]
+RECORD_FORMAT = "IBH"
+
+_CRC_TABLE = (0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+              0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400)
+
+
+def _crc(data):
+    crc = 0
+    for byte in data:
+        for nibble in (byte & 0x0F, byte >> 4):
+            tmp = _CRC_TABLE[crc & 0x0F]
+            crc = (crc >> 4) & 0x0FFF
+            crc ^= tmp ^ _CRC_TABLE[nibble]
+    return crc
+
+
+def _definition(local, global_number, fields, big=False, developer=()):
+    header = 0x40 | local | (0x20 if developer else 0)
+    out = bytes([header, 0, int(big)]) + struct.pack(">H" if big else "<H", global_number) + bytes([len(fields)])
+    out += b"".join(bytes(field) for field in fields)
+    if developer:
+        out += bytes([len(developer)]) + b"".join(bytes(field) for field in developer)
+    return out
+
+
+def _message(header, values, fmt=RECORD_FORMAT, big=False, extra=b""):
+    return bytes([header]) + struct.pack((">" if big else "<") + fmt, *values) + extra
+
+
+def _fit_file(body, header_size=14):
+    header = struct.pack("<BBHI4s", header_size, 0x10, 2100, len(body), b".FIT")
+    if header_size == 14:
+        header += struct.pack("<H", _crc(header))
+    data = header + body
+    return data + struct.pack("<H", _crc(data))
+
+
+def _activity(rows, big=False):
+    body = _definition(0, 20, RECORD_FIELDS, big=big)
+    for row in rows:
+        body += _message(0, row, big=big)
+    return body
+
+
+def _seconds(columns):
+    return list(columns["timestamp"].astype(np.int64) - FIT_EPOCH_OFFSET)
+
+
+ROWS = [(1000, 80, 200), (1001, 0xFF, 310), (1002, 95, 0xFFFF)]
+
+
+def test_header_and_file_crc_are_skipped():
+    expected = read_fit_records(_fit_file(_activity(ROWS)))
+    assert _seconds(expected) == [1000, 1001, 1002]
+    np.testing.assert_array_equal(expected["heart_rate"], [80, np.nan, 95])
+    np.testing.assert_array_equal(expected["power"], [200, 310, np.nan])
+
+    # 12字节文件头没有头部CRC
+    short_header = read_fit_records(_fit_file(_activity(ROWS), header_size=12))
+    # 不校验CRC：CRC错误的文件照常解码
+    data = bytearray(_fit_file(_activity(ROWS)))
+    data[12] ^= 0xFF
+    data[-1] ^= 0xFF
+    corrupted_crc = read_fit_records(bytes(data))
+    for columns in (short_header, corrupted_crc):
+        for name in expected:
+            np.testing.assert_array_equal(columns[name], expected[name])
+
+
+def test_compressed_timestamps():
+    # 本地消息1为不含时间戳的record，用压缩时间戳消息头（0x80 | 本地类型<<5 | 时间偏移）
+    body = _activity([(1000, 80, 200)])
+    body += _definition(1, 20, RECORD_FIELDS[1:])
+    for time_offset, heart_rate in ((1010 & 0x1F, 81), (1020 & 0x1F, 82), (1030 & 0x1F, 83)):
+        body += _message(0x80 | (1 << 5) | time_offset, (heart_rate, 100), fmt="BH")
+    # 普通record重新给出完整时间戳，之后的压缩时间戳以它为基准
+    body += _message(0, (2000, 84, 100))
+    body += _message(0x80 | (1 << 5) | (2003 & 0x1F), (85, 100), fmt="BH")
+
+    columns = read_fit_records(_fit_file(body))
+    # 1030 的低5位小于 1020 的低5位，按进位处理
+    assert _seconds(columns) == [1000, 1010, 1020, 1030, 2000, 2003]
+    np.testing.assert_array_equal(columns["heart_rate"], [80, 81, 82, 83, 84, 85])
+
+
+def test_big_endian_matches_little_endian():
+    little = read_fit_records(_fit_file(_activity(ROWS)))
+    big = read_fit_records(_fit_file(_activity(ROWS, big=True)))
+    for name in little:
+        np.testing.assert_array_equal(big[name], little[name])
+    # 同一文件中大小端不同的定义
+    body = _activity(ROWS[:1]) + _activity(ROWS[1:], big=True)
+    mixed = read_fit_records(_fit_file(body))
+    np.testing.assert_array_equal(mixed["power"], [200, 310, np.nan])
+
+
+def test_chained_files():
+    first = _fit_file(_activity(ROWS[:2]))
+    # 第二个文件中本地消息0定义为不同的字段布局
+    second_body = _definition(0, 20, [(3, 1, 0x02), (253, 4, 0x86)])
+    second_body += _message(0, (70, 5000), fmt="BI")
+    second = _fit_file(second_body, header_size=12)
+
+    columns = read_fit_records(first + second)
+    assert _seconds(columns) == [1000, 1001, 5000]
+    np.testing.assert_array_equal(columns["heart_rate"], [80, np.nan, 70])
+    np.testing.assert_array_equal(columns["power"], [200, 310, np.nan])
+
+
+def test_developer_fields_are_skipped():
+    # 带3字节开发者字段的record：开发者字段计入消息长度但不解码
+    body = _definition(0, 20, RECORD_FIELDS, developer=[(0, 3, 0)])
+    body += _message(0, ROWS[0], extra=b"\x01\x02\x03")
+    body += _message(0, ROWS[1], extra=b"\xff\xff\xff")
+    body += _definition(1, 20, RECORD_FIELDS)
+    body += _message(1, ROWS[2])
+
+    columns = read_fit_records(_fit_file(body))
+    assert _seconds(columns) == [1000, 1001, 1002]
+    np.testing.assert_array_equal(columns["power"], [200, 310, np.nan])
+
+
+def test_truncated_files():
+    data = _fit_file(_activity(ROWS))
+    # 截断在最后一条消息中间：保留之前完整的消息
+    columns = read_fit_records(data[:-2 - 3])
+    assert _seconds(columns) == [1000, 1001]
+    # 截断在定义消息中间
+    with pytest.raises(ValueError):
+        read_fit_records(data[:14 + 4])
+    with pytest.raises(ValueError):
+        read_fit_records(b"not a fit file")
@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.utils.hr_analytics import MAX_EVENTS, analyze_records
+
+
+def _columns(seconds, heart_rate):
+    return {"timestamp": np.asarray(seconds, dtype=np.int64).astype("datetime64[s]"),
+            "heart_rate": np.asarray(heart_rate, dtype=np.float64)}
+
+
+def test_events_do_not_depend_on_chunk_size():
+    # 每10秒一次突变、每100秒一个超出范围的采样，事件总数远多于 MAX_EVENTS
+    seconds = np.arange(3000)
+    heart_rate = np.where(seconds % 10 == 5, 140.0, 80.0)
+    heart_rate[seconds % 100 == 50] = 250.0
+    columns = _columns(seconds, heart_rate)
+
+    results = [analyze_records(columns, chunk_size=size) for size in (7, 64, 1000, 3000)]
+    for result in results[1:]:
+        assert result == results[0]
+    events = results[0]["events"]
+    assert len(events) == MAX_EVENTS
+    # 保留的是时间最早的事件
+    assert events[0]["time"] == 5
+    assert [event["time"] for event in events] == sorted(event["time"] for event in events)
+
+
+def test_out_of_order_samples_do_not_reduce_zone_time():
+    seconds = [0, 1, 2, 3, 1, 4, 5, 6]
+    result = analyze_records(_columns(seconds, [80] * len(seconds)), chunk_size=3)
+    zone_seconds = [zone["seconds"] for zone in result["zones"]]
+    assert all(value >= 0 for value in zone_seconds)
+    # 0→3 计3秒，乱序的1不计，1→4、4→5、5→6 计5秒
+    assert sum(zone_seconds) == 8
+    assert result["duration_s"] == 6
+
+
+def test_out_of_order_samples_are_chunk_invariant():
+    rng = np.random.default_rng(0)
+    seconds = np.arange(2000)
+    swap = rng.choice(1999, 200, replace=False)
+    seconds[swap], seconds[swap + 1] = seconds[swap + 1], seconds[swap]
+    heart_rate = 90 + 30 * np.sin(seconds / 120) + rng.normal(0, 15, len(seconds))
+    columns = _columns(seconds, heart_rate)
+
+    expected = analyze_records(columns, chunk_size=len(seconds))
+    for size in (1, 13, 500):
+        assert analyze_records(columns, chunk_size=size) == expected
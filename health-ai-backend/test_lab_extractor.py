@@ -0,0 +1,66 @@
+from src.utils.lab_extractor import canonical_test_code, extract_lab_results, extract_report_date
+
+
+def test_canonical_code_for_base_tests():
+    assert canonical_test_code("红细胞计数") == "RBC"
+    assert canonical_test_code("白细胞 WBC") == "WBC"
+    assert canonical_test_code("谷丙转氨酶(ALT)") == "ALT"
+    assert canonical_test_code("γ-谷氨酰转移酶") == "GGT"
+    assert canonical_test_code("血清肌酐") == "CREA"
+    assert canonical_test_code("糖化血红蛋白 HbA1c") == "HBA1C"
+
+
+def test_derived_tests_are_not_mapped_to_base_tests():
+    # 红细胞指数、尿常规项目名称中含有基础项目的中文名
+    assert canonical_test_code("平均红细胞体积 MCV") is None
+    assert canonical_test_code("平均红细胞血红蛋白含量 MCH") is None
+    assert canonical_test_code("红细胞分布宽度") is None
+    assert canonical_test_code("红细胞分布宽度 RDW-CV") is None
+    assert canonical_test_code("尿白细胞") is None
+    assert canonical_test_code("尿白细胞 LEU") is None
+    assert canonical_test_code("尿葡萄糖") is None
+    assert canonical_test_code("尿红细胞") is None
+
+
+def test_blood_count_keeps_base_values():
+    text = "\n".join([
+        "平均红细胞体积 MCV 90.1 fL 82-100",
+        "平均红细胞血红蛋白含量 MCH 30.2 pg 27-34",
+        "红细胞分布宽度 12.8 % 11.5-14.5",
+        "红细胞计数 RBC 4.52 10^12/L 4.3-5.8",
+        "白细胞计数 6.1 10^9/L 3.5-9.5",
+    ])
+    results = {row["test_code"]: row for row in extract_lab_results(text)}
+    assert set(results) == {"RBC", "WBC"}
+    assert results["RBC"]["value"] == 4.52
+    assert results["WBC"]["value"] == 6.1
+
+
+def test_urine_panel_does_not_shadow_blood_tests():
+    text = "\n".join([
+        "尿白细胞 15 /uL 0-25",
+        "尿葡萄糖 0 mmol/L",
+        "空腹血糖 5.6 mmol/L 3.9-6.1",
+        "白细胞 7.2 10^9/L 3.5-9.5",
+    ])
+    results = {row["test_code"]: row for row in extract_lab_results(text)}
+    assert set(results) == {"GLU", "WBC"}
+    assert results["GLU"]["value"] == 5.6
+    assert results["WBC"]["value"] == 7.2
+
+
+def test_report_date_skips_birth_date():
+    assert extract_report_date("出生日期: 2001-05-01\n检验日期 2024-03-02") == "2024-03-02"
+    assert extract_report_date("出生日期 2001-05-01 采样时间 2024-03-02 08:30") == "2024-03-02"
+    # 报告/检验类日期优先于其他带标签的日期（如打印时间）
+    assert extract_report_date("打印时间 2024-04-01\n报告日期 2024-03-05") == "2024-03-05"
+    assert extract_report_date("出生日期 2001-05-01\n2024-03-02 门诊") == "2024-03-02"
+
+
+def test_ref_keyword_is_not_a_unit():
+    row, = extract_lab_results("ALT 60 ref 9-50")
+    assert row["unit"] == ""
+    assert (row["ref_low"], row["ref_high"], row["flag"]) == (9, 50, "H")
+    row, = extract_lab_results("ALT 60 U/L ref: 9-50")
+    assert row["unit"] == "U/L"
+    assert (row["ref_low"], row["ref_high"]) == (9, 50)
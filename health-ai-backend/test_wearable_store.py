@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.services.wearable_store import WearableStore
+
+DAY = 86400
+
+
+def _series(times, values, count=60):
+    times = np.asarray(times, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    return {"time": times, "mean": values, "min": values - 5, "max": values + 5,
+            "count": np.full(len(times), count, dtype=np.int64)}
+
+
+def test_merge_same_minute_across_uploads(tmp_path):
+    store = WearableStore(str(tmp_path))
+    store.append("u1", {"heart_rate": _series([0, 60], [80, 90])})
+    store.append("u1", {"heart_rate": _series([60, 120], [110, 100])})
+
+    _, points = store.get_range("u1", "heart_rate", resolution="1min")
+    assert [point["time"] for point in points] == [0, 60, 120]
+    assert points[1]["count"] == 120
+    assert points[1]["mean"] == 100
+    assert (points[1]["min"], points[1]["max"]) == (85, 115)
+
+
+def test_backfill_rewrites_only_overlapping_tail(tmp_path):
+    store = WearableStore(str(tmp_path))
+    store.append("u1", {"heart_rate": _series([2 * 3600, 2 * 3600 + 60], [70, 72])})
+    # 补传更早的数据，包括与已有小时桶重叠的部分
+    store.append("u1", {"heart_rate": _series([0, 60, 2 * 3600 + 120], [60, 62, 74])})
+
+    _, minutes = store.get_range("u1", "heart_rate", resolution="1min")
+    assert [point["time"] for point in minutes] == [0, 60, 7200, 7260, 7320]
+    _, hours = store.get_range("u1", "heart_rate", resolution="1h")
+    assert [point["time"] for point in hours] == [0, 7200]
+    assert hours[0]["mean"] == 61
+    assert hours[1]["mean"] == 72
+    assert hours[1]["count"] == 180
+    _, days = store.get_range("u1", "heart_rate", resolution="1d")
+    assert len(days) == 1 and days[0]["count"] == 300
+    assert store.list_metrics("u1") == [{"metric": "heart_rate", "minutes": 5, "first": 0, "last": 7320}]
+
+
+def test_resolution_selection_and_daily_fallback(tmp_path):
+    store = WearableStore(str(tmp_path))
+    # 10天，每小时一个分钟桶
+    times = np.arange(0, 10 * DAY, 3600)
+    store.append("u1", {"heart_rate": _series(times, np.arange(len(times)) % 50 + 60)})
+
+    resolution, points = store.get_range("u1", "heart_rate", limit=500)
+    assert resolution == "1min" and len(points) == 240
+    resolution, points = store.get_range("u1", "heart_rate", start=0, end=DAY, limit=10)
+    assert resolution == "1d" and len(points) == 1
+    # 分钟桶和小时桶都是240个，超过上限时选天汇总
+    resolution, points = store.get_range("u1", "heart_rate", limit=100)
+    assert resolution == "1d" and len(points) == 10
+    resolution, points = store.get_range("u1", "heart_rate", start=0, end=2 * DAY, limit=100)
+    assert resolution == "1min" and len(points) == 48
+
+    # 最粗粒度也超过上限时返回最近的 limit 个桶
+    resolution, points = store.get_range("u1", "heart_rate", limit=3)
+    assert resolution == "1d"
+    assert [point["time"] for point in points] == [7 * DAY, 8 * DAY, 9 * DAY]
@@ -0,0 +1,249 @@
+"""
+FIT心率报告批处理（无界面）
+
+批量处理一个目录或通配符匹配到的 .fit 文件：在进程池中解码、按分钟聚合，
+每个文件的汇总指标写入同一个 Parquet 文件，心率图用 Agg 后端渲染为 PNG/SVG。
+绘图前用 LTTB 算法把序列降采样到固定点数，长时间记录的带标记折线图也能很快渲染。
+源文件未变化且输出已存在时跳过。依赖见同目录的 requirements.txt（pandas、pyarrow、matplotlib）。
+
+    python batch_report.py 运动数据/ --output reports --formats png,svg
+    python batch_report.py "运动数据/**/*.fit" --workers 8 --max-points 400
+"""
+import argparse
+import glob
+import hashlib
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'health-ai-backend'))
+from src.utils.fit_decoder import read_fit, minute_aggregates
+from src.utils.hr_analytics import analyze_records
+
+SUMMARY_FILE = 'summary.parquet'
+# 汇总列或计算方法变化时递增，旧版本的行会重新处理
+REPORT_VERSION = 3
+CHART_FONTS = ['SimHei', 'Noto Sans CJK SC', 'WenQuanYi Micro Hei', 'DejaVu Sans']
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标
+
+    首尾两点保留，中间按桶各选一个与前一个选中点、下一桶均值构成三角形面积最大的点，
+    保留峰值和谷值的形状。
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一个桶的均值（最后一个桶用末点）
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def _chart_paths(file_path, output_dir, formats):
+    # 不同目录下可能有同名文件（如各设备导出的 activity.fit），文件名后加完整路径的哈希区分
+    digest = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:8]
+    name = f'{os.path.splitext(os.path.basename(file_path))[0]}-{digest}'
+    return [os.path.join(output_dir, 'charts', f'{name}.{fmt}') for fmt in formats]
+
+
+def render_chart(minute_hr, paths, max_points):
+    """用 Agg 后端把每分钟平均心率绘制为图片（不依赖 pyplot 全局状态，可在子进程中并行）"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    import matplotlib
+
+    keep = lttb_indices(minute_hr.index.asi8, minute_hr.values, max_points)
+    series = minute_hr.iloc[keep]
+
+    with matplotlib.rc_context({'font.sans-serif': CHART_FONTS, 'axes.unicode_minus': False}), \
+            warnings.catch_warnings():
+        # 服务器上没有中文字体时每个字都会告警，只影响标题显示
+        warnings.filterwarnings('ignore', message='Glyph .* missing from')
+        figure = Figure(figsize=(12, 6))
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        ax.plot(series.index, series.values, marker='o', markersize=3, linestyle='-')
+        ax.set_title('每分钟平均心率变化图 (Average Heart Rate Per Minute)')
+        ax.set_xlabel('时间 (Time)')
+        ax.set_ylabel('平均心率 (Avg Heart Rate - bpm)')
+        ax.grid(True)
+        figure.autofmt_xdate()
+        figure.tight_layout()
+        for path in paths:
+            figure.savefig(path)
+
+
+def process_file(file_path, output_dir, formats, max_points, hr_max=None):
+    """处理单个文件（在工作进程中执行），返回该文件的汇总指标"""
+    start = time.perf_counter()
+    stat = os.stat(file_path)
+    row = {'file': os.path.abspath(file_path), 'source_mtime': stat.st_mtime, 'source_size': stat.st_size,
+           'report_version': REPORT_VERSION, 'max_points': max_points,
+           'hr_max': float(hr_max) if hr_max is not None else np.nan}
+
+    columns, rr_intervals = read_fit(file_path, fields=['timestamp', 'heart_rate', 'cadence', 'speed', 'power',
+                                                        'distance'], hrv=True)
+    timestamp = columns['timestamp'][~np.isnat(columns['timestamp'])]
+    row['samples'] = len(columns['timestamp'])
+    row['start'] = pd.Timestamp(timestamp.min()) if len(timestamp) else pd.NaT
+    row['end'] = pd.Timestamp(timestamp.max()) if len(timestamp) else pd.NaT
+    row['duration_s'] = float((timestamp.max() - timestamp.min()) / np.timedelta64(1, 's')) if len(timestamp) else 0.0
+    row['distance_m'] = float(np.nanmax(columns['distance'])) if np.isfinite(columns['distance']).any() else np.nan
+
+    minutes = minute_aggregates(columns)
+    for name in ('heart_rate', 'cadence', 'speed', 'power'):
+        series = minutes.get(name)
+        if series is None:
+            row[f'{name}_mean'] = row[f'{name}_min'] = row[f'{name}_max'] = np.nan
+            continue
+        row[f'{name}_mean'] = float(series['mean'] @ series['count'] / series['count'].sum())
+        row[f'{name}_min'] = float(series['min'].min())
+        row[f'{name}_max'] = float(series['max'].max())
+    row['heart_rate_minutes'] = len(minutes['heart_rate']['time']) if 'heart_rate' in minutes else 0
+
+    # 心率区间、静息心率、HRV和异常标记（同一次遍历）
+    analytics = analyze_records(columns, rr_intervals, hr_max=hr_max)
+    for zone in analytics['zones']:
+        row[f'zone{zone["zone"]}_s'] = zone['seconds']
+    row['resting_hr'] = analytics['resting_hr']
+    row['best_5min_hr'] = analytics['rolling']['5min']['max']
+    row['best_30min_hr'] = analytics['rolling']['30min']['max']
+    hrv = analytics['hrv'] or {}
+    row['rmssd_ms'] = hrv.get('rmssd_ms')
+    row['sdnn_ms'] = hrv.get('sdnn_ms')
+    for name, count in analytics['anomalies'].items():
+        row[name] = count
+
+    charts = _chart_paths(file_path, output_dir, formats)
+    if 'heart_rate' in minutes:
+        hr = minutes['heart_rate']
+        minute_hr = pd.Series(hr['mean'], index=pd.to_datetime(hr['time'], unit='s'))
+        render_chart(minute_hr, charts, max_points)
+    else:
+        charts = []
+    row['charts'] = ';'.join(charts)
+    row['seconds'] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def find_fit_files(inputs):
+    """展开输入的目录（递归查找 .fit）和通配符"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(glob.glob(os.path.join(item, '**', '*.fit'), recursive=True))
+            files.extend(glob.glob(os.path.join(item, '**', '*.FIT'), recursive=True))
+        else:
+            files.extend(glob.glob(item, recursive=True))
+    return sorted({os.path.abspath(f) for f in files if os.path.isfile(f)})
+
+
+def _is_up_to_date(file_path, previous, output_dir, formats, max_points, hr_max=None):
+    """源文件大小和修改时间、处理参数（最大心率、图表点数）与上次一致，
+    且各格式的图片都已生成（没有心率数据的文件不出图）"""
+    if previous is None or previous.get('report_version') != REPORT_VERSION:
+        return False
+    # 未指定最大心率时存为 NaN
+    previous_hr_max = previous.get('hr_max')
+    previous_hr_max = None if previous_hr_max is None or pd.isna(previous_hr_max) else float(previous_hr_max)
+    if previous_hr_max != (float(hr_max) if hr_max is not None else None):
+        return False
+    if previous.get('max_points') != max_points:
+        return False
+    stat = os.stat(file_path)
+    if previous['source_mtime'] != stat.st_mtime or previous['source_size'] != stat.st_size:
+        return False
+    if previous['heart_rate_minutes'] == 0:
+        return True
+    return all(os.path.exists(path) and os.path.getmtime(path) >= stat.st_mtime
+               for path in _chart_paths(file_path, output_dir, formats))
+
+
+def run_batch(inputs, output_dir='reports', formats=('png',), workers=None, max_points=500, force=False,
+              hr_max=None):
+    """批量处理，返回 (汇总表, 失败列表)；汇总表同时写入 output_dir/summary.parquet"""
+    files = find_fit_files(inputs)
+    os.makedirs(os.path.join(output_dir, 'charts'), exist_ok=True)
+    summary_path = os.path.join(output_dir, SUMMARY_FILE)
+
+    previous = {}
+    if os.path.exists(summary_path):
+        previous = {row['file']: row for row in pd.read_parquet(summary_path).to_dict('records')}
+
+    selected = set(files)
+    rows = {path: row for path, row in previous.items() if path not in selected}
+    pending = []
+    for path in files:
+        if not force and _is_up_to_date(path, previous.get(path), output_dir, formats, max_points, hr_max):
+            rows[path] = previous[path]
+        else:
+            pending.append(path)
+    print(f'共 {len(files)} 个文件，需要处理 {len(pending)} 个，跳过 {len(files) - len(pending)} 个')
+
+    failures = []
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process_file, path, output_dir, formats, max_points, hr_max): path
+                       for path in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    rows[path] = future.result()
+                    print(f'[{done}/{len(pending)}] {os.path.basename(path)} ({rows[path]["seconds"]}s)')
+                except Exception as e:
+                    failures.append((path, str(e)))
+                    print(f'[{done}/{len(pending)}] {os.path.basename(path)} 处理失败: {e}')
+
+    summary = pd.DataFrame(sorted(rows.values(), key=lambda row: row['file']))
+    if len(summary):
+        # 先写临时文件再替换，中途失败不会损坏已有汇总
+        tmp_path = summary_path + '.tmp'
+        summary.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, summary_path)
+    return summary, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FIT心率报告批处理')
+    parser.add_argument('inputs', nargs='+', help='.fit 文件所在目录或通配符')
+    parser.add_argument('--output', default='reports', help='输出目录（summary.parquet 和 charts/）')
+    parser.add_argument('--formats', default='png', help='图片格式，逗号分隔，如 png,svg')
+    parser.add_argument('--workers', type=int, default=None, help='进程数，默认CPU核数')
+    parser.add_argument('--max-points', type=int, default=500, help='图表最多绘制的点数（LTTB降采样）')
+    parser.add_argument('--force', action='store_true', help='忽略已有输出，全部重新处理')
+    parser.add_argument('--hr-max', type=float, default=None, help='最大心率（划分心率区间），默认190')
+    args = parser.parse_args()
+
+    formats = tuple(fmt.strip().lower() for fmt in args.formats.split(',') if fmt.strip())
+    start = time.perf_counter()
+    summary, failures = run_batch(args.inputs, args.output, formats, args.workers, args.max_points, args.force,
+                                   args.hr_max)
+    print(f'完成：汇总 {len(summary)} 个文件，失败 {len(failures)} 个，用时 {time.perf_counter() - start:.1f}s')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,13 @@
+import os
+import sys
+
 import pandas as pd
-from fitparse import FitFile
 import matplotlib.pyplot as plt
 
+# FIT解码和按分钟聚合与后端共用 health-ai-backend/src/utils/fit_decoder.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'health-ai-backend'))
+from src.utils.fit_decoder import read_fit_records, minute_aggregates
+
 def visualize_heart_rate(file_path):
     """
     解析.fit文件，计算并打印每分钟平均心率，然后绘制成折线图。
@@ -9,28 +15,18 @@ def visualize_heart_rate(file_path):
     :param file_path: .fit文件的路径
     """
     try:
-        # --- 1. 数据提取和处理 (与之前相同) ---
-        fitfile = FitFile(file_path)
-        data_points = []
-        for record in fitfile.get_messages('record'):
-            timestamp, heart_rate = None, None
-            for data in record:
-                if data.name == 'timestamp':
-                    timestamp = data.value
-                elif data.name == 'heart_rate':
-                    heart_rate = data.value
-            if timestamp and heart_rate:
-                data_points.append({'time': timestamp, 'heart_rate': heart_rate})
-
-        if not data_points:
+        # --- 1. 数据提取和处理 ---
+        # 列式解码，只取时间戳和心率两列
+        columns = read_fit_records(file_path, fields=['timestamp', 'heart_rate'])
+        minutes = minute_aggregates(columns, fields=['heart_rate']).get('heart_rate')
+
+        if minutes is None:
             print("文件中未找到有效的心率数据。")
             return
 
-        df = pd.DataFrame(data_points)
-        df.set_index('time', inplace=True)
-
-        # 使用 'min' 替换 'T'
-        minute_avg_hr = df['heart_rate'].resample('min').mean().dropna()
+        minute_avg_hr = pd.Series(minutes['mean'], index=pd.to_datetime(minutes['time'], unit='s'),
+                                  name='heart_rate')
+        minute_avg_hr.index.name = 'time'
 
         print("--- 每分钟平均心率 ---")
         print(minute_avg_hr.astype(int))
@@ -68,5 +64,10 @@ def visualize_heart_rate(file_path):
         print(f"处理文件时出错: {e}")
 
 # --- 使用方法 ---
-your_file_path = r'C:\StudyHub\竞赛资料\AI模型智能体大赛\运动数据\Zepp20250927180647.fit' # 请确保路径正确
-visualize_heart_rate(your_file_path)
\ No newline at end of file
+# 交互查看单个文件：python parser.py 文件路径
+# 服务器上批量处理请使用 batch_report.py（无界面，输出Parquet汇总和PNG/SVG图表）
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('用法: python parser.py <.fit文件路径>')
+        sys.exit(1)
+    visualize_heart_rate(sys.argv[1])